@@ -4,9 +4,7 @@ Exports all agents used in the system.
 """
 
 from .email_categorizer import create_email_categorizer
-from .notifier import create_notifier_agent
 
 __all__ = [
-    'create_email_categorizer',
-    'create_notifier_agent'
+    'create_email_categorizer'
 ]
@@ -11,6 +11,8 @@ import imaplib
 import time
 from groq import Groq
 
+from tools.keyword_classifier import keyword_categorization
+
 # Load environment variables
 load_dotenv()
 
@@ -140,9 +142,6 @@ def categorize_with_groq_func(email_content: str) -> str:
         if len(email_content) > 1000:
             email_content = email_content[:1000] + "..." # Truncate long emails
 
-        # Check for common keywords to provide basic categorization if API fails
-        lower_content = email_content.lower()
-
         # Try to use the API first
         try:
             prompt = f"""Analyze this email and categorize it:
@@ -181,39 +180,8 @@ def categorize_with_groq_func(email_content: str) -> str:
         except Exception as api_error:
             print(f"API error: {str(api_error)}. Using fallback categorization.")
 
-            # Fallback categorization logic
-            priority = "Low"  # Default to low priority
-            category = "Other"  # Default category
-            needs_response = "No"  # Default to no response needed
-            contains_tasks = "No"  # Default to no tasks
-            summary = "Unable to fully analyze due to API limits. Basic categorization provided."
-
-            # Simple keyword-based categorization
-            if any(word in lower_content for word in ["urgent", "important", "asap", "deadline", "emergency"]):
-                priority = "High"
-                needs_response = "Yes"
-
-            if any(word in lower_content for word in ["newsletter", "subscribe", "update", "weekly", "monthly"]):
-                category = "Newsletter"
-            elif any(word in lower_content for word in ["github", "commit", "pull request", "issue", "repository"]):
-                category = "GitHub"
-            elif any(word in lower_content for word in ["youtube", "video", "channel", "subscribe"]):
-                category = "YouTube"
-            elif any(word in lower_content for word in ["receipt", "invoice", "payment", "order", "purchase"]):
-                category = "Receipts_Invoices"
-            elif any(word in lower_content for word in ["offer", "discount", "sale", "promotion", "deal"]):
-                category = "Promotional"
-            elif any(word in lower_content for word in ["job", "interview", "application", "career", "position"]):
-                category = "Work"
-
-            if any(word in lower_content for word in ["please respond", "let me know", "reply", "get back to me"]):
-                needs_response = "Yes"
-
-            if any(word in lower_content for word in ["task", "todo", "to-do", "action item", "assignment"]):
-                contains_tasks = "Yes"
-
-            # Create a formatted response similar to what the API would return
-            return f"Priority: {priority}\nCategory: {category}\nNeeds Response: {needs_response}\nContains Tasks: {contains_tasks}\nSummary: {summary}"
+            # Keyword-based categorization shared with tools/categorization_tools.py
+            return keyword_categorization(email_content)
     except Exception as e:
         return f"Error categorizing email with Groq: {str(e)}"
 
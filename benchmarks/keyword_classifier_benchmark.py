@@ -0,0 +1,102 @@
+"""
+Micro-benchmark: single-pass keyword classifier vs. the old per-list substring scans.
+
+Usage:
+    python benchmarks/keyword_classifier_benchmark.py [--repeat N]
+
+The classifier module is loaded on its own so no API keys or .env are needed.
+"""
+
+import argparse
+import importlib.util
+import os
+import random
+import time
+
+MODULE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tools", "keyword_classifier.py")
+spec = importlib.util.spec_from_file_location("keyword_classifier", MODULE_PATH)
+keyword_classifier = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(keyword_classifier)
+
+# Body sizes in characters
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+
+# Words that contain keywords without being keywords, which the old scans matched
+TRAP_WORDS = "office often history shipping hiking wholesale schedule".split()
+
+# Vocabulary size of the generated bodies
+VOCABULARY_SIZE = 3000
+
+
+def legacy_scan(text: str) -> set:
+    """
+    The fallback scans as they were: lowercase, then one `any(...)` per keyword list.
+    """
+    lower_content = text.lower()
+    signals = set()
+    for signal, keywords in keyword_classifier.KEYWORD_RULES.items():
+        if any(word in lower_content for word in keywords):
+            signals.add(signal)
+    return signals
+
+
+def make_body(size: int, seed: int = 0) -> str:
+    """
+    Builds text from a large random vocabulary with punctuation, and with no
+    keywords until the very end (the worst case for `any`).
+    """
+    rng = random.Random(seed)
+    letters = "bcdfgjkmpqvwxz"  # No vowels, so random words can't spell a keyword
+    vocabulary = ["".join(rng.choice(letters) for _ in range(rng.randint(2, 10))) for _ in range(VOCABULARY_SIZE)]
+    vocabulary += TRAP_WORDS
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(vocabulary)
+        if rng.random() < 0.1:
+            word += rng.choice(",.;:!?")
+        elif rng.random() < 0.02:
+            word = f"{word}/{rng.choice(vocabulary)}"
+        if rng.random() < 0.1:
+            word = word.capitalize()
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words) + " Please reply about the invoice."
+
+
+def measure(function, text: str, repeat: int) -> float:
+    """
+    Returns the best wall-clock time of `repeat` runs in seconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keyword classifier micro-benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (best is kept)")
+    args = parser.parse_args()
+
+    classifier = keyword_classifier.KeywordClassifier()
+
+    print(f"{'body size':>10} {'legacy MB/s':>12} {'single-pass MB/s':>17} {'speedup':>8}")
+    for size in SIZES:
+        body = make_body(size)
+        legacy = measure(legacy_scan, body, args.repeat)
+        single_pass = measure(classifier.signals, body, args.repeat)
+        megabytes = len(body) / 1e6
+        print(f"{size:>10} {megabytes / legacy:>12.1f} {megabytes / single_pass:>17.1f} {legacy / single_pass:>7.1f}x")
+
+    # Text made only of words that merely contain keywords
+    trap_text = " ".join(TRAP_WORDS)
+    print(f"\nSignals for {trap_text!r}:")
+    print(f"  legacy:      {sorted(legacy_scan(trap_text))}")
+    print(f"  single-pass: {sorted(classifier.signals(trap_text))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Startup benchmark: how long importing the pipeline takes before any work is done.
+
+Usage:
+    python benchmarks/startup_benchmark.py [--repeat N] [--max-seconds S]
+
+Each module is imported in a fresh interpreter, so nothing is cached
+between runs. The benchmark also reports whether a heavy package (crewai
+or an LLM client) was imported on the way, which the lazy imports are
+meant to prevent. With --max-seconds it exits with status 1 when
+importing main takes longer, so it can guard against startup regressions.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules timed, from the configuration up to the whole pipeline
+MODULES = ["config", "tools.email_tools", "tools.categorization_tools", "main"]
+
+# Packages that must only be imported once they are actually used
+HEAVY_PACKAGES = ["crewai", "groq", "google.generativeai"]
+
+# Measures one import in a fresh interpreter and reports the loaded heavy packages
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "heavy": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def measure(module: str) -> dict:
+    """
+    Imports `module` in a new interpreter and returns its import time and heavy packages.
+    """
+    env = dict(os.environ)
+    # Placeholder credentials, so config.py doesn't need a .env
+    env.setdefault("GROQ_API_KEY", "benchmark")
+    env.setdefault("GEMINI_API_KEY", "benchmark")
+    output = subprocess.run(
+        [sys.executable, "-W", "ignore", "-c", PROBE.format(module=module, heavy=HEAVY_PACKAGES)],
+        cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per module (median is reported)")
+    parser.add_argument("--max-seconds", type=float, default=None, help="Fail if importing main takes longer")
+    args = parser.parse_args()
+
+    print(f"{'module':<30} {'median':>10} {'min':>10}  heavy packages")
+    medians = {}
+    for module in MODULES:
+        runs = [measure(module) for _ in range(max(1, args.repeat))]
+        times = [run["seconds"] for run in runs]
+        medians[module] = statistics.median(times)
+        heavy = ", ".join(runs[0]["heavy"]) or "-"
+        print(f"{module:<30} {medians[module] * 1000:>8.1f}ms {min(times) * 1000:>8.1f}ms  {heavy}")
+
+    if args.max_seconds is not None and medians["main"] > args.max_seconds:
+        print(f"\nImporting main took {medians['main']:.3f}s, more than the allowed {args.max_seconds:.3f}s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,8 +5,6 @@ Handles environment variables and global settings.
 
 import os
 from dotenv import load_dotenv
-from groq import Groq
-import google.generativeai as genai
 
 # Load environment variables
 load_dotenv()
@@ -14,36 +12,121 @@ load_dotenv()
 # API Keys
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-
-# Initialize Groq client
-groq_client = Groq(api_key=GROQ_API_KEY)
-
-# Initialize Gemini
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-    # Initialize the Gemini model
-    gemini_model = genai.GenerativeModel(model_name="gemini-2.5-flash-preview-04-17")
-else:
-    gemini_model = None
+# The Groq and Gemini clients are created on first use by tools/providers.py
 
 # Email Settings
 GMAIL_USERNAME = os.getenv("GMAIL_USERNAME")
 GMAIL_APP_PASSWORD = os.getenv("GMAIL_APP_PASSWORD")
 EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", 3))
+FETCH_BODY_BYTES = int(os.getenv("FETCH_BODY_BYTES", 8192))  # Body prefix downloaded per email
+BODY_TOKEN_BUDGET = int(os.getenv("BODY_TOKEN_BUDGET", 250))  # Tokens of cleaned body text kept per email
+FETCH_CHUNK_SIZE = int(os.getenv("FETCH_CHUNK_SIZE", 10))  # Emails downloaded per FETCH command
+MARK_FETCHED_AS_SEEN = os.getenv("MARK_FETCHED_AS_SEEN", "true").lower() == "true"
+PROCESSING_CONCURRENCY = int(os.getenv("PROCESSING_CONCURRENCY", 1))  # Emails processed in parallel
+INCREMENTAL_SYNC = os.getenv("INCREMENTAL_SYNC", "true").lower() == "true"  # Only fetch mail above the last processed UID
+BATCH_CATEGORIZATION = os.getenv("BATCH_CATEGORIZATION", "false").lower() == "true"  # Categorize several emails per Gemini request
+VERIFY_LABELS = os.getenv("VERIFY_LABELS", "false").lower() == "true"  # Check the applied labels on the server after a run
+GEMINI_BATCH_SIZE = int(os.getenv("GEMINI_BATCH_SIZE", 8))  # Emails per batch categorization request
+
+# IMAP Connection Settings
+IMAP_HOST = os.getenv("IMAP_HOST", "imap.gmail.com")
+IMAP_POOL_SIZE = int(os.getenv("IMAP_POOL_SIZE", 2))  # Max concurrent IMAP connections
+IMAP_NOOP_INTERVAL = int(os.getenv("IMAP_NOOP_INTERVAL", 300))  # Probe idle connections after N seconds
+IDLE_REFRESH_SECONDS = int(os.getenv("IDLE_REFRESH_SECONDS", 25 * 60))  # Re-issue IDLE before Gmail's 29 min timeout
+
+# Local State Settings
+STATE_DIR = os.getenv("STATE_DIR", ".inbox_state")  # Directory for caches and snapshots
+# Snapshot of the server's label list; set to an empty string to disable
+LABEL_REGISTRY_SNAPSHOT = os.getenv("LABEL_REGISTRY_SNAPSHOT", os.path.join(STATE_DIR, "labels.json"))
+SYNC_STATE_PATH = os.getenv("SYNC_STATE_PATH", os.path.join(STATE_DIR, "sync_state.json"))
+RATE_LIMIT_STATE_PATH = os.getenv("RATE_LIMIT_STATE_PATH", os.path.join(STATE_DIR, "rate_limits.json"))
+# Persistent tier of the categorization cache; set to an empty string to keep it in memory only
+CATEGORY_CACHE_PATH = os.getenv("CATEGORY_CACHE_PATH", os.path.join(STATE_DIR, "categorizations.sqlite3"))
+CATEGORY_CACHE_TTL_SECONDS = int(os.getenv("CATEGORY_CACHE_TTL_SECONDS", 30 * 24 * 3600))  # Forget results after 30 days
+CATEGORY_CACHE_MAX_ENTRIES = int(os.getenv("CATEGORY_CACHE_MAX_ENTRIES", 10000))  # Rows kept on disk
+CATEGORY_CACHE_MEMORY_ENTRIES = int(os.getenv("CATEGORY_CACHE_MEMORY_ENTRIES", 512))  # In-process LRU size
+
+# Local Classifier
+# Model trained with `python -m tools.local_classifier`; emails it is confident about skip the LLM
+LOCAL_CLASSIFIER_MODEL = os.getenv("LOCAL_CLASSIFIER_MODEL", os.path.join(STATE_DIR, "local_classifier.npz"))
+LOCAL_CLASSIFIER_THRESHOLD = float(os.getenv("LOCAL_CLASSIFIER_THRESHOLD", 0.9))  # Minimum confidence of every field
+# JSONL file that LLM categorizations are appended to as training data; empty to disable
+TRAINING_DATA_PATH = os.getenv("TRAINING_DATA_PATH", "")
+
+# Sender Index
+# Category/priority history per sender address and domain; set to an empty string to keep it in memory only
+SENDER_INDEX_PATH = os.getenv("SENDER_INDEX_PATH", os.path.join(STATE_DIR, "senders.sqlite3"))
+SENDER_INDEX_THRESHOLD = float(os.getenv("SENDER_INDEX_THRESHOLD", 0.9))  # Share of a sender's emails that must agree
+SENDER_INDEX_MIN_EMAILS = float(os.getenv("SENDER_INDEX_MIN_EMAILS", 5))  # Emails seen before a sender is trusted
+SENDER_INDEX_HALF_LIFE_DAYS = float(os.getenv("SENDER_INDEX_HALF_LIFE_DAYS", 30))  # Older emails count half as much
+# Freemail domains shared by unrelated people: only their addresses are learned, never the domain
+SENDER_INDEX_SHARED_DOMAINS = {d.strip().lower() for d in os.getenv(
+    "SENDER_INDEX_SHARED_DOMAINS",
+    "gmail.com,googlemail.com,outlook.com,hotmail.com,live.com,msn.com,yahoo.com,ymail.com,"
+    "icloud.com,me.com,mac.com,aol.com,proton.me,protonmail.com,gmx.com,gmx.de,gmx.net,web.de,"
+    "mail.com,zoho.com,yandex.com,yandex.ru,mail.ru,qq.com,163.com,hey.com,fastmail.com"
+).split(",") if d.strip()}
+
+# Processing Ledger
+# Stage status (categorized/labeled/notified) per Gmail message, so reruns skip finished work;
+# set to an empty string to disable
+LEDGER_PATH = os.getenv("LEDGER_PATH", os.path.join(STATE_DIR, "ledger.sqlite3"))
+LEDGER_MAX_ATTEMPTS = int(os.getenv("LEDGER_MAX_ATTEMPTS", 3))  # Runs an unfinished email holds back the UID mark
+
+# Rate Limits
+# Requests per minute and burst size of each provider's token bucket
+RATE_LIMITS = {
+    "gemini": {"per_minute": float(os.getenv("GEMINI_RPM", 10)), "burst": float(os.getenv("GEMINI_BURST", 3))},
+    "groq": {"per_minute": float(os.getenv("GROQ_RPM", 30)), "burst": float(os.getenv("GROQ_BURST", 5))},
+    "telegram": {"per_minute": float(os.getenv("TELEGRAM_RPM", 20)), "burst": float(os.getenv("TELEGRAM_BURST", 3))},
+}
+
+# Hedged Requests
+# "off" (Gemini only), "hedge" (ask the second provider when the first is slow) or "race" (ask both at once)
+HEDGE_MODE = os.getenv("HEDGE_MODE", "off").lower()
+HEDGE_PROVIDERS = [p.strip() for p in os.getenv("HEDGE_PROVIDERS", "gemini,groq").split(",") if p.strip()]  # Primary first
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", 95))  # Primary latency percentile used as the hedge deadline
+HEDGE_MIN_DELAY_SECONDS = float(os.getenv("HEDGE_MIN_DELAY_SECONDS", 0.5))  # Lower bound of the deadline
+HEDGE_MAX_DELAY_SECONDS = float(os.getenv("HEDGE_MAX_DELAY_SECONDS", 8))  # Upper bound, also used until latencies are known
+HEDGE_MAX_RATIO = float(os.getenv("HEDGE_MAX_RATIO", 0.2))  # HEDGE_MODE=hedge: secondary requests allowed per primary request (at least one)
+LATENCY_STATE_PATH = os.getenv("LATENCY_STATE_PATH", os.path.join(STATE_DIR, "latencies.json"))
+LATENCY_WINDOW = int(os.getenv("LATENCY_WINDOW", 200))  # Recent requests per provider the percentile is taken over
+
+# Model Routing
+# Send simple emails straight to GROQ_MODEL instead of the Gemini agent (see tools/model_router.py)
+MODEL_ROUTING = os.getenv("MODEL_ROUTING", "false").lower() == "true"
+ROUTER_THRESHOLD = float(os.getenv("ROUTER_THRESHOLD", 0.35))  # Complexity scores below this take the light route
+ROUTER_LONG_EMAIL_CHARS = int(os.getenv("ROUTER_LONG_EMAIL_CHARS", 3000))  # Bodies this long count as fully complex
+ROUTER_AUDIT_RATE = float(os.getenv("ROUTER_AUDIT_RATE", 0.05))  # Share of light-route emails checked against Gemini
+
+# Categorization Values
+PRIORITY_LEVELS = ["High", "Medium", "Low"]
+EMAIL_CATEGORIES = ["Personal", "Work", "Promotional", "Newsletter", "GitHub", "YouTube", "Receipts_Invoices", "Other"]
 
 # Telegram Settings
 TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
+TELEGRAM_TIMEOUT_SECONDS = float(os.getenv("TELEGRAM_TIMEOUT_SECONDS", 10))  # Per-request connect/read timeout
+# Queue of notifications delivered in the background; set to an empty string to keep it in memory only
+NOTIFICATION_OUTBOX_PATH = os.getenv("NOTIFICATION_OUTBOX_PATH", os.path.join(STATE_DIR, "outbox.sqlite3"))
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", 8))  # Deliveries tried before a message is dropped
+NOTIFICATION_RETRY_SECONDS = float(os.getenv("NOTIFICATION_RETRY_SECONDS", 2))  # First retry delay, doubled per attempt
+NOTIFICATION_FLUSH_SECONDS = float(os.getenv("NOTIFICATION_FLUSH_SECONDS", 30))  # How long a one-shot run waits for delivery
 
 # Model Settings
 CATEGORIZER_MODEL = "gemini-2.5-flash-preview-04-17"  # Using Gemini for categorization
-NOTIFIER_MODEL = "llama-3.3-70b-versatile"  # Still using Groq for notifications
+GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")  # Model of the Groq categorizer and the light route
+GEMINI_CONTENT_TOKENS = int(os.getenv("GEMINI_CONTENT_TOKENS", 250))  # Email tokens (headers included) sent to Gemini
+GROQ_CONTENT_TOKENS = int(os.getenv("GROQ_CONTENT_TOKENS", 300))  # Email tokens (headers included) sent to Groq
+# Prompt versions live in tools/prompt_registry.py; their token use and latency are saved here
+PROMPT_USAGE_PATH = os.getenv("PROMPT_USAGE_PATH", os.path.join(STATE_DIR, "prompt_usage.json"))
 
 # Notification Settings
-# Define criteria for when to send notifications
+# Define criteria for when to send notifications (compiled by tools/notification_rules.py)
 NOTIFICATION_CRITERIA = {
     "high_priority": True,  # Always notify for high priority
     "needs_response": True,  # Always notify if response needed
     "medium_priority_needs_response": True,  # Notify for medium priority if response needed
     "low_priority_needs_response": False,  # Don't notify for low priority even if response needed
+    "excluded_categories": ["Newsletter", "Promotional"],  # Needs-response alone never notifies for these; High priority still does
 }
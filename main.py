@@ -1,33 +1,607 @@
 """
 Main execution script for the email processing system.
+
+Run `python main.py` for a one-shot batch or `python main.py --daemon` to
+keep an IMAP IDLE session open and process new mail as it arrives.
 """
 
+import argparse
 import os
+import threading
 import time
-import imaplib
-from crewai import Crew, Task
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from itertools import chain
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+from config import (
+    GROQ_API_KEY,
+    EMAIL_BATCH_SIZE,
+    IDLE_REFRESH_SECONDS,
+    PROCESSING_CONCURRENCY,
+    BATCH_CATEGORIZATION,
+    GEMINI_BATCH_SIZE,
+    VERIFY_LABELS,
+    NOTIFICATION_FLUSH_SECONDS,
+    PRIORITY_LEVELS,
+    EMAIL_CATEGORIES,
+)
+from tools.email_tools import iter_emails, has_new_mail, apply_labels_batch, mark_emails_processed, verify_labels
+from tools.gmail_session import GmailSession, RECONNECT_ERRORS
+from tools.label_registry import ensure_standard_labels
+from tools.rate_limiter import get_rate_limiter, is_rate_limit_error, retry_after_from_error
+from tools.categorization_tools import (
+    hedged_categorization,
+    categorize_batch_with_gemini_func,
+    get_cached_categorization,
+    hedge_counters,
+)
+from tools.categorization_result import CategorizationResult
+from tools.categorization_cache import get_categorization_cache
+from tools.local_classifier import local_categorization, counters as local_classifier_counters
+from tools.sender_index import sender_categorization, get_sender_index
+from tools.model_router import choose_route, light_categorization, record_route, route_stats
+from tools.prompt_registry import get_prompt_usage
+from tools.ledger import get_ledger, message_key
+from tools.notification_rules import notification_rules, notify_if_needed
+from tools.notification_outbox import get_notification_outbox
+from utils import (
+    set_email_context,
+    get_email_context,
+    clear_email_context,
+    extract_email_details,
+    format_email_content,
+)
+
+if TYPE_CHECKING:
+    from crewai import Agent
+
+# crewai (and with it the agents and tasks packages) takes seconds to import,
+# so it is only imported once an email actually needs the crew
+
+# Guards stats and pending labels shared by the worker threads
+results_lock = threading.Lock()
+
+# Per-thread categorizer agents, see get_agents()
+_thread_agents = threading.local()
+
+# Gemini calls of an agent-routed email, reserved together before the crew
+# starts: the calls the categorizer agent itself makes, which the rate limiter
+# never sees, and the request of its categorization tool
+AGENT_LLM_CALLS = {"gemini": 2}
+AGENT_TOOL_CALLS = {"gemini": 1}
+
+def create_stats() -> Dict[str, Any]:
+    """
+    Creates an empty statistics dictionary for a processing run.
+
+    Counts are updated by record_categorization() as results come in.
+    """
+    return {
+        "total": 0,
+        "priority": {**{priority: 0 for priority in PRIORITY_LEVELS}, "Unknown": 0},
+        "category": {**{category: 0 for category in EMAIL_CATEGORIES}, "Unknown": 0},
+        "needs_response": {"Yes": 0, "No": 0, "Unknown": 0},
+        "direct_categorization": [],
+        "marked": 0  # Emails the UID high-water mark moved past
+    }
+
+def get_agents() -> "Agent":
+    """
+    Returns the categorizer agent of the calling thread.
+
+    Agents keep per-run state, so each worker thread gets its own.
+    """
+    if not hasattr(_thread_agents, "categorizer"):
+        from agents import create_email_categorizer
+        _thread_agents.categorizer = create_email_categorizer()
+    return _thread_agents.categorizer
+
+def process_email(i: int, email_data: Dict[str, Any], stats: Dict[str, Any], pending_labels: Dict[str, CategorizationResult],
+                  prepared: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Categorizes a single email and decides whether to notify.
+
+    The categorization result is recorded in `stats` and queued in
+    `pending_labels` (keyed by UID) for batched labeling. The email content
+    is handed to the tools through an in-memory context keyed by email ID,
+    so this is safe to call from several threads at once.
+
+    Args:
+        i: Zero-based position of the email in the current batch
+        email_data: Email dictionary as yielded by iter_emails()
+        stats: Statistics dictionary from create_stats()
+        pending_labels: Categorization results waiting to be labeled
+        prepared: Decisions already made for the email while batching: its
+            categorize_locally() answer ("local"), its choose_route() route
+            and score ("route") and its batch result ("result"), each only
+            if it was computed
+    """
+    prepared = prepared or {}
+    print(f"\nProcessing email {i+1}...")
+    print(f"Subject: {email_data['subject']}")
+
+    # Categorized in an earlier run: resume with the remaining stages
+    entry = get_ledger().get(message_key(email_data))
+    if entry is not None and entry["result"] is not None:
+        print(f"Categorization result from the ledger:\n{entry['result']}")
+        record_categorization(i, email_data, entry["result"], stats, pending_labels, entry)
+        return
+
+    # Step 1: Register the email content for the tools (also for this thread)
+    email_content = set_email_context(email_data)
+
+    # Categorized by the Gemini batch (or on its own where the batch answer was unusable)
+    if prepared.get("result") is not None:
+        print(f"Categorization result from the batch:\n{prepared['result']}")
+        record_categorization(i, email_data, prepared["result"], stats, pending_labels)
+        clear_email_context(email_data['id'])
+        return
+
+    # Identical mail was categorized before: no agent (or API) calls needed
+    cached_result = get_cached_categorization(email_content)
+    if cached_result is not None:
+        print(f"Cached categorization result:\n{cached_result}")
+        record_categorization(i, email_data, cached_result, stats, pending_labels)
+        clear_email_context(email_data['id'])
+        return
+
+    # The sender's history or the local model is confident enough: no LLM call either
+    local_answer = prepared["local"] if "local" in prepared else categorize_locally(email_content)
+    if local_answer is not None:
+        source, local_result = local_answer
+        print(f"Categorization result from {source}:\n{local_result}")
+        record_categorization(i, email_data, local_result, stats, pending_labels)
+        clear_email_context(email_data['id'])
+        return
+
+    # Simple mail goes to the small model, anything it can't answer to the agent
+    route, score = prepared["route"] if "route" in prepared else choose_route(email_data, email_content)
+    started = time.monotonic()
+    if route == "light":
+        print(f"Complexity {score:.2f}: categorizing with the light model...")
+        light_result = light_categorization(email_content)
+        if light_result is not None:
+            record_route(route, time.monotonic() - started)
+            print(f"Categorization result from the light model:\n{light_result}")
+            record_categorization(i, email_data, light_result, stats, pending_labels)
+            clear_email_context(email_data['id'])
+            return
+        print("Light model gave no answer, escalating to the agent...")
+        route, started = "heavy", time.monotonic()
+
+    from crewai import Crew
+    from tasks import create_email_tasks
+
+    email_categorizer = get_agents()
+
+    # Step 2: Create tasks for this email
+    print(f"Creating tasks for email {i+1}...")
+    single_email_tasks = create_email_tasks([email_data], email_categorizer)
+
+    # Step 3: Create and run the crew for this email
+    crew = Crew(
+        agents=[email_categorizer],
+        tasks=single_email_tasks,
+        verbose=True
+    )
+
+    try:
+        # Wait until the agent's provider has quota for the whole email; the
+        # tool's request then draws on this reservation instead of taking more
+        print(f"Running Crew for email {i+1}...")
+        with get_rate_limiter().prepaid(AGENT_LLM_CALLS, AGENT_TOOL_CALLS):
+            results = crew.kickoff()
+
+        print(f"\n--- Email {i+1} Processing Finished ---")
+        print(f"Email {i+1} processed successfully.")
+
+        # The crew's only task is the categorization
+        result = results.raw if hasattr(results, "raw") else results
+        # Convert tuple to string if needed
+        if isinstance(result, tuple):
+            result = result[1] if len(result) > 1 and result[1] is not None else str(result[0])
+        # The agent's answer is parsed here, once
+        result = CategorizationResult.parse(result)
+        record_route(route, time.monotonic() - started)
+        print(f"Categorization result:\n{result}")
+        record_categorization(i, email_data, result, stats, pending_labels)
+
+    except Exception as crew_error:
+        error_msg = str(crew_error).lower()
+        if is_rate_limit_error(crew_error):
+            print(f"\n--- Rate limit reached on email {i+1} ---")
+            # litellm errors name the provider that answered with 429
+            provider = getattr(crew_error, "llm_provider", None)
+            if provider:
+                get_rate_limiter().penalize(provider, retry_after_from_error(crew_error))
+            print("Using fallback categorization...")
+
+            # Look up the email content
+            email_content = get_email_context(email_data['id'])
+            if email_content:
+                result = hedged_categorization(email_content)
+                print(f"Fallback categorization result:\n{result}")
+                record_categorization(i, email_data, result, stats, pending_labels)
+        elif "token" in error_msg:
+            print(f"\n--- Token limit reached on email {i+1} ---")
+            print("The email content was too large. Try with a smaller email.")
+        else:
+            print(f"\n--- Error processing email {i+1}: {str(crew_error)} ---")
+
+    # Step 4: Drop the email content
+    clear_email_context(email_data['id'])
 
-from config import GROQ_API_KEY, EMAIL_BATCH_SIZE, GMAIL_USERNAME, GMAIL_APP_PASSWORD
-from tools.email_tools import fetch_emails_func
-from agents import create_email_categorizer, create_notifier_agent
-from tasks import create_email_tasks
-from utils import write_email_to_file, read_email_from_file, clear_email_file, extract_email_details
+def categorize_locally(email_content: str, count: bool = True) -> Optional[Tuple[str, CategorizationResult]]:
+    """
+    Categorizes an email without an LLM if the sender index or the local
+    classifier is confident about it, cheapest first.
+
+    Args:
+        email_content: Formatted email content
+        count: Whether the outcome should be counted in the stats
+
+    Returns:
+        Optional[Tuple[str, CategorizationResult]]: The source and the categorization result, or None
+    """
+    sender_result = sender_categorization(email_content, count=count)
+    if sender_result is not None:
+        return "sender history", sender_result
+    local_result = local_categorization(email_content, count=count)
+    if local_result is not None:
+        return "local classifier", local_result
+    return None
+
+def record_categorization(i: int, email_data: Dict[str, Any], result: CategorizationResult,
+                          stats: Dict[str, Any], pending_labels: Dict[str, CategorizationResult],
+                          entry: Optional[Dict[str, Any]] = None) -> None:
+    """
+    Records a categorization and sends a notification if the rules call for one.
+
+    Used for crew results, cache hits, the fallback after a rate limit error
+    and results resumed from the ledger. Stages the ledger already lists as
+    done (labeling, notifying) are skipped.
+
+    Args:
+        i: Zero-based position of the email in the current batch
+        email_data: Email dictionary as yielded by iter_emails()
+        result: The parsed categorization
+        stats: Statistics dictionary from create_stats()
+        pending_labels: Categorization results waiting to be labeled
+        entry: The email's ledger entry if it was categorized in an earlier run
+    """
+    ledger = get_ledger()
+    key = message_key(email_data)
+    if entry is None:
+        ledger.record_categorization(email_data, result)
+
+    # Store categorization for statistics and queue labels for batched application
+    with results_lock:
+        stats["direct_categorization"].append({
+            "id": email_data['id'],
+            "subject": email_data['subject'],
+            "result": result
+        })
+        stats["priority"][result.priority] = stats["priority"].get(result.priority, 0) + 1
+        stats["category"][result.category] = stats["category"].get(result.category, 0) + 1
+        stats["needs_response"][result.needs_response] = stats["needs_response"].get(result.needs_response, 0) + 1
+        if entry is None or entry["labeled_at"] is None:
+            pending_labels[email_data['id']] = result
+
+    if entry is not None and entry["notified_at"] is not None:
+        return
+
+    # Apply the notification criteria (NOTIFICATION_CRITERIA in config.py)
+    if not notification_rules.should_notify(result.priority, result.category, result.needs_response):
+        ledger.mark_notified(key, queued=False)
+    elif not get_notification_outbox().enabled:
+        # Without Telegram there is nothing to queue, and waiting for it would hold the UID mark
+        ledger.mark_notified(key, queued=False)
+    elif notify_if_needed(email_data, result):
+        print(f"Notification queued for email {i+1}")
+        ledger.mark_notified(key, queued=True)
+    # A notification that couldn't be queued stays pending: processed_prefix() holds
+    # the UID mark below this email, so the next run fetches it again
+
+def process_emails(email_stream: Iterable[Dict[str, Any]],
+                   concurrency: int = PROCESSING_CONCURRENCY) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Runs the categorize/label/notify pipeline over a stream of emails.
+
+    Up to `concurrency` emails are processed at once by a thread pool; with
+    a concurrency of 1 emails are handled one after another as before.
+    API quotas are enforced by the shared rate limiter, not by sleeping.
+    With BATCH_CATEGORIZATION, emails are first categorized in groups of
+    GEMINI_BATCH_SIZE with one Gemini request per group.
+    Labels are applied in one batch at the end and the UID high-water mark
+    is advanced once they are in place.
+
+    Args:
+        email_stream: Emails, e.g. from iter_emails()
+        concurrency: Maximum number of emails in flight
+
+    Returns:
+        Tuple[List[Dict[str, Any]], Dict[str, Any]]: The processed emails and the run statistics
+    """
+    stats = create_stats()
+    concurrency = max(1, concurrency)
+
+    # Emails processed so far, used for the summary at the end
+    emails = []
+
+    # Emails left unfinished earlier in this run, retried by the next run instead
+    skipped = []
+    ledger = get_ledger()
+
+    # Categorization results keyed by email UID, labeled in one batch at the end
+    pending_labels = {}
+
+    # Emails handed to the workers together (more than one only when batching)
+    group_size = GEMINI_BATCH_SIZE if BATCH_CATEGORIZATION else 1
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="email-worker") as executor:
+        in_flight = set()
+
+        def dispatch(group: List[Tuple[int, Dict[str, Any]]]) -> None:
+            nonlocal in_flight
+            # What is decided here is handed to the workers, which don't decide it again
+            prepared = {email_data['id']: {} for _, email_data in group}
+            contents = {}
+            if len(group) > 1:
+                for _, email_data in group:
+                    # Emails answered without an LLM (or in an earlier run) stay out of the batch
+                    if (ledger.get(message_key(email_data)) or {}).get("result") is not None:
+                        continue
+                    content = format_email_content(email_data)
+                    if get_cached_categorization(content) is not None:
+                        continue
+                    plan = prepared[email_data['id']]
+                    plan["local"] = categorize_locally(content)
+                    if plan["local"] is not None:
+                        continue
+                    # Light-route emails go to the small model instead
+                    plan["route"] = choose_route(email_data, content)
+                    if plan["route"][0] == "heavy":
+                        contents[email_data['id']] = content
+            if len(contents) > 1:
+                # One Gemini request for the whole group; emails missing from its
+                # answer are categorized on their own, so every email gets a result
+                print(f"\nCategorizing {len(contents)} emails in one batch...")
+                for email_id, result in categorize_batch_with_gemini_func(contents).items():
+                    prepared[email_id]["result"] = result
+
+            for i, email_data in group:
+                in_flight.add(executor.submit(process_email, i, email_data, stats, pending_labels,
+                                              prepared[email_data['id']]))
+
+                # Don't pull more emails off the stream than the workers can take
+                if len(in_flight) >= concurrency * 2:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    _report_worker_errors(done)
+
+        group = []
+        for email_data in email_stream:
+            if ledger.attempted(email_data):
+                print(f"Skipping email {email_data['id']} until the next run, it was left unfinished in this one")
+                skipped.append(email_data)
+                continue
+            i = len(emails)
+            emails.append(email_data)
+            group.append((i, email_data))
+            if len(group) >= group_size:
+                dispatch(group)
+                group = []
+        if group:
+            dispatch(group)
+
+        done, _ = wait(in_flight)
+        _report_worker_errors(done)
+
+    # Apply labels for the whole batch (one UID STORE per label)
+    label_result = True
+    if pending_labels:
+        print(f"\nApplying labels to {len(pending_labels)} emails...")
+        label_result = apply_labels_batch(pending_labels)
+        print(f"Label application result: {label_result}")
+        if label_result:
+            ledger.mark_labeled(
+                message_key(email_data) for email_data in emails if email_data['id'] in pending_labels
+            )
+
+    # Move the UID high-water mark up to the oldest unfinished email, so the
+    # next run fetches that one again
+    if label_result:
+        processed = ledger.processed_prefix(emails + skipped)
+        mark_emails_processed(processed)
+        stats["marked"] = len(processed)
+
+    return emails, stats
+
+def _report_worker_errors(futures) -> None:
+    """
+    Prints exceptions raised inside worker threads.
+    """
+    for future in futures:
+        error = future.exception()
+        if error is not None:
+            print(f"Error in email worker: {str(error)}")
+
+def print_summary(emails: List[Dict[str, Any]], stats: Dict[str, Any]) -> None:
+    """
+    Prints priority/category/response breakdowns for a processed batch.
+
+    The breakdowns come from the results recorded during the run, so no
+    IMAP commands are sent unless VERIFY_LABELS is set.
+    """
+    # Update total emails in statistics
+    stats["total"] = len(emails)
+
+    # Print summary statistics
+    print("\n--- Email Processing Summary ---")
+    print(f"Total emails processed: {stats['total']}")
+
+    # Emails that ended without a categorization (e.g. a crew error)
+    uncategorized = stats["total"] - len(stats["direct_categorization"])
+    if uncategorized > 0:
+        for breakdown in ("priority", "category", "needs_response"):
+            stats[breakdown]["Unknown"] += uncategorized
+
+    # Print the statistics
+    print("\nPriority Breakdown:")
+    for priority, count in stats["priority"].items():
+        if count > 0:
+            print(f"  {priority}: {count}")
+
+    print("\nCategory Breakdown:")
+    for category, count in stats["category"].items():
+        if count > 0:
+            print(f"  {category}: {count}")
+
+    print("\nNeeds Response Breakdown:")
+    for response, count in stats["needs_response"].items():
+        if count > 0:
+            print(f"  {response}: {count}")
+
+    # Print direct categorization results
+    print("\nDirect Categorization Results:")
+    for item in stats["direct_categorization"]:
+        print(f"\nSubject: {item['subject']}")
+        result = item['result']
+        print(f"  Priority: {result.priority}")
+        print(f"  Category: {result.category}")
+        print(f"  Needs Response: {result.needs_response}")
+
+    if VERIFY_LABELS and stats["direct_categorization"]:
+        # One batched UID FETCH instead of a round trip per email
+        try:
+            missing = verify_labels({item['id']: item['result'] for item in stats["direct_categorization"]})
+            print(f"\nLabel Verification: {len(stats['direct_categorization']) - len(missing)} emails labeled correctly")
+            for email_id, labels in missing.items():
+                print(f"  Email {email_id} is missing: {', '.join(labels)}")
+        except Exception as e:
+            print(f"Error verifying labels: {str(e)}")
+
+    cache_stats = get_categorization_cache().stats()
+    print("\nCategorization Cache:")
+    print(f"  Hits: {cache_stats['memory_hits']} in memory, {cache_stats['disk_hits']} on disk")
+    print(f"  Misses: {cache_stats['misses']}")
+
+    sender_stats = get_sender_index().stats()
+    print("\nSender Index:")
+    print(f"  Answered from sender history: {sender_stats['hits']} (of {sender_stats['hits'] + sender_stats['misses']} looked up)")
+    print(f"  Known senders and domains: {sender_stats['senders']}")
+
+    if local_classifier_counters["answered"] or local_classifier_counters["deferred"]:
+        print("\nLocal Classifier:")
+        print(f"  Answered locally: {local_classifier_counters['answered']}")
+        print(f"  Sent to the LLM: {local_classifier_counters['deferred']}")
+
+    if hedge_counters["requests"]:
+        print("\nHedged Requests:")
+        print(f"  Categorization requests: {hedge_counters['requests']}, hedged: {hedge_counters['hedged']} "
+              f"(skipped by quota: {hedge_counters['skipped']})")
+        print(f"  Won by the second provider: {hedge_counters['secondary_wins']}")
+
+    routes = route_stats()
+    if routes["light"]["emails"] or routes["light"]["escalated"]:
+        print("\nModel Routing:")
+        for route, values in routes.items():
+            print(f"  {route.capitalize()} route: {values['emails']} emails, "
+                  f"{values['mean_seconds']:.2f}s on average")
+        print(f"  Escalated from the light route: {routes['light']['escalated']}")
+        if routes["light"]["accuracy"] is not None:
+            print(f"  Light route accuracy: {routes['light']['accuracy']:.0%} "
+                  f"({routes['light']['agreed']} of {routes['light']['audited']} audited emails)")
+
+    prompt_usage = get_prompt_usage().stats()
+    if prompt_usage:
+        print("\nPrompt Tokens:")
+        for key, entry in sorted(prompt_usage.items()):
+            print(f"  {key}: {entry['calls']} calls, {entry['input_tokens']} in / {entry['output_tokens']} out, "
+                  f"{entry['seconds'] / entry['calls']:.2f}s per call")
+
+    outbox_stats = get_notification_outbox().stats()
+    if outbox_stats["queued"] or outbox_stats["pending"]:
+        print("\nNotifications:")
+        print(f"  Queued: {outbox_stats['queued']}, sent: {outbox_stats['sent']}, retried: {outbox_stats['retried']}")
+        print(f"  Dropped: {outbox_stats['dropped']}, waiting: {outbox_stats['pending']}")
+
+    ledger_counts = get_ledger().counts()
+    if ledger_counts["total"]:
+        print("\nProcessing Ledger:")
+        print(f"  Emails recorded: {ledger_counts['total']}")
+        print(f"  Labeled: {ledger_counts['labeled']}, notification handled: {ledger_counts['notified']}")
+
+    print("\n--- All emails processed ---")
+
+def run_daemon() -> None:
+    """
+    Keeps an IMAP IDLE session on the inbox and processes new mail as it arrives.
+
+    Gmail drops IDLE sessions after about 29 minutes, so the IDLE command is
+    re-issued every IDLE_REFRESH_SECONDS; each refresh also runs a cheap
+    catch-up pass so nothing is missed while the connection was down.
+    Relies on incremental sync (INCREMENTAL_SYNC) to know what is new.
+    """
+    # A dedicated connection: it sits in IDLE and can't serve other commands
+    listener = GmailSession()
+    retry_delay = 5
+
+    print("Starting daemon mode, processing any mail that arrived while offline...")
+
+    while True:
+        try:
+            # Catch up first: mail that arrived while offline, while the last batch
+            # was processed or without an EXISTS notification before the refresh.
+            # Keep going until a pass finds nothing or is held at an unfinished
+            # email, which waits for the next wake-up
+            get_ledger().start_run()
+            while process_new_emails():
+                pass
+
+            listener.select("inbox")
+            print(f"Waiting for new mail (IDLE, refresh every {IDLE_REFRESH_SECONDS}s)...")
+            woke = listener.idle(IDLE_REFRESH_SECONDS)
+            retry_delay = 5
+
+            if woke:
+                print("New mail notification received.")
+        except KeyboardInterrupt:
+            print("Stopping daemon.")
+            break
+        except RECONNECT_ERRORS as e:
+            print(f"IDLE connection lost ({str(e)}), reconnecting in {retry_delay}s...")
+            time.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, 300)
+            listener.logout()
+        except Exception as e:
+            print(f"Error in daemon loop: {str(e)}")
+            time.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, 300)
+
+    listener.logout()
+
+def process_new_emails() -> int:
+    """
+    Fetches and processes one batch of new emails.
+
+    Returns:
+        int: Number of emails the UID high-water mark moved past
+    """
+    emails, stats = process_emails(iter_emails(limit=EMAIL_BATCH_SIZE))
+    if emails:
+        print_summary(emails, stats)
+    return stats["marked"]
 
 def main():
     """
     Main execution function for the email processing system.
     """
-    try:
-        # Initialize stats dictionary
-        stats = {
-            "total": 0,
-            "priority": {"High": 0, "Medium": 0, "Low": 0, "Unknown": 0},
-            "category": {"Personal": 0, "Work": 0, "Promotional": 0, "Newsletter": 0,
-                        "GitHub": 0, "YouTube": 0, "Receipts_Invoices": 0, "Other": 0, "Unknown": 0},
-            "needs_response": {"Yes": 0, "No": 0, "Unknown": 0},
-            "direct_categorization": []
-        }
+    parser = argparse.ArgumentParser(description="AI-powered Gmail inbox management")
+    parser.add_argument("--daemon", action="store_true",
+                        help="Stay running and process new mail as it arrives (IMAP IDLE)")
+    args = parser.parse_args()
 
+    try:
         # Check if API keys are available
         if not GROQ_API_KEY:
             print("Error: GROQ_API_KEY not found in environment variables")
@@ -38,265 +612,47 @@ def main():
             print("Error: GEMINI_API_KEY not found in environment variables")
             exit(1)
 
-        # Check if email file exists and clear it
-        email_file_path = "current_email.txt"
-        clear_email_file(email_file_path)
+        # One STATUS command decides whether there is anything to do, before
+        # the agents (and crewai) are loaded
+        if not args.daemon:
+            try:
+                if not has_new_mail():
+                    print("No new emails.")
+                    exit(0)
+            except Exception as check_error:
+                print(f"Error checking for new mail: {str(check_error)}")
 
-        # Create agents
-        email_categorizer = create_email_categorizer()
-        notifier_agent = create_notifier_agent()
+        # Agents are created by each worker thread on first use
+        print(f"Notification rules: {notification_rules.describe()}")
 
-        print("Fetching emails...")
-        emails = fetch_emails_func(limit=EMAIL_BATCH_SIZE)
+        # Create all Priority/Category/Needs_Response labels once up front
+        ensure_standard_labels()
+
+        if args.daemon:
+            run_daemon()
+            return
 
-        if isinstance(emails, str) and emails.startswith("Error"):
-            print(emails)
+        print("Fetching emails...")
+        # Emails are streamed: analysis starts as soon as the first one arrives
+        try:
+            email_stream = iter_emails(limit=EMAIL_BATCH_SIZE)
+            first_email = next(email_stream, None)
+        except Exception as fetch_error:
+            print(f"Error fetching emails: {str(fetch_error)}")
             exit(1)
-        elif not emails:  # Added check for empty list
+
+        if first_email is None:
             print("No unread emails found.")
             exit(0)
-        else:
-            print(f"Fetched {len(emails)} emails. Starting analysis...")
-
-            # Process one email at a time using file-based approach with agents
-            for i, email_data in enumerate(emails):
-                print(f"\nProcessing email {i+1} of {len(emails)}...")
-                print(f"Subject: {email_data['subject']}")
-
-                # Step 1: Write email to file
-                print(f"Writing email {i+1} to file...")
-                if not write_email_to_file(email_data, email_file_path):
-                    print(f"Error writing email {i+1} to file. Skipping.")
-                    continue
-
-                # Step 2: Read email from file
-                email_content = read_email_from_file(email_file_path)
-                if not email_content:
-                    print(f"Error reading email {i+1} from file. Skipping.")
-                    continue
-
-                # Step 3: Create tasks for this email
-                print(f"Creating tasks for email {i+1}...")
-                single_email_tasks = create_email_tasks([email_data], email_categorizer, notifier_agent)
-
-                # Step 4: Create and run the crew for this email
-                crew = Crew(
-                    agents=[email_categorizer, notifier_agent],
-                    tasks=single_email_tasks,
-                    verbose=True
-                )
-
-                try:
-                    print(f"Running Crew for email {i+1}...")
-                    results = crew.kickoff()
-
-                    print(f"\n--- Email {i+1} Processing Finished ---")
-                    print(f"Email {i+1} processed successfully.")
-
-                    # Print a summary of the results and apply labels
-                    for j, result in enumerate(results):
-                        if j == 0:  # First result is categorization
-                            print(f"Categorization result:\n{result}")
-
-                            # Store categorization for statistics
-                            stats["direct_categorization"].append({
-                                "subject": email_data['subject'],
-                                "result": result
-                            })
-
-                            # Apply labels based on categorization
-                            from tools.email_tools import apply_categorization_labels
-                            # Convert tuple to string if needed
-                            if isinstance(result, tuple):
-                                result_str = result[1] if len(result) > 1 and result[1] is not None else str(result[0])
-                            else:
-                                result_str = str(result)
-
-                            label_result = apply_categorization_labels(email_data['id'], result_str)
-                            print(f"Label application result: {label_result}")
-
-                        elif j == 1:  # Second result is notification decision
-                            print(f"Notification decision:\n{result}")
-
-                except Exception as crew_error:
-                    error_msg = str(crew_error).lower()
-                    if "rate_limit" in error_msg or "quota" in error_msg or "429" in error_msg:
-                        print(f"\n--- Rate limit reached on email {i+1} ---")
-                        print("The API rate limit has been reached. Please try again later.")
-                        print("Using fallback categorization...")
-
-                        # Read the email content from file
-                        email_content = read_email_from_file(email_file_path)
-                        if email_content:
-                            # Extract basic info
-                            from tools.categorization_tools import categorize_with_gemini_func
-                            result = categorize_with_gemini_func(email_content)
-                            print(f"Fallback categorization result:\n{result}")
-
-                            # Check if notification is needed based on fallback categorization
-                            priority = "Low"
-                            category = "Other"
-                            needs_response = "No"
-                            summary = ""
-
-                            for line in result.split('\n'):
-                                if line.startswith("Priority:"):
-                                    priority = line.replace("Priority:", "").strip()
-                                elif line.startswith("Category:"):
-                                    category = line.replace("Category:", "").strip()
-                                elif line.startswith("Needs Response:"):
-                                    needs_response = line.replace("Needs Response:", "").strip()
-                                elif line.startswith("Summary:"):
-                                    summary = line.replace("Summary:", "").strip()
-
-                            # Store categorization for statistics
-                            stats["direct_categorization"].append({
-                                "subject": email_data['subject'],
-                                "result": result
-                            })
-
-                            # Apply labels based on categorization
-                            from tools.email_tools import apply_categorization_labels
-                            # Convert tuple to string if needed
-                            if isinstance(result, tuple):
-                                result_str = result[1] if len(result) > 1 and result[1] is not None else str(result[0])
-                            else:
-                                result_str = str(result)
-
-                            label_result = apply_categorization_labels(email_data['id'], result_str)
-                            print(f"Label application result: {label_result}")
-
-                            # Apply notification criteria
-                            should_notify = False
-                            if priority.upper() == "HIGH":
-                                should_notify = True
-                            elif needs_response.upper() == "YES" and category.upper() not in ["NEWSLETTER", "PROMOTIONAL"]:
-                                should_notify = True
-
-                            if should_notify:
-                                from tools.notification_tools import send_telegram_notification_func
-                                notification_message = f"From: {email_data['from']}\nSubject: {email_data['subject']}\nPriority: {priority}\nCategory: {category}\nNeeds Response: {needs_response}\nSummary: {summary}"
-                                send_telegram_notification_func(notification_message)
-                                print(f"Notification sent for email {i+1} using fallback mechanism")
-                    elif "token" in error_msg:
-                        print(f"\n--- Token limit reached on email {i+1} ---")
-                        print("The email content was too large. Try with a smaller email.")
-                    else:
-                        print(f"\n--- Error processing email {i+1}: {str(crew_error)} ---")
-
-                # Step 5: Clear the file for the next email
-                clear_email_file(email_file_path)
-
-                # Add a delay between emails to avoid rate limits
-                if i < len(emails) - 1:  # Don't sleep after the last email
-                    print(f"Waiting 2 seconds before processing next email...")
-                    time.sleep(2)  # 2 second delay between emails
-
-            # Update total emails in statistics
-            stats["total"] = len(emails)
-
-            # Print summary statistics
-            print("\n--- Email Processing Summary ---")
-            print(f"Total emails processed: {stats['total']}")
-
-            # Print statistics for processed emails
-            for email_data in emails:
-                email_id = email_data['id']
-                # Try to get the labels applied to this email
-                try:
-                    mail = imaplib.IMAP4_SSL("imap.gmail.com")
-                    mail.login(GMAIL_USERNAME, GMAIL_APP_PASSWORD)
-                    mail.select("inbox")
-
-                    # Get the labels for this email
-                    _, msg_data = mail.fetch(email_id.encode(), '(X-GM-LABELS)')
-                    if msg_data and msg_data[0]:
-                        labels_str = msg_data[0].decode()
-
-                        # Extract priority
-                        if any(f"Priority/{priority}" in labels_str or f"Priority.{priority}" in labels_str for priority in ["High", "Medium", "Low"]):
-                            for priority in ["High", "Medium", "Low"]:
-                                if f"Priority/{priority}" in labels_str or f"Priority.{priority}" in labels_str:
-                                    stats["priority"][priority] += 1
-                                    break
-                        else:
-                            stats["priority"]["Unknown"] += 1
-
-                        # Extract category
-                        category_found = False
-                        for category in ["Personal", "Work", "Promotional", "Newsletter", "GitHub", "YouTube", "Receipts_Invoices", "Other"]:
-                            if f"Category/{category}" in labels_str or f"Category.{category}" in labels_str:
-                                stats["category"][category] += 1
-                                category_found = True
-                                break
-                        if not category_found:
-                            stats["category"]["Unknown"] += 1
-
-                        # Extract needs response
-                        if "Needs_Response" in labels_str:
-                            stats["needs_response"]["Yes"] += 1
-                        else:
-                            stats["needs_response"]["No"] += 1
-                    else:
-                        stats["priority"]["Unknown"] += 1
-                        stats["category"]["Unknown"] += 1
-                        stats["needs_response"]["Unknown"] += 1
-
-                    mail.close()
-                    mail.logout()
-                except Exception as e:
-                    print(f"Error getting labels for email {email_id}: {str(e)}")
-                    stats["priority"]["Unknown"] += 1
-                    stats["category"]["Unknown"] += 1
-                    stats["needs_response"]["Unknown"] += 1
-
-            # Print the statistics
-            print("\nPriority Breakdown:")
-            for priority, count in stats["priority"].items():
-                if count > 0:
-                    print(f"  {priority}: {count}")
-
-            print("\nCategory Breakdown:")
-            for category, count in stats["category"].items():
-                if count > 0:
-                    print(f"  {category}: {count}")
-
-            print("\nNeeds Response Breakdown:")
-            for response, count in stats["needs_response"].items():
-                if count > 0:
-                    print(f"  {response}: {count}")
-
-            # Print direct categorization results
-            print("\nDirect Categorization Results:")
-            for item in stats["direct_categorization"]:
-                print(f"\nSubject: {item['subject']}")
-                result = item['result']
-
-                # Parse the categorization result
-                priority = "Unknown"
-                category = "Unknown"
-                needs_response = "Unknown"
-
-                # Convert tuple to string if needed
-                if isinstance(result, tuple):
-                    result_str = result[1] if len(result) > 1 and result[1] is not None else str(result[0])
-                else:
-                    result_str = str(result)
-
-                # Try to extract structured data
-                for line in result_str.split('\n'):
-                    if line.startswith("Priority:"):
-                        priority = line.replace("Priority:", "").strip()
-                    elif line.startswith("Category:"):
-                        category = line.replace("Category:", "").strip()
-                    elif line.startswith("Needs Response:"):
-                        needs_response = line.replace("Needs Response:", "").strip()
-
-                print(f"  Priority: {priority}")
-                print(f"  Category: {category}")
-                print(f"  Needs Response: {needs_response}")
-
-            print("\n--- All emails processed ---")
+
+        print("Starting analysis...")
+        emails, stats = process_emails(chain([first_email], email_stream))
+        print_summary(emails, stats)
+
+        # Give the outbox a moment to deliver; anything left is sent by the next run
+        remaining = get_notification_outbox().flush(NOTIFICATION_FLUSH_SECONDS)
+        if remaining:
+            print(f"{remaining} notifications still queued, they will be sent on the next run")
 
     except Exception as e:
         print(f"Error in email pipeline: {str(e)}")
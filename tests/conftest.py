@@ -0,0 +1,18 @@
+"""
+Shared pytest setup.
+
+The tests import the modules from the repository root, and every state
+file (ledger, caches, rate limits) goes to a temporary directory instead
+of .inbox_state.
+"""
+
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# Read by config.py on import, so this has to happen before any test module imports it
+os.environ.setdefault("STATE_DIR", tempfile.mkdtemp(prefix="inbox-state-"))
@@ -0,0 +1,79 @@
+"""
+Tests for turning raw MIME messages into the pipeline's email dictionaries.
+"""
+
+from email.message import EmailMessage
+
+from tools.email_parsing import decode_header_value, extract_body, parse_email
+
+
+def make_message(plain=None, html=None, attachment=None, subject="Hello"):
+    msg = EmailMessage()
+    msg["Subject"] = subject
+    msg["From"] = "Ann <ann@example.com>"
+    msg["Date"] = "Mon, 3 Jun 2024 10:00:00 +0000"
+    if plain is not None:
+        msg.set_content(plain)
+    if html is not None:
+        if plain is None:
+            msg.set_content(html, subtype="html")
+        else:
+            msg.add_alternative(html, subtype="html")
+    if attachment is not None:
+        msg.add_attachment(attachment, maintype="application", subtype="pdf", filename="invoice.pdf")
+    return msg
+
+
+def test_decode_header_value():
+    assert decode_header_value("=?utf-8?q?caf=C3=A9?= menu") == "café menu"
+    assert decode_header_value(None) == ""
+
+
+def test_decode_header_value_unknown_charset():
+    assert "menu" in decode_header_value("=?x-unknown?q?caf=E9?= menu")
+
+
+def test_parse_email_fields():
+    email_data = parse_email("7", make_message(plain="Can we meet tomorrow?"))
+    assert email_data["id"] == "7"
+    assert email_data["subject"] == "Hello"
+    assert email_data["from"] == "Ann <ann@example.com>"
+    assert email_data["body"] == "Can we meet tomorrow?"
+    assert email_data["mime_parts"] == 1
+    assert email_data["attachments"] == 0
+
+
+def test_html_only_body_is_converted():
+    msg = make_message(html="<html><style>p {color: red}</style><body><p>Your order has <b>shipped</b></p></body></html>")
+    assert extract_body(msg) == "Your order has shipped"
+
+
+def test_plain_part_is_preferred():
+    msg = make_message(plain="Plain text", html="<p>HTML text</p>")
+    assert extract_body(msg) == "Plain text"
+
+
+def test_attachments_are_counted():
+    email_data = parse_email("1", make_message(plain="See attached", attachment=b"%PDF-1.4"))
+    assert email_data["mime_parts"] == 2
+    assert email_data["attachments"] == 1
+
+
+def test_body_chars_is_measured_before_trimming():
+    long_body = "We need to discuss the contract renewal terms. " * 200
+    email_data = parse_email("1", make_message(plain=long_body), max_tokens=20)
+    assert len(email_data["body"]) < 200
+    assert email_data["body_chars"] >= len(long_body.strip())
+
+
+def test_body_chars_of_html_counts_visible_text():
+    email_data = parse_email("1", make_message(html="<div style='x' class='y'>Hi</div>"))
+    assert email_data["body_chars"] < 10
+
+
+def test_structure_overrides_truncated_counts():
+    structure = {"mime_parts": 5, "attachments": 3, "text_chars": 50000}
+    email_data = parse_email("1", make_message(plain="Only the start was fetched"), structure=structure)
+    assert email_data["mime_parts"] == 5
+    assert email_data["attachments"] == 3
+    assert email_data["body_chars"] == 50000
@@ -0,0 +1,69 @@
+"""
+Tests for the IMAP response helpers: FETCH responses, UID sets and BODYSTRUCTURE.
+"""
+
+from tools.email_tools import compress_uid_set, parse_bodystructure, parse_fetch_response
+
+
+def test_compress_uid_set_collapses_ranges():
+    assert compress_uid_set(["1", "2", "3", "7"]) == "1:3,7"
+
+
+def test_compress_uid_set_sorts_and_deduplicates():
+    assert compress_uid_set(["9", "3", "4", "4", "10", "1"]) == "1,3:4,9:10"
+
+
+def test_compress_uid_set_single_and_empty():
+    assert compress_uid_set(["42"]) == "42"
+    assert compress_uid_set([]) == ""
+
+
+def test_parse_fetch_response_groups_sections_by_uid():
+    msg_data = [
+        (b'1 (UID 42 X-GM-MSGID 777 BODY[HEADER.FIELDS (FROM SUBJECT)] {20}', b'From: a@b.c\r\n\r\n'),
+        (b' BODY[TEXT]<0> {5}', b'hello'),
+        b')',
+        (b'2 (UID 43 BODY[HEADER.FIELDS (FROM SUBJECT)] {12}', b'From: d@e.f\r\n'),
+        b')',
+    ]
+    messages = parse_fetch_response(msg_data)
+
+    assert set(messages) == {"42", "43"}
+    assert messages["42"]["HEADER"] == b'From: a@b.c\r\n\r\n'
+    assert messages["42"]["TEXT"] == b'hello'
+    assert b'X-GM-MSGID 777' in messages["42"]["META"]
+    assert "TEXT" not in messages["43"]
+
+
+def test_parse_fetch_response_ignores_none_and_responses_without_uid():
+    msg_data = [None, b'3 (FLAGS (\\Seen))', (b'4 (UID 9 BODY[TEXT]<0> {2}', b'hi'), b')']
+    assert list(parse_fetch_response(msg_data)) == ["9"]
+
+
+def test_parse_fetch_response_keeps_non_literal_items_in_meta():
+    msg_data = [b'1 (UID 5 X-GM-LABELS ("\\\\Inbox" "Priority/High"))']
+    assert b'Priority/High' in parse_fetch_response(msg_data)["5"]["META"]
+
+
+def test_parse_bodystructure_single_part():
+    meta = b'1 (UID 1 BODYSTRUCTURE ("TEXT" "PLAIN" ("CHARSET" "us-ascii") NIL NIL "7BIT" 2279 48) BODY[TEXT]<0> {4}'
+    assert parse_bodystructure(meta) == {"mime_parts": 1, "attachments": 0, "text_chars": 2279}
+
+
+def test_parse_bodystructure_nested_multipart_with_attachments():
+    meta = (
+        b'1 (UID 42 BODYSTRUCTURE ((("text" "plain" ("charset" "utf-8") NIL NIL "quoted-printable" 12345 200 NIL NIL NIL)'
+        b'("text" "html" ("charset" "utf-8") NIL NIL "7bit" 40000 500 NIL NIL NIL) "alternative" ("boundary" "b1") NIL NIL)'
+        # A literal inside the structure arrives as its own tuple: only "{9}" is left in META
+        b'("application" "pdf" ("name" {9}'
+        b') NIL NIL "base64" 88000 NIL ("attachment" ("filename" "a \\"b\\".pdf")) NIL NIL)'
+        b'("message" "rfc822" NIL NIL NIL "7bit" 500 ("date" "subj" NIL NIL NIL NIL NIL NIL NIL NIL) '
+        b'("text" "plain" NIL NIL NIL "7bit" 10 1 NIL NIL NIL) 20 NIL ("attachment" NIL) NIL)'
+        b' "mixed" ("boundary" "b0") NIL NIL) BODY[HEADER.FIELDS (FROM)] {5}'
+    )
+    assert parse_bodystructure(meta) == {"mime_parts": 4, "attachments": 2, "text_chars": 12345}
+
+
+def test_parse_bodystructure_missing_or_truncated():
+    assert parse_bodystructure(b'1 (UID 1 X-GM-MSGID 5)') is None
+    assert parse_bodystructure(b'1 (UID 1 BODYSTRUCTURE ("text" "plain" ') is None
@@ -0,0 +1,124 @@
+"""
+Tests for the processing ledger and the UID prefix the high-water mark may move past.
+"""
+
+import sqlite3
+
+import pytest
+
+from tools.categorization_result import CategorizationResult
+from tools.ledger import ProcessingLedger, message_key
+
+RESULT = CategorizationResult("Low", "Work", "No", "No", "A status update")
+
+
+def make_email(uid, msgid=None):
+    return {"id": str(uid), "msgid": str(msgid or 1000 + uid), "uidvalidity": 7, "subject": f"Subject {uid}", "from": "a@b.c"}
+
+
+def finish(ledger, email_data):
+    ledger.record_categorization(email_data, RESULT)
+    ledger.mark_labeled([message_key(email_data)])
+    ledger.mark_notified(message_key(email_data), queued=False)
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    return ProcessingLedger(str(tmp_path / "ledger.sqlite3"), account="me@example.com")
+
+
+def test_message_key_prefers_msgid():
+    assert message_key(make_email(5, msgid=42)) == "42"
+    assert message_key({"id": "5", "uidvalidity": 7}) == "uid:7:5"
+
+
+def test_stages_are_recorded(ledger):
+    email_data = make_email(1)
+    ledger.record_categorization(email_data, RESULT)
+    entry = ledger.get(message_key(email_data))
+    assert entry["result"].fields() == RESULT.fields()
+    assert entry["labeled_at"] is None
+
+    ledger.mark_labeled([message_key(email_data)])
+    ledger.mark_notified(message_key(email_data), queued=True)
+    entry = ledger.get(message_key(email_data))
+    assert entry["labeled_at"] is not None
+    assert entry["notification"] == "queued"
+    assert ledger.counts() == {"total": 1, "categorized": 1, "labeled": 1, "notified": 1}
+
+
+def test_prefix_covers_finished_emails_in_uid_order(ledger):
+    emails = [make_email(uid) for uid in (12, 10, 11)]
+    for email_data in emails:
+        finish(ledger, email_data)
+    assert [email_data["id"] for email_data in ledger.processed_prefix(emails)] == ["10", "11", "12"]
+
+
+def test_prefix_stops_at_unfinished_email(ledger):
+    emails = [make_email(uid) for uid in (10, 11, 12)]
+    finish(ledger, emails[0])
+    ledger.record_categorization(emails[1], RESULT)  # not labeled yet
+    finish(ledger, emails[2])
+
+    assert [email_data["id"] for email_data in ledger.processed_prefix(emails)] == ["10"]
+    assert ledger.get(message_key(emails[1]))["attempts"] == 1
+
+
+def test_prefix_stops_at_unknown_email(ledger):
+    emails = [make_email(10), make_email(11)]
+    finish(ledger, emails[1])
+    assert ledger.processed_prefix(emails) == []
+
+
+def test_attempts_are_counted_once_per_run(ledger):
+    emails = [make_email(10)]
+    ledger.processed_prefix(emails)
+    assert ledger.attempted(emails[0])
+
+    # A second pass in the same run doesn't count again
+    ledger.processed_prefix(emails)
+    assert ledger.get(message_key(emails[0]))["attempts"] == 1
+
+    ledger.start_run()
+    assert not ledger.attempted(emails[0])
+    ledger.processed_prefix(emails)
+    assert ledger.get(message_key(emails[0]))["attempts"] == 2
+
+
+def test_unfinished_email_is_given_up_after_max_attempts(ledger):
+    emails = [make_email(10), make_email(11)]
+    finish(ledger, emails[1])
+    for _ in range(2):
+        assert ledger.processed_prefix(emails, max_attempts=3) == []
+        ledger.start_run()
+    assert [email_data["id"] for email_data in ledger.processed_prefix(emails, max_attempts=3)] == ["10", "11"]
+
+
+def test_pending_only_lists_unfinished_entries(ledger):
+    done, pending = make_email(10), make_email(11)
+    finish(ledger, done)
+    ledger.record_categorization(pending, RESULT)
+    assert [entry["uid"] for entry in ledger.recent(pending_only=True)] == ["11"]
+
+
+def test_without_database_every_email_is_processed():
+    ledger = ProcessingLedger(path="", account="me@example.com")
+    emails = [make_email(11), make_email(10)]
+    assert not ledger.enabled
+    assert [email_data["id"] for email_data in ledger.processed_prefix(emails)] == ["10", "11"]
+
+
+def test_old_database_gets_attempts_column(tmp_path):
+    path = str(tmp_path / "old.sqlite3")
+    db = sqlite3.connect(path)
+    db.execute(
+        "CREATE TABLE messages (account TEXT NOT NULL, msgid TEXT NOT NULL, uid TEXT, subject TEXT, sender TEXT, "
+        "result TEXT, categorized_at REAL, labeled_at REAL, notified_at REAL, notification TEXT, "
+        "updated_at REAL NOT NULL, PRIMARY KEY (account, msgid))"
+    )
+    db.commit()
+    db.close()
+
+    ledger = ProcessingLedger(path, account="me@example.com")
+    assert ledger.enabled
+    assert ledger.record_attempt(make_email(10)) == 1
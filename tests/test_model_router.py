@@ -0,0 +1,149 @@
+"""
+Tests for the complexity score that picks the light or the heavy categorization route.
+"""
+
+import pytest
+
+import tools.model_router as router
+from tools.categorization_result import CategorizationResult
+
+GITHUB_PING = "From: GitHub <noreply@github.com>\nSubject: New commit\nDate: x\nID: 1\nBody:\nA commit was pushed to the repository\n"
+BUSINESS_THREAD = "From: Ann <ann@client.example>\nSubject: Contract\nDate: x\nID: 2\nBody:\nAbout the contract terms we discussed\n"
+PASSWORD_RESET = "From: Shop <no-reply@shop.example>\nSubject: Password reset\nDate: x\nID: 3\nBody:\nReset your password here\n"
+
+
+class FakeSenderIndex:
+    def __init__(self, agreement):
+        self.value = agreement
+
+    def agreement(self, email_content):
+        return self.value
+
+
+class FakeModel:
+    def __init__(self, confidence):
+        self.confidence = confidence
+
+    def predict(self, email_content):
+        return {}, self.confidence
+
+
+def make_email(body_chars=40, mime_parts=1, attachments=0):
+    return {"id": "1", "body": "short", "body_chars": body_chars, "mime_parts": mime_parts, "attachments": attachments}
+
+
+@pytest.fixture
+def routing(monkeypatch):
+    """
+    Routing on, a known sender with a consistent history and no local model.
+    """
+    monkeypatch.setattr(router, "MODEL_ROUTING", True)
+    monkeypatch.setattr(router, "ROUTER_THRESHOLD", 0.35)
+    monkeypatch.setattr(router, "ROUTER_LONG_EMAIL_CHARS", 3000)
+    monkeypatch.setattr(router, "get_sender_index", lambda: FakeSenderIndex(1.0))
+    monkeypatch.setattr(router, "get_local_classifier", lambda: None)
+    return monkeypatch
+
+
+def test_weights_add_up_to_one():
+    assert sum(router.WEIGHTS.values()) == pytest.approx(1.0)
+
+
+def test_length_uses_the_body_length_before_trimming(routing):
+    signals = router.complexity_signals(make_email(body_chars=6000), GITHUB_PING)
+    assert signals["length"] == 1.0
+    assert router.complexity_signals(make_email(body_chars=1500), GITHUB_PING)["length"] == pytest.approx(0.5)
+
+
+def test_length_falls_back_to_the_body(routing):
+    email_data = {"id": "1", "body": "x" * 300}
+    assert router.complexity_signals(email_data, GITHUB_PING)["length"] == pytest.approx(0.1)
+
+
+@pytest.mark.parametrize("parts, attachments, expected", [
+    (1, 0, 0.0),
+    (3, 0, 0.5),
+    (2, 1, 0.75),
+    (9, 4, 1.0),
+])
+def test_mime_signal(routing, parts, attachments, expected):
+    signals = router.complexity_signals(make_email(mime_parts=parts, attachments=attachments), GITHUB_PING)
+    assert signals["mime"] == pytest.approx(expected)
+
+
+def test_sender_signal(routing):
+    assert router.complexity_signals(make_email(), GITHUB_PING)["sender"] == 0.0
+    routing.setattr(router, "get_sender_index", lambda: FakeSenderIndex(None))
+    assert router.complexity_signals(make_email(), GITHUB_PING)["sender"] == 0.5
+    routing.setattr(router, "get_sender_index", lambda: FakeSenderIndex(0.25))
+    assert router.complexity_signals(make_email(), GITHUB_PING)["sender"] == 0.75
+
+
+def test_classifier_signal_from_keywords(routing):
+    # Exactly one category keyword matches: sure
+    assert router.complexity_signals(make_email(), GITHUB_PING)["classifier"] == 0.0
+    # No category keyword: unsure
+    assert router.complexity_signals(make_email(), BUSINESS_THREAD)["classifier"] == 0.5
+
+
+def test_classifier_signal_from_local_model(routing):
+    routing.setattr(router, "get_local_classifier", lambda: FakeModel(0.8))
+    assert router.complexity_signals(make_email(), BUSINESS_THREAD)["classifier"] == pytest.approx(0.2)
+
+
+def test_routing_off_always_takes_the_heavy_route(routing):
+    routing.setattr(router, "MODEL_ROUTING", False)
+    assert router.choose_route(make_email(), GITHUB_PING) == ("heavy", 0.0)
+
+
+def test_simple_email_takes_the_light_route(routing):
+    route, score = router.choose_route(make_email(body_chars=40), GITHUB_PING)
+    assert route == "light"
+    assert score < 0.35
+
+
+def test_long_email_from_unknown_sender_takes_the_heavy_route(routing):
+    routing.setattr(router, "get_sender_index", lambda: FakeSenderIndex(None))
+    route, score = router.choose_route(make_email(body_chars=9000, mime_parts=3, attachments=1), BUSINESS_THREAD)
+    assert route == "heavy"
+    assert score >= 0.35
+
+
+def test_long_thread_scores_higher_than_a_ping(routing):
+    _, ping = router.choose_route(make_email(body_chars=40), GITHUB_PING)
+    _, thread = router.choose_route(make_email(body_chars=9000), GITHUB_PING)
+    assert thread - ping == pytest.approx(router.WEIGHTS["length"], abs=0.01)
+
+
+def test_high_stakes_mail_always_takes_the_heavy_route(routing):
+    assert router.choose_route(make_email(), PASSWORD_RESET) == ("heavy", 1.0)
+
+
+def test_light_categorization_escalates_without_an_answer(routing):
+    routing.setattr(router, "provider_categorization", lambda provider, content, wait_for_quota=True: None)
+    escalated = router.counters["light"]["escalated"]
+    assert router.light_categorization(GITHUB_PING) is None
+    assert router.counters["light"]["escalated"] == escalated + 1
+
+
+def test_light_categorization_audit_uses_the_reference(routing):
+    light = CategorizationResult("Low", "GitHub", "No", "No", "light")
+    reference = CategorizationResult("Medium", "GitHub", "No", "No", "reference")
+    answers = {"groq": light, "gemini": reference}
+    routing.setattr(router, "provider_categorization", lambda provider, content, wait_for_quota=True: answers[provider])
+    routing.setattr(router, "ROUTER_AUDIT_RATE", 1.0)
+    audited = router.counters["light"]["audited"]
+    agreed = router.counters["light"]["agreed"]
+
+    assert router.light_categorization(GITHUB_PING) is reference
+    assert router.counters["light"]["audited"] == audited + 1
+    assert router.counters["light"]["agreed"] == agreed
+
+
+def test_route_stats_mean_latency():
+    emails = router.counters["heavy"]["emails"]
+    seconds = router.counters["heavy"]["seconds"]
+    router.record_route("heavy", 2.0)
+    stats = router.route_stats()["heavy"]
+    assert stats["emails"] == emails + 1
+    assert stats["mean_seconds"] == pytest.approx((seconds + 2.0) / (emails + 1))
@@ -0,0 +1,74 @@
+"""
+Tests for the notification rules compiled from NOTIFICATION_CRITERIA.
+"""
+
+import pytest
+
+from tools.notification_rules import NotificationRules
+
+DEFAULT_CRITERIA = {
+    "high_priority": True,
+    "needs_response": True,
+    "medium_priority_needs_response": True,
+    "low_priority_needs_response": False,
+    "excluded_categories": ["Newsletter", "Promotional"],
+}
+
+
+@pytest.fixture
+def rules():
+    return NotificationRules(DEFAULT_CRITERIA)
+
+
+@pytest.mark.parametrize("priority, category, needs_response, expected", [
+    ("High", "Work", "No", True),
+    ("High", "Work", "Yes", True),
+    ("Medium", "Work", "Yes", True),
+    ("Medium", "Work", "No", False),
+    ("Low", "Personal", "Yes", False),
+    ("Low", "Personal", "No", False),
+])
+def test_default_criteria(rules, priority, category, needs_response, expected):
+    assert rules.should_notify(priority, category, needs_response) is expected
+
+
+@pytest.mark.parametrize("needs_response", ["Yes", "No"])
+def test_high_priority_notifies_in_excluded_categories(rules, needs_response):
+    # e.g. a security alert sent through a mailing service
+    assert rules.should_notify("High", "Newsletter", needs_response)
+    assert rules.should_notify("High", "Promotional", needs_response)
+
+
+def test_excluded_categories_suppress_needs_response(rules):
+    assert not rules.should_notify("Medium", "Newsletter", "Yes")
+    assert not rules.should_notify("Medium", "Promotional", "Yes")
+
+
+def test_values_are_case_insensitive(rules):
+    assert rules.should_notify(" high ", "work", "no")
+    assert not rules.should_notify("MEDIUM", "newsletter", "YES")
+
+
+def test_high_priority_off_only_keeps_needs_response():
+    rules = NotificationRules({**DEFAULT_CRITERIA, "high_priority": False})
+    assert not rules.should_notify("High", "Work", "No")
+    assert rules.should_notify("High", "Work", "Yes")
+    assert not rules.should_notify("High", "Newsletter", "Yes")
+
+
+def test_low_priority_needs_response_opt_in():
+    rules = NotificationRules({**DEFAULT_CRITERIA, "low_priority_needs_response": True})
+    assert rules.should_notify("Low", "Work", "Yes")
+    assert not rules.should_notify("Low", "Promotional", "Yes")
+
+
+def test_needs_response_off_disables_priority_combinations():
+    rules = NotificationRules({**DEFAULT_CRITERIA, "needs_response": False})
+    assert not rules.should_notify("Medium", "Work", "Yes")
+    assert rules.should_notify("High", "Work", "No")
+
+
+def test_describe_lists_rules_and_exclusions(rules):
+    description = rules.describe()
+    assert "Medium + needs response" in description
+    assert "newsletter" in description
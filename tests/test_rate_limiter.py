@@ -0,0 +1,132 @@
+"""
+Tests for the token buckets and the rate-limit error helpers.
+"""
+
+import pytest
+
+from tools.rate_limiter import RateLimiter, TokenBucket, is_rate_limit_error, parse_duration
+
+NOW = 1_000_000.0
+
+
+def make_bucket(per_minute=60.0, capacity=2.0):
+    bucket = TokenBucket(per_minute, capacity)
+    bucket.updated_at = NOW
+    return bucket
+
+
+def test_burst_is_free_then_calls_are_spaced():
+    bucket = make_bucket(per_minute=60.0, capacity=2.0)
+    assert bucket.reserve(1, NOW) == 0.0
+    assert bucket.reserve(1, NOW) == 0.0
+    # One token per second: the third call waits a second, the fourth two
+    assert bucket.reserve(1, NOW) == pytest.approx(1.0)
+    assert bucket.reserve(1, NOW) == pytest.approx(2.0)
+
+
+def test_refill_is_capped_at_capacity():
+    bucket = make_bucket(per_minute=60.0, capacity=2.0)
+    bucket.reserve(2, NOW)
+    bucket.refill(NOW + 3600)
+    assert bucket.tokens == 2.0
+
+
+def test_several_tokens_at_once_go_into_debt():
+    bucket = make_bucket(per_minute=30.0, capacity=2.0)
+    # Three calls against a burst of two: the last one waits one refill (2s)
+    assert bucket.reserve(3, NOW) == pytest.approx(2.0)
+
+
+def test_block_drains_the_bucket_until_it_ends():
+    bucket = make_bucket(per_minute=60.0, capacity=2.0)
+    bucket.block(NOW + 10)
+    assert bucket.reserve(1, NOW) == pytest.approx(11.0)
+
+
+def test_state_round_trip():
+    bucket = make_bucket()
+    bucket.reserve(1.5, NOW)
+    restored = make_bucket()
+    restored.restore(bucket.to_dict())
+    assert restored.to_dict() == bucket.to_dict()
+
+
+@pytest.fixture
+def limiter():
+    return RateLimiter({"gemini": {"per_minute": 10, "burst": 3}}, path="")
+
+
+def test_try_acquire_never_waits(limiter):
+    assert limiter.try_acquire("gemini", 3)
+    assert not limiter.try_acquire("gemini")
+
+
+def test_unknown_provider_is_unlimited(limiter):
+    assert limiter.acquire("other", 100) == 0.0
+    assert limiter.try_acquire("other", 100)
+
+
+def test_prepaid_reserves_once(limiter):
+    with limiter.prepaid({"gemini": 2}, {"gemini": 1}):
+        assert limiter.buckets["gemini"].tokens == pytest.approx(0.0, abs=1e-3)
+        # The tool's request draws on the reservation, not on the bucket
+        assert limiter.acquire("gemini") == 0.0
+        assert limiter.buckets["gemini"].tokens == pytest.approx(0.0, abs=1e-3)
+        # Beyond the reservation the bucket is used again
+        assert not limiter.try_acquire("gemini")
+
+
+def test_prepaid_credit_ends_with_the_block(limiter):
+    with limiter.prepaid({}, {"gemini": 1}):
+        pass
+    assert limiter.try_acquire("gemini", 2)
+    assert not limiter.try_acquire("gemini")
+
+
+def test_state_is_shared_through_the_file(tmp_path):
+    path = str(tmp_path / "limits.json")
+    first = RateLimiter({"gemini": {"per_minute": 1, "burst": 2}}, path=path)
+    assert first.try_acquire("gemini", 2)
+    second = RateLimiter({"gemini": {"per_minute": 1, "burst": 2}}, path=path)
+    assert not second.try_acquire("gemini")
+
+
+@pytest.mark.parametrize("value, seconds", [
+    ("30", 30.0),
+    ("7.66s", 7.66),
+    ("2m59.56s", 179.56),
+    ("120ms", 0.12),
+    ("1h2m", 3720.0),
+    (None, None),
+    ("soon", None),
+])
+def test_parse_duration(value, seconds):
+    assert parse_duration(value) == (pytest.approx(seconds) if seconds is not None else None)
+
+
+class RateLimitError(Exception):
+    pass
+
+
+class HttpError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def test_is_rate_limit_error():
+    assert is_rate_limit_error(RateLimitError("slow down"))
+    assert is_rate_limit_error(HttpError(429))
+    assert not is_rate_limit_error(HttpError(500))
+    # The word "quota" alone isn't a 429
+    assert not is_rate_limit_error(ValueError("quota project not set"))
+
+
+def test_is_rate_limit_error_follows_the_cause():
+    try:
+        try:
+            raise HttpError(429)
+        except HttpError as cause:
+            raise RuntimeError("agent failed") from cause
+    except RuntimeError as error:
+        assert is_rate_limit_error(error)
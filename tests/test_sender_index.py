@@ -0,0 +1,126 @@
+"""
+Tests for the per-sender categorization history.
+"""
+
+import pytest
+
+from tools.categorization_result import CategorizationResult
+from tools.sender_index import SenderIndex, sender_keys
+
+DAY = 24 * 3600
+
+NOTIFICATION = CategorizationResult("Low", "GitHub", "No", "No", "CI finished")
+REVIEW_REQUEST = CategorizationResult("Medium", "GitHub", "Yes", "Yes", "Review requested")
+
+
+def content(sender, subject="Update"):
+    return f"From: {sender}\nSubject: {subject}\nDate: Mon, 3 Jun 2024 10:00:00 +0000\nID: 1\nBody:\nHello\n"
+
+
+@pytest.fixture
+def index():
+    return SenderIndex(path="", threshold=0.9, min_emails=3, half_life_days=30)
+
+
+def learn(index, sender, result, times):
+    for _ in range(times):
+        index.learn(content(sender), result)
+
+
+def age(index, days):
+    """
+    Moves every entry `days` into the past.
+    """
+    for fields in index.entries.values():
+        for values in fields.values():
+            for entry in values.values():
+                entry[1] -= days * DAY
+
+
+def test_sender_keys():
+    assert sender_keys(content("GitHub <noreply@GitHub.com>")) == ["address:noreply@github.com", "domain:github.com"]
+    assert sender_keys("Subject: no sender\n") == []
+    assert sender_keys(content("undisclosed-recipients")) == []
+
+
+def test_shared_freemail_domains_have_no_domain_key():
+    assert sender_keys(content("someone@gmail.com")) == ["address:someone@gmail.com"]
+
+
+def test_consistent_sender_is_answered(index):
+    learn(index, "noreply@github.com", NOTIFICATION, 3)
+    labels, support, key = index.lookup(content("noreply@github.com"))
+    assert labels == NOTIFICATION.fields()
+    assert support == pytest.approx(3.0, abs=1e-3)
+    assert key == "address:noreply@github.com"
+
+
+def test_too_few_emails_are_not_answered(index):
+    learn(index, "noreply@github.com", NOTIFICATION, 2)
+    assert index.lookup(content("noreply@github.com")) is None
+
+
+def test_inconsistent_sender_is_not_answered(index):
+    learn(index, "noreply@github.com", NOTIFICATION, 8)
+    learn(index, "noreply@github.com", REVIEW_REQUEST, 2)
+    # 80% agreement is below the 90% threshold
+    assert index.lookup(content("noreply@github.com")) is None
+
+
+def test_new_address_falls_back_to_the_domain(index):
+    learn(index, "noreply@github.com", NOTIFICATION, 3)
+    _, _, key = index.lookup(content("notifications@github.com"))
+    assert key == "domain:github.com"
+
+
+def test_freemail_newcomer_is_not_answered_from_the_domain(index):
+    learn(index, "alice@gmail.com", NOTIFICATION, 5)
+    assert index.lookup(content("bob@gmail.com")) is None
+
+
+def test_history_decays(index):
+    learn(index, "noreply@github.com", NOTIFICATION, 4)
+    assert index.lookup(content("noreply@github.com")) is not None
+    # After one half-life four emails weigh two, below min_emails
+    age(index, 30)
+    assert index.lookup(content("noreply@github.com")) is None
+
+
+def test_recent_emails_outweigh_old_ones(index):
+    learn(index, "noreply@github.com", REVIEW_REQUEST, 10)
+    age(index, 150)  # five half-lives: 10 -> 0.3125
+    learn(index, "noreply@github.com", NOTIFICATION, 3)
+    labels, _, _ = index.lookup(content("noreply@github.com"))
+    assert labels == NOTIFICATION.fields()
+
+
+def test_incomplete_results_are_not_learned(index):
+    learn(index, "noreply@github.com", CategorizationResult("High", None, "No", "No", ""), 5)
+    assert index.entries == {}
+
+
+def test_agreement(index):
+    assert index.agreement(content("noreply@github.com")) is None
+    learn(index, "noreply@github.com", NOTIFICATION, 3)
+    assert index.agreement(content("noreply@github.com")) == pytest.approx(1.0, abs=1e-3)
+    learn(index, "noreply@github.com", REVIEW_REQUEST, 1)
+    assert index.agreement(content("noreply@github.com")) == pytest.approx(0.75, abs=1e-3)
+
+
+def test_agreement_is_scaled_down_for_new_senders(index):
+    learn(index, "noreply@github.com", NOTIFICATION, 1)
+    assert index.agreement(content("noreply@github.com")) == pytest.approx(1 / 3, abs=1e-3)
+
+
+def test_index_is_persisted_and_expired_entries_dropped(tmp_path):
+    path = str(tmp_path / "senders.sqlite3")
+    first = SenderIndex(path=path, threshold=0.9, min_emails=3, half_life_days=30)
+    learn(first, "noreply@github.com", NOTIFICATION, 3)
+    learn(first, "old@example.org", NOTIFICATION, 1)
+    # Rewrite the old sender's rows as if they were learned a year ago
+    first._db.execute("UPDATE sender_stats SET updated_at = updated_at - ? WHERE key LIKE '%example.org'", (365 * DAY,))
+    first._db.commit()
+
+    second = SenderIndex(path=path, threshold=0.9, min_emails=3, half_life_days=30)
+    assert second.lookup(content("noreply@github.com")) is not None
+    assert not any("example.org" in key for key in second.entries)
@@ -1,11 +1,10 @@
 """
 Tools package for the email processing system.
 Exports all tools used by agents.
-"""
 
-from .email_tools import fetch_emails, apply_labels
-from .notification_tools import send_telegram_notification
-from .categorization_tools import categorize_with_groq, categorize_with_gemini
+The tools are imported from tools.agent_tools on first access, so importing
+a submodule such as tools.email_tools doesn't load crewai.
+"""
 
 __all__ = [
     'fetch_emails',
@@ -14,3 +13,9 @@ __all__ = [
     'categorize_with_gemini',
     'apply_labels'
 ]
+
+def __getattr__(name):
+    if name in __all__:
+        from . import agent_tools
+        return getattr(agent_tools, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,57 @@
+"""
+CrewAI tool wrappers around the email, categorization and notification functions.
+
+crewai takes seconds to import, so the tools live here instead of next to
+the functions they wrap: the pipeline modules stay importable without it,
+and only code that builds agents pays for the import.
+"""
+
+from typing import Any, Dict, List
+
+from crewai.tools import tool
+
+from utils import get_email_context
+from .email_tools import fetch_emails_func, apply_categorization_labels
+from .notification_tools import send_telegram_notification_func
+from .categorization_tools import categorize_with_groq_func, categorize_with_gemini_func
+
+@tool
+def fetch_emails(limit=3) -> List[Dict[str, Any]] | str:
+    """Fetches unread emails from Gmail using IMAP."""
+    return fetch_emails_func(limit)
+
+@tool
+def apply_labels(email_id: str, categorization: str) -> str:
+    """Applies Gmail labels based on email categorization."""
+    success = apply_categorization_labels(email_id, categorization)
+    if success:
+        return f"Successfully applied labels to email {email_id}"
+    else:
+        return f"Failed to apply labels to email {email_id}"
+
+@tool
+def send_telegram_notification(message: str):
+    """Sends a message to Telegram using a bot."""
+    return send_telegram_notification_func(message)
+
+@tool
+def categorize_with_groq(email_content: str) -> str:
+    """Categorize an email using Groq's LLama model."""
+    return categorize_with_groq_func(email_content)
+
+@tool
+def categorize_with_gemini(email_id: str = "", email_content: str = "") -> str:
+    """Categorize an email using Google's Gemini model.
+
+    Pass the email ID given in the task; the tool looks up the email content
+    itself. If no ID is given, the email currently being processed is used.
+    """
+    # Prefer the registered content over whatever the agent passed in
+    # (CrewAI sometimes passes a dictionary or a paraphrase)
+    content = get_email_context(email_id if isinstance(email_id, str) else None)
+    if content is None:
+        if not email_content or not isinstance(email_content, str) or not email_content.strip():
+            return f"Error: no email content found for email ID '{email_id}'"
+        content = email_content
+
+    return categorize_with_gemini_func(content)
@@ -0,0 +1,250 @@
+"""
+Turns raw email bodies into the short text sent to the categorizers.
+
+Bodies used to be cut to their first 1000 characters. HTML-only mail ended
+up empty and long reply chains spent the whole budget on quoted history.
+preprocess_body() converts HTML to text and drops quoted replies,
+signatures, boilerplate footers and tracking parameters. It then trims the
+rest to a token budget.
+
+Tokens are estimated without a tokenizer: words and punctuation count as
+one token each, and long words count one per four characters. That is close
+enough to the Llama and Gemini tokenizers for budgeting.
+"""
+
+import math
+import re
+from html import unescape
+from html.parser import HTMLParser
+from typing import List, Optional
+from urllib.parse import urlsplit
+
+from config import BODY_TOKEN_BUDGET
+
+# Words, numbers and single punctuation marks, the units of estimate_tokens()
+TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+# Characters per token for long words (a common BPE average)
+CHARS_PER_TOKEN = 4
+
+# Elements whose text is never shown
+HIDDEN_TAGS = {"script", "style", "head", "title", "noscript", "template"}
+
+# Elements that start a new line
+BLOCK_TAGS = {
+    "p", "div", "br", "tr", "li", "ul", "ol", "table", "h1", "h2", "h3", "h4", "h5", "h6",
+    "blockquote", "section", "article", "header", "footer", "hr", "pre", "dd", "dt",
+}
+
+# A line that starts the quoted part of a reply, e.g. "On Mon, 3 Jun 2024 at 10:00, Ann <a@b.c> wrote:"
+QUOTE_HEADER_RE = re.compile(
+    r"^\s*(?:"
+    r"On\b.{0,200}\bwrote:"
+    r"|-{2,}\s*Original Message\s*-{2,}"
+    r"|-{2,}\s*Forwarded message\s*-{2,}"
+    r"|_{10,}"
+    r"|From:\s.+\n\s*(?:Sent|Date):\s"
+    r")",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+# A line that starts a signature ("-- " is the standard delimiter)
+SIGNATURE_RE = re.compile(
+    r"^(?:--[ \t]*|Sent from my \w+.*|Get Outlook for \w+.*|Sent from (?:Mail|Yahoo Mail|Outlook).*)$",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+# Boilerplate found in the footers of bulk mail
+FOOTER_RE = re.compile(
+    r"unsubscribe|manage (?:your )?(?:email )?(?:preferences|subscriptions)|view (?:this email )?in (?:your )?browser"
+    r"|you(?:'re| are) receiving this|this email was sent to|privacy policy|all rights reserved|\u00a9|\(c\) \d{4}",
+    re.IGNORECASE,
+)
+
+# Footers that offered an unsubscribe link leave this note behind: it's a strong newsletter hint
+UNSUBSCRIBE_NOTE = "[unsubscribe footer removed]"
+
+URL_RE = re.compile(r"https?://[^\s<>\"')\]]+", re.IGNORECASE)
+
+# Links whose path is longer than this are reduced to their host (click trackers, signed URLs)
+MAX_LINK_PATH_CHARS = 40
+
+
+class _TextExtractor(HTMLParser):
+    """
+    Collects the visible text of an HTML document, one line per block element.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts: List[str] = []
+        self.hidden = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in HIDDEN_TAGS:
+            self.hidden += 1
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+        elif tag in ("td", "th"):
+            self.parts.append(" ")
+
+    def handle_startendtag(self, tag, attrs):
+        if tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in HIDDEN_TAGS:
+            self.hidden = max(0, self.hidden - 1)
+        elif tag in BLOCK_TAGS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self.hidden:
+            self.parts.append(data)
+
+
+def html_to_text(html: str) -> str:
+    """
+    Converts an HTML body to plain text, dropping scripts, styles and markup.
+
+    Links keep their text, not their address, and images disappear (with
+    their tracking pixels).
+
+    Args:
+        html: The HTML document (may be truncated mid-tag)
+
+    Returns:
+        str: The visible text, one line per block element
+    """
+    parser = _TextExtractor()
+    try:
+        parser.feed(html)
+        parser.close()
+    except AssertionError:
+        # Malformed markup deep in a truncated document: keep what was read
+        pass
+    return unescape("".join(parser.parts))
+
+
+def strip_quoted_reply(text: str) -> str:
+    """
+    Drops the quoted history of a reply or forward.
+
+    Everything from the first "On ... wrote:" / "Original Message" / Outlook
+    "From: ... Sent:" header on is removed, as are lines starting with ">".
+    """
+    match = QUOTE_HEADER_RE.search(text)
+    # A forward with nothing above the header is all quote: keep it
+    if match and text[:match.start()].strip():
+        text = text[:match.start()]
+    return "\n".join(line for line in text.split("\n") if not line.lstrip().startswith(">"))
+
+
+def strip_signature(text: str) -> str:
+    """
+    Drops everything after the signature delimiter or a "Sent from my ..." line.
+    """
+    match = SIGNATURE_RE.search(text)
+    if match and text[:match.start()].strip():
+        return text[:match.start()]
+    return text
+
+
+def strip_footer(text: str) -> str:
+    """
+    Drops boilerplate paragraphs (unsubscribe links, legal notices) from the end of the text.
+
+    Paragraphs are removed from the bottom up while they look like footer
+    text. A removed unsubscribe link is replaced by UNSUBSCRIBE_NOTE.
+    """
+    paragraphs = re.split(r"\n\s*\n", text)
+    unsubscribe = False
+    while len(paragraphs) > 1 and FOOTER_RE.search(paragraphs[-1]):
+        unsubscribe = unsubscribe or "unsubscribe" in paragraphs[-1].lower()
+        paragraphs.pop()
+    text = "\n\n".join(paragraphs)
+    # "View this email in your browser" banners sit at the top instead
+    text = "\n".join(
+        line for line in text.split("\n")
+        if not (len(line) < 100 and re.search(r"view (?:this email )?in (?:your )?browser", line, re.IGNORECASE))
+    )
+    return f"{text}\n{UNSUBSCRIBE_NOTE}" if unsubscribe else text
+
+
+def shorten_links(text: str) -> str:
+    """
+    Removes tracking parameters and long paths from links.
+
+    "https://click.shop.com/ls/abc123...?utm_source=x" -> "click.shop.com"
+    "https://github.com/org/repo/pull/7?notification=1" -> "github.com/org/repo/pull/7"
+    """
+    def shorten(match):
+        try:
+            parts = urlsplit(match.group(0))
+        except ValueError:
+            return ""
+        path = parts.path.rstrip("/")
+        if len(path) > MAX_LINK_PATH_CHARS:
+            return parts.netloc
+        return parts.netloc + path
+
+    return URL_RE.sub(shorten, text)
+
+
+def normalize_whitespace(text: str) -> str:
+    """
+    Collapses runs of spaces and blank lines and trims every line.
+    """
+    lines = [re.sub(r"[ \t\u00a0\u200b\u200c]+", " ", line).strip() for line in text.split("\n")]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimates the number of LLM tokens in `text` (see the module docstring).
+    """
+    return sum(max(1, math.ceil(len(unit) / CHARS_PER_TOKEN)) for unit in TOKEN_RE.findall(text))
+
+
+def trim_to_tokens(text: str, max_tokens: Optional[int]) -> str:
+    """
+    Cuts `text` after about `max_tokens` tokens, at a word boundary.
+
+    Args:
+        text: The text to trim
+        max_tokens: Token budget; None or 0 keeps the whole text
+
+    Returns:
+        str: The text, ending in "..." if it was cut
+    """
+    if not max_tokens:
+        return text
+    used = 0
+    for match in TOKEN_RE.finditer(text):
+        used += max(1, math.ceil(len(match.group(0)) / CHARS_PER_TOKEN))
+        if used > max_tokens:
+            return text[:match.start()].rstrip() + "..."
+    return text
+
+
+def preprocess_body(text: str, is_html: bool = False, max_tokens: Optional[int] = BODY_TOKEN_BUDGET) -> str:
+    """
+    Cleans an email body for categorization.
+
+    Args:
+        text: The decoded body
+        is_html: True for a text/html body
+        max_tokens: Token budget of the result
+
+    Returns:
+        str: The body without markup, quotes, signature or footer, trimmed to the budget
+    """
+    if is_html:
+        text = html_to_text(text)
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = strip_quoted_reply(text)
+    text = strip_signature(text)
+    text = normalize_whitespace(text)
+    text = strip_footer(text)
+    text = shorten_links(text)
+    return trim_to_tokens(normalize_whitespace(text), max_tokens)
@@ -0,0 +1,206 @@
+"""
+Content-addressed cache of categorization results.
+
+Results are keyed by a hash of the normalized email content, the model and
+the prompt version, so byte-identical mail (repeated receipts, GitHub
+notifications, a message re-processed after a crash) is categorized once.
+A small in-process LRU sits in front of a persistent SQLite table with a
+TTL and a size limit.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from config import (
+    CATEGORY_CACHE_PATH,
+    CATEGORY_CACHE_TTL_SECONDS,
+    CATEGORY_CACHE_MAX_ENTRIES,
+    CATEGORY_CACHE_MEMORY_ENTRIES,
+)
+
+# Header lines that differ between otherwise identical emails
+VOLATILE_LINE_RE = re.compile(r'^(ID|Date):.*$', re.MULTILINE)
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_content(email_content: str) -> str:
+    """
+    Normalizes email content for hashing.
+
+    Drops the ID and Date lines and collapses whitespace, so the same
+    message delivered twice produces the same key.
+    """
+    content = VOLATILE_LINE_RE.sub("", email_content)
+    return WHITESPACE_RE.sub(" ", content).strip()
+
+
+def cache_key(email_content: str, model: str, prompt_version: str) -> str:
+    """
+    Builds the cache key for an email categorized by `model` with `prompt_version`.
+
+    Returns:
+        str: A hex SHA-256 digest
+    """
+    digest = hashlib.sha256()
+    for part in (model, prompt_version, normalize_content(email_content)):
+        digest.update(part.encode('utf-8'))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class CategorizationCache:
+    """
+    Two-tier cache: an LRU dict in memory and a SQLite table on disk.
+
+    Entries older than `ttl` seconds are treated as misses. When the table
+    grows beyond `max_entries` the least recently used rows are deleted.
+    """
+
+    def __init__(self, path: Optional[str] = CATEGORY_CACHE_PATH,
+                 ttl: float = CATEGORY_CACHE_TTL_SECONDS,
+                 max_entries: int = CATEGORY_CACHE_MAX_ENTRIES,
+                 memory_entries: int = CATEGORY_CACHE_MEMORY_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self.memory_entries = max(0, memory_entries)
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._open()
+
+    def get(self, key: str, count_miss: bool = True) -> Optional[str]:
+        """
+        Looks a key up in memory, then on disk.
+
+        Args:
+            key: A key from cache_key()
+            count_miss: Whether a miss should be counted in the stats
+
+        Returns:
+            Optional[str]: The cached categorization, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                result, created_at = entry
+                if now - created_at <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.counters["memory_hits"] += 1
+                    return result
+                del self._memory[key]
+
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT result, created_at FROM categorizations WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row is not None and now - row[1] <= self.ttl:
+                        self._db.execute(
+                            "UPDATE categorizations SET last_used = ? WHERE key = ?", (now, key)
+                        )
+                        self._db.commit()
+                        self._remember(key, row[0], row[1])
+                        self.counters["disk_hits"] += 1
+                        return row[0]
+                except sqlite3.Error as e:
+                    print(f"Error reading categorization cache: {str(e)}")
+
+            if count_miss:
+                self.counters["misses"] += 1
+            return None
+
+    def put(self, key: str, result: str) -> None:
+        """
+        Stores a categorization in both tiers, evicting old rows if needed.
+        """
+        now = time.time()
+        with self._lock:
+            self._remember(key, result, now)
+            self.counters["stores"] += 1
+
+            if self._db is None:
+                return
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO categorizations (key, result, created_at, last_used) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, result, now, now),
+                )
+                self._evict(now)
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Error writing categorization cache: {str(e)}")
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns a copy of the hit/miss counters.
+        """
+        with self._lock:
+            return dict(self.counters)
+
+    def _remember(self, key: str, result: str, created_at: float) -> None:
+        if self.memory_entries == 0:
+            return
+        self._memory[key] = (result, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self, now: float) -> None:
+        expired = self._db.execute(
+            "DELETE FROM categorizations WHERE created_at < ?", (now - self.ttl,)
+        ).rowcount
+        overflow = self._db.execute("SELECT COUNT(*) FROM categorizations").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            self._db.execute(
+                "DELETE FROM categorizations WHERE key IN "
+                "(SELECT key FROM categorizations ORDER BY last_used LIMIT ?)",
+                (overflow,),
+            )
+        self.counters["evictions"] += max(expired, 0) + max(overflow, 0)
+
+    def _open(self) -> None:
+        if not self.path:
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Guarded by self._lock, so one connection can be shared by all threads
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS categorizations ("
+                "key TEXT PRIMARY KEY, result TEXT NOT NULL, "
+                "created_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS categorizations_last_used ON categorizations (last_used)"
+            )
+            self._db.commit()
+        except (OSError, sqlite3.Error) as e:
+            print(f"Categorization cache disabled on disk: {str(e)}")
+            self._db = None
+
+
+_cache: Optional[CategorizationCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_categorization_cache() -> CategorizationCache:
+    """
+    Returns the process-wide categorization cache, opening it on first use.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CategorizationCache()
+        return _cache
@@ -0,0 +1,248 @@
+"""
+Typed categorization results.
+
+A categorization is parsed once, wherever it comes from (an LLM's JSON,
+the agent's "Priority: ..." text, the cache, the sender index, the local
+classifier or the keyword fallback), into a CategorizationResult with
+normalized values. Labeling, notifications and statistics read its
+attributes instead of re-parsing strings.
+"""
+
+import json
+import re
+from typing import Any, Dict, List, Mapping, Optional
+
+from config import PRIORITY_LEVELS, EMAIL_CATEGORIES
+
+UNKNOWN = "Unknown"
+
+# Other names the models use for the enum values
+PRIORITY_ALIASES = {"urgent": "High", "critical": "High", "normal": "Medium"}
+CATEGORY_ALIASES = {
+    "receipt": "Receipts_Invoices",
+    "receipts": "Receipts_Invoices",
+    "invoice": "Receipts_Invoices",
+    "invoices": "Receipts_Invoices",
+    "promotion": "Promotional",
+    "promotions": "Promotional",
+    "newsletters": "Newsletter",
+}
+YES_VALUES = {"yes", "y", "true", "1"}
+NO_VALUES = {"no", "n", "false", "0"}
+
+NON_ALPHANUMERIC_RE = re.compile(r'[^a-z0-9]+')
+
+# JSON schema for one result; Gemini and Groq are asked for exactly this
+RESULT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "priority": {"type": "string", "format": "enum", "enum": list(PRIORITY_LEVELS)},
+        "category": {"type": "string", "format": "enum", "enum": list(EMAIL_CATEGORIES)},
+        "needs_response": {"type": "boolean"},
+        "contains_tasks": {"type": "boolean"},
+        "summary": {"type": "string"},
+    },
+    "required": ["priority", "category", "needs_response", "contains_tasks", "summary"],
+}
+
+
+def _key(value: Any) -> str:
+    # "Needs Response", "needs_response" and "needs-response" all become "needsresponse"
+    return NON_ALPHANUMERIC_RE.sub("", str(value).lower())
+
+
+_PRIORITIES = {_key(value): value for value in PRIORITY_LEVELS}
+_PRIORITIES.update({_key(alias): value for alias, value in PRIORITY_ALIASES.items()})
+_CATEGORIES = {_key(value): value for value in EMAIL_CATEGORIES}
+_CATEGORIES.update({_key(alias): value for alias, value in CATEGORY_ALIASES.items()})
+
+
+def normalize_priority(value: Any) -> str:
+    """
+    Returns "High", "Medium" or "Low" for a priority value, "Unknown" otherwise.
+    """
+    if value is None:
+        return UNKNOWN
+    return _PRIORITIES.get(_key(_first_word(value)), _PRIORITIES.get(_key(value), UNKNOWN))
+
+
+def normalize_category(value: Any) -> str:
+    """
+    Returns one of EMAIL_CATEGORIES for a category value; unrecognized categories become "Other".
+    """
+    if value is None or not str(value).strip() or _key(value) == _key(UNKNOWN):
+        return UNKNOWN
+    return _CATEGORIES.get(_key(value), _CATEGORIES.get(_key(_first_word(value)), "Other"))
+
+
+def normalize_yes_no(value: Any) -> str:
+    """
+    Returns "Yes" or "No" for a boolean or yes/no value, "Unknown" otherwise.
+    """
+    if isinstance(value, bool):
+        return "Yes" if value else "No"
+    if value is None:
+        return UNKNOWN
+    word = _key(_first_word(value))
+    if word in YES_VALUES:
+        return "Yes"
+    if word in NO_VALUES:
+        return "No"
+    return UNKNOWN
+
+
+def _first_word(value: Any) -> str:
+    # "High - security alert" -> "High"
+    words = str(value).strip().strip("[]*").split()
+    return words[0] if words else ""
+
+
+class CategorizationResult:
+    """
+    One email's categorization with normalized values.
+
+    Attributes:
+        priority: "High", "Medium", "Low" or "Unknown"
+        category: One of EMAIL_CATEGORIES or "Unknown"
+        needs_response: "Yes", "No" or "Unknown"
+        contains_tasks: "Yes", "No" or "Unknown"
+        summary: Free text
+    """
+
+    __slots__ = ("priority", "category", "needs_response", "contains_tasks", "summary")
+
+    # "Key: value" line names and the attributes they set
+    TEXT_FIELDS = {
+        "Priority": "priority",
+        "Category": "category",
+        "Needs Response": "needs_response",
+        "Contains Tasks": "contains_tasks",
+        "Summary": "summary",
+    }
+
+    def __init__(self, priority: Any = None, category: Any = None, needs_response: Any = None,
+                 contains_tasks: Any = None, summary: Any = ""):
+        self.priority = normalize_priority(priority)
+        self.category = normalize_category(category)
+        self.needs_response = normalize_yes_no(needs_response)
+        self.contains_tasks = normalize_yes_no(contains_tasks)
+        self.summary = str(summary or "").strip()
+
+    @classmethod
+    def parse(cls, value: Any) -> "CategorizationResult":
+        """
+        Builds a result from whatever form a categorization arrives in.
+
+        Args:
+            value: A CategorizationResult, a mapping (JSON keys or "Needs Response"
+                style keys), JSON text or "Key: value" lines
+
+        Returns:
+            CategorizationResult: Missing or unreadable fields are "Unknown"
+        """
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, Mapping):
+            return cls._from_mapping(value)
+
+        text = str(value).strip()
+        if text.startswith("```"):
+            # Markdown code fence around JSON
+            text = text.strip("`").strip()
+            if text.startswith("json"):
+                text = text[4:].strip()
+        if text.startswith("{"):
+            try:
+                data = json.loads(text)
+            except ValueError:
+                data = None
+            if isinstance(data, Mapping):
+                return cls._from_mapping(data)
+
+        fields = {}
+        for line in text.split("\n"):
+            name, separator, field_value = line.partition(":")
+            name = name.strip().strip("*- ").strip()
+            if separator and name in cls.TEXT_FIELDS:
+                fields[cls.TEXT_FIELDS[name]] = field_value.strip()
+        return cls(**fields)
+
+    @classmethod
+    def from_json(cls, text: str) -> Optional["CategorizationResult"]:
+        """
+        Parses a schema-constrained LLM response.
+
+        Returns:
+            Optional[CategorizationResult]: The result, or None if it isn't a complete categorization
+        """
+        try:
+            data = json.loads(text)
+        except (TypeError, ValueError):
+            return None
+        if not isinstance(data, Mapping):
+            return None
+        result = cls._from_mapping(data)
+        return result if result.is_complete() else None
+
+    @classmethod
+    def _from_mapping(cls, data: Mapping[str, Any]) -> "CategorizationResult":
+        attributes = {_key(name): name for name in cls.__slots__}
+        fields = {}
+        for name, value in data.items():
+            attribute = attributes.get(_key(name))
+            if attribute:
+                fields[attribute] = value
+        return cls(**fields)
+
+    def is_complete(self) -> bool:
+        """
+        Returns True if priority, category and needs-response all have known values.
+        """
+        return UNKNOWN not in (self.priority, self.category, self.needs_response)
+
+    def fields(self) -> Dict[str, str]:
+        """
+        Returns the label fields as {"Priority": ..., "Category": ..., "Needs Response": ...}.
+        """
+        return {"Priority": self.priority, "Category": self.category, "Needs Response": self.needs_response}
+
+    def labels(self) -> List[str]:
+        """
+        Returns the Gmail labels for this result, such as "Priority/High" or "Needs_Response".
+        """
+        labels = [f"Priority/{self.priority}", f"Category/{self.category}"]
+        if self.needs_response == "Yes":
+            labels.append("Needs_Response")
+        return labels
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Returns the result in the JSON schema's shape (yes/no as booleans where known).
+        """
+        data: Dict[str, Any] = {name: getattr(self, name) for name in self.__slots__}
+        for name in ("needs_response", "contains_tasks"):
+            if data[name] != UNKNOWN:
+                data[name] = data[name] == "Yes"
+        return data
+
+    def to_json(self) -> str:
+        """
+        Returns to_dict() as JSON text (the form stored in the cache).
+        """
+        return json.dumps(self.to_dict())
+
+    def to_text(self) -> str:
+        """
+        Returns the "Priority: ...\\nCategory: ..." text shown to agents and in logs.
+        """
+        return "\n".join(f"{name}: {getattr(self, attribute)}" for name, attribute in self.TEXT_FIELDS.items())
+
+    __str__ = to_text
+
+    def __repr__(self) -> str:
+        return f"CategorizationResult({self.priority!r}, {self.category!r}, {self.needs_response!r}, {self.contains_tasks!r})"
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, CategorizationResult):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
@@ -2,9 +2,46 @@
 Categorization tools for analyzing and categorizing emails.
 """
 
-from crewai.tools import tool
-
-from config import groq_client, gemini_model, CATEGORIZER_MODEL
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Optional
+
+from config import (
+    CATEGORIZER_MODEL,
+    GROQ_MODEL,
+    GEMINI_CONTENT_TOKENS,
+    GROQ_CONTENT_TOKENS,
+    GEMINI_BATCH_SIZE,
+    PROCESSING_CONCURRENCY,
+    HEDGE_MODE,
+    HEDGE_PROVIDERS,
+    HEDGE_PERCENTILE,
+    HEDGE_MIN_DELAY_SECONDS,
+    HEDGE_MAX_DELAY_SECONDS,
+    HEDGE_MAX_RATIO,
+)
+from .keyword_classifier import get_keyword_classifier
+from .categorization_cache import get_categorization_cache, cache_key
+from .categorization_result import CategorizationResult, RESULT_SCHEMA
+from .training_data import record_training_example
+from .sender_index import get_sender_index
+from .rate_limiter import get_rate_limiter, is_rate_limit_error, retry_after_from_error
+from .providers import get_groq_client, get_gemini_model
+from .latency_tracker import get_latency_tracker
+from .body_preprocessing import trim_to_tokens
+from .prompt_registry import get_prompt, get_prompt_usage
+
+# One result per email, tagged with its ID, for batch requests
+BATCH_RESULT_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": dict(RESULT_SCHEMA["properties"], email_id={"type": "string"}),
+        "required": ["email_id"] + RESULT_SCHEMA["required"],
+    },
+}
 
 def categorize_with_groq_func(email_content: str) -> str:
     """
@@ -12,258 +49,448 @@ def categorize_with_groq_func(email_content: str) -> str:
     Returns the categorization result as a string.
     """
     try:
-        # Fallback categorization in case of rate limits
-        if len(email_content) > 1000:
-            email_content = email_content[:1000] + "..." # Truncate long emails
-
-        # Check for common keywords to provide basic categorization if API fails
-        lower_content = email_content.lower()
-
-        # Try to use the API first
-        try:
-            prompt = f"""Analyze this email and categorize it:
-
-            {email_content}
-
-            1. Determine the priority (High, Medium, Low)
-            2. Categorize the type (Personal, Work, Promotional, Newsletter, GitHub, YouTube, Receipts_Invoices, Other)
-               - Use GitHub for any GitHub-related notifications or updates
-               - Use YouTube for YouTube notifications and subscriptions
-               - Use Receipts_Invoices for any receipts, invoices, or financial documents
-            3. Indicate if it needs a response (Yes/No)
-            4. If it contains task-related content (Yes/No)
-            5. Provide a 1-2 sentence summary
-
-            Format your response as:
-            Priority: [priority]
-            Category: [category]
-            Needs Response: [yes/no]
-            Contains Tasks: [yes/no]
-            Summary: [brief summary]
-            """
-
-            completion = groq_client.chat.completions.create(
-                model=CATEGORIZER_MODEL,
-                messages=[
-                    {"role": "system", "content": "You are an email categorization assistant. Analyze emails and categorize them accurately."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,  # Lower temperature for more consistent results
-                max_tokens=500
-            )
-
-            return completion.choices[0].message.content
-
-        except Exception as api_error:
-            print(f"API error: {str(api_error)}. Using fallback categorization.")
-
-            # Fallback categorization logic
-            priority = "Low"  # Default to low priority
-            category = "Other"  # Default category
-            needs_response = "No"  # Default to no response needed
-            contains_tasks = "No"  # Default to no tasks
-            summary = "Unable to fully analyze due to API limits. Basic categorization provided."
-
-            # Simple keyword-based categorization
-            if any(word in lower_content for word in ["urgent", "important", "asap", "deadline", "emergency"]):
-                priority = "High"
-                needs_response = "Yes"
-
-            if any(word in lower_content for word in ["newsletter", "subscribe", "update", "weekly", "monthly"]):
-                category = "Newsletter"
-            elif any(word in lower_content for word in ["github", "commit", "pull request", "issue", "repository"]):
-                category = "GitHub"
-            elif any(word in lower_content for word in ["youtube", "video", "channel", "subscribe"]):
-                category = "YouTube"
-            elif any(word in lower_content for word in ["receipt", "invoice", "payment", "order", "purchase"]):
-                category = "Receipts_Invoices"
-            elif any(word in lower_content for word in ["offer", "discount", "sale", "promotion", "deal"]):
-                category = "Promotional"
-            elif any(word in lower_content for word in ["job", "interview", "application", "career", "position"]):
-                category = "Work"
-
-            if any(word in lower_content for word in ["please respond", "let me know", "reply", "get back to me"]):
-                needs_response = "Yes"
-
-            if any(word in lower_content for word in ["task", "todo", "to-do", "action item", "assignment"]):
-                contains_tasks = "Yes"
-
-            # Create a formatted response similar to what the API would return
-            return f"Priority: {priority}\nCategory: {category}\nNeeds Response: {needs_response}\nContains Tasks: {contains_tasks}\nSummary: {summary}"
+        return groq_categorization(email_content).to_text()
     except Exception as e:
         return f"Error categorizing email with Groq: {str(e)}"
 
+def groq_categorization(email_content: str) -> CategorizationResult:
+    """
+    Categorizes an email with Groq in JSON mode, falling back to keywords on errors.
+
+    Returns:
+        CategorizationResult: The parsed result
+    """
+    result = provider_categorization("groq", email_content)
+    if result is None:
+        print("Using fallback categorization.")
+        # Keyword-based categorization
+        return _keyword_result(_truncate_for_groq(email_content))
+    return result
+
+def _request_groq(email_content: str) -> CategorizationResult:
+    """
+    Sends one categorization request to Groq.
+
+    Raises:
+        ValueError: Without a Groq client or for an incomplete answer
+    """
+    groq_client = get_groq_client()
+    if groq_client is None:
+        raise ValueError("Groq client not initialized. Check your API key.")
+
+    prompt = get_prompt("groq")
+    user_message = prompt.render(email=email_content)
+
+    # The raw response exposes the x-ratelimit-* headers
+    start = time.monotonic()
+    raw_response = groq_client.chat.completions.with_raw_response.create(
+        model=GROQ_MODEL,
+        messages=[
+            {"role": "system", "content": prompt.system},
+            {"role": "user", "content": user_message}
+        ],
+        response_format={"type": "json_object"},
+        temperature=0.1,  # Lower temperature for more consistent results
+        max_tokens=500
+    )
+    get_rate_limiter().update_from_headers("groq", raw_response.headers)
+    completion = raw_response.parse()
+    answer = completion.choices[0].message.content
+    get_prompt_usage().record(prompt, user_message, completion, answer, time.monotonic() - start)
+
+    result = CategorizationResult.from_json(answer)
+    if result is None:
+        raise ValueError("Groq returned an incomplete categorization")
+    return result
+
 def categorize_with_gemini_func(email_content: str) -> str:
     """
-    Categorize an email using Google's Gemini model.
+    Categorize an email using Google's Gemini model (hedged with Groq if HEDGE_MODE is set).
     Returns the categorization result as a string.
     """
     try:
-        # Always truncate emails to avoid token limit issues
-        if len(email_content) > 800:
-            email_content = email_content[:800] + "..." # Truncate long emails
-
-        # Check for common keywords to provide basic categorization if API fails
-        lower_content = email_content.lower()
-
-        # Try to use the Gemini API first
-        try:
-            if gemini_model is None:
-                raise ValueError("Gemini model not initialized. Check your API key.")
-
-            # Enhanced prompt with better instructions for Gemini's reasoning capabilities
-            prompt = f"""Analyze this email and categorize it:
-
-            {email_content}
-
-            First, understand the intent and context of the email:
-            1. Who is the sender and what is their relationship to the recipient?
-            2. What is the main purpose of this email?
-            3. Is there any urgency or time-sensitivity?
-            4. Does it require action from the recipient?
-            5. What category best describes this email?
-
-            IMPORTANT RULES:
-            - Security-related emails (password resets, security alerts, breach notifications) should ALWAYS be marked as High Priority and ALWAYS need a response
-            - Financial notifications (unusual charges, payment confirmations) should be High Priority
-            - Emails containing action items or requests should be marked as Needs Response: Yes
-            - Emails with deadlines or time-sensitive information should be at least Medium Priority
-
-            Based on your analysis, provide ONLY the following structured output:
-            Priority: [High/Medium/Low] - Use High for urgent matters, security alerts, or financial notifications
-            Category: [Personal/Work/Promotional/Newsletter/GitHub/YouTube/Receipts_Invoices/Other] - Choose the most specific category
-            Needs Response: [Yes/No] - Use Yes if the sender expects a reply OR if the email contains security alerts or action items
-            Contains Tasks: [Yes/No] - Use Yes if there are specific actions required
-            Summary: [1-2 sentence summary of the email's main content and purpose]
-            """
+        return hedged_categorization(email_content).to_text()
+    except Exception as e:
+        return f"Error categorizing email with Gemini: {str(e)}"
 
-            try:
-                # Generate a response using Gemini with reduced tokens
-                response = gemini_model.generate_content(
-                    prompt,
-                    generation_config={
-                        "temperature": 0.1,
-                        "max_output_tokens": 250,
-                        "top_p": 0.95
-                    }
-                )
-
-                result = response.text.strip()
-
-                # Validate the response format
-                if not result.startswith("Priority:") or "Category:" not in result:
-                    raise ValueError("Invalid response format from Gemini")
-
-                return result
-            except Exception as api_error:
-                # Check specifically for rate limit errors
-                error_str = str(api_error).lower()
-                if "rate limit" in error_str or "quota" in error_str or "429" in error_str:
-                    print(f"Gemini API rate limit reached: {str(api_error)}. Using fallback categorization.")
-                else:
-                    print(f"Gemini API error: {str(api_error)}. Using fallback categorization.")
-                # Continue to fallback categorization
-                raise
-
-        except Exception as api_error:
-            print(f"Gemini API error: {str(api_error)}. Using fallback categorization.")
-
-            # Improved fallback categorization logic
-            priority = "Low"  # Default to low priority
-            category = "Other"  # Default category
-            needs_response = "No"  # Default to no response needed
-            contains_tasks = "No"  # Default to no tasks
-
-            # Extract subject and sender for better categorization
-            subject_line = ""
-            sender = ""
-            for line in email_content.split("\n"):
-                if line.startswith("Subject:"):
-                    subject_line = line[8:].strip().lower()
-                elif line.startswith("From:"):
-                    sender = line[5:].strip().lower()
-
-            # Combine subject, sender and content for analysis
-            analysis_text = f"{subject_line} {sender} {lower_content}"
-
-            # Security-related emails detection
-            if any(word in analysis_text for word in ["security", "breach", "hack", "password", "reset", "suspicious", "login", "unauthorized", "access", "alert", "warning", "fraud", "phishing", "verify", "verification"]):
-                priority = "High"
-                needs_response = "Yes"
-                category = "Personal"  # Security emails are usually personal
-            # Financial notifications detection
-            elif any(word in analysis_text for word in ["charge", "transaction", "payment", "unusual", "bank", "credit card", "debit", "account", "balance", "statement"]):
-                priority = "High"
-                category = "Receipts_Invoices"
-            # Better keyword detection for priority
-            elif any(word in analysis_text for word in ["urgent", "important", "asap", "deadline", "emergency", "critical", "immediate", "priority"]):
-                priority = "High"
-
-            # Better category detection
-            if "github" in analysis_text or "repository" in analysis_text or "commit" in analysis_text or "pull request" in analysis_text:
-                category = "GitHub"
-            elif "youtube" in analysis_text or "video" in analysis_text or "channel" in analysis_text:
-                category = "YouTube"
-            elif any(word in analysis_text for word in ["receipt", "invoice", "payment", "order", "purchase", "transaction", "bill"]) and priority != "High":  # Don't override security emails
-                category = "Receipts_Invoices"
-            elif any(word in analysis_text for word in ["newsletter", "subscribe", "update", "weekly", "monthly", "digest"]) and priority != "High":  # Don't override security emails
-                category = "Newsletter"
-            elif any(word in analysis_text for word in ["offer", "discount", "sale", "promotion", "deal", "limited time", "off", "save", "coupon"]) and priority != "High":  # Don't override security emails
-                category = "Promotional"
-            elif any(word in analysis_text for word in ["job", "interview", "application", "career", "position", "work", "project", "meeting"]) and priority != "High":  # Don't override security emails
-                category = "Work"
-            elif any(word in analysis_text for word in ["hi", "hello", "hey", "dear", "friend", "family", "personal"]) and priority != "High":  # Don't override security emails
-                category = "Personal"
-
-            # Better response needed detection
-            if any(phrase in analysis_text for phrase in ["please respond", "let me know", "reply", "get back to me", "response", "confirm", "rsvp", "answer", "action", "required", "request", "approve", "approval"]):
-                needs_response = "Yes"
-
-            # Better task detection
-            if any(word in analysis_text for word in ["task", "todo", "to-do", "action", "assignment", "complete", "finish", "due"]):
-                contains_tasks = "Yes"
-
-            # Create a better summary based on the content
-            if category == "Newsletter":
-                summary = f"Newsletter from {sender if sender else 'unknown sender'}"
-            elif category == "Promotional":
-                summary = f"Promotional email about {subject_line if subject_line else 'offers or discounts'}"
-            elif category == "GitHub":
-                summary = "GitHub notification or update"
-            elif category == "YouTube":
-                summary = "YouTube notification or update"
-            elif category == "Receipts_Invoices":
-                summary = f"Receipt or invoice from {sender if sender else 'a service'}"
-            elif category == "Work":
-                summary = f"Work-related email about {subject_line if subject_line else 'a project or task'}"
-            elif category == "Personal":
-                summary = f"Personal email from {sender if sender else 'someone'}"
+def gemini_categorization(email_content: str) -> CategorizationResult:
+    """
+    Categorizes an email with Gemini, constrained to RESULT_SCHEMA, falling back to keywords on errors.
+
+    Returns:
+        CategorizationResult: The parsed result
+    """
+    result = provider_categorization("gemini", email_content)
+    if result is None:
+        print("Using fallback categorization.")
+        # Keyword-based categorization
+        return _keyword_result(_truncate_for_gemini(email_content))
+    return result
+
+def provider_categorization(provider: str, email_content: str, wait_for_quota: bool = True) -> Optional[CategorizationResult]:
+    """
+    Categorizes an email with one provider, going through the cache.
+
+    Args:
+        provider: "gemini" or "groq"
+        email_content: The email text (truncated for the provider here)
+        wait_for_quota: Wait for a rate-limit token; if False, give up when none is available
+
+    Returns:
+        Optional[CategorizationResult]: The result, or None if the request failed or was skipped
+    """
+    truncate, key_for, _ = PROVIDER_CALLS[provider]
+    email_content = truncate(email_content)
+
+    # Identical content was already categorized with this model and prompt
+    cache = get_categorization_cache()
+    key = key_for(email_content)
+    cached = cache.get(key)
+    if cached is not None:
+        return CategorizationResult.parse(cached)
+
+    limiter = get_rate_limiter()
+    if wait_for_quota:
+        limiter.acquire(provider)
+    elif not limiter.try_acquire(provider):
+        return None
+
+    try:
+        result = _request(provider, email_content)
+    except Exception as api_error:
+        # Check specifically for rate limit errors
+        if is_rate_limit_error(api_error):
+            print(f"{provider} API rate limit reached: {str(api_error)}")
+        else:
+            print(f"{provider} API error: {str(api_error)}")
+        return None
+
+    # Only API results are cached, never the keyword fallback
+    cache.put(key, result.to_json())
+    _learn_from_result(email_content, result)
+    return result
+
+def _request_gemini(email_content: str) -> CategorizationResult:
+    """
+    Sends one categorization request to Gemini.
+
+    Raises:
+        ValueError: Without a Gemini model or for an incomplete answer
+    """
+    prompt = get_prompt("gemini")
+    gemini_model = get_gemini_model(prompt.system)
+    if gemini_model is None:
+        raise ValueError("Gemini model not initialized. Check your API key.")
+    user_message = prompt.render(email=email_content)
+
+    # The static instructions are the model's system instruction; the schema
+    # guarantees the fields and their allowed values
+    start = time.monotonic()
+    response = gemini_model.generate_content(
+        user_message,
+        generation_config={
+            "temperature": 0.1,
+            "max_output_tokens": 250,
+            "top_p": 0.95,
+            "response_mime_type": "application/json",
+            "response_schema": RESULT_SCHEMA,
+        }
+    )
+    get_prompt_usage().record(prompt, user_message, response, response.text, time.monotonic() - start)
+
+    result = CategorizationResult.from_json(response.text)
+    if result is None:
+        raise ValueError("Gemini returned an incomplete categorization")
+    return result
+
+def categorize_batch_with_gemini_func(emails: Dict[str, str], batch_size: int = GEMINI_BATCH_SIZE) -> Dict[str, CategorizationResult]:
+    """
+    Categorize several emails with one Gemini request per `batch_size` emails.
+
+    The instructions are sent once per request instead of once per email.
+    Emails found in the cache are not sent at all, and any email whose
+    result is missing or malformed in the batch response is categorized
+    on its own with gemini_categorization.
+
+    Args:
+        emails: Email content keyed by email ID
+        batch_size: Maximum number of emails per request
+
+    Returns:
+        Dict[str, CategorizationResult]: A categorization result per email ID
+    """
+    cache = get_categorization_cache()
+    results = {}
+    pending = {}
+
+    for email_id, email_content in emails.items():
+        email_content = _truncate_for_gemini(email_content)
+        cached = cache.get(_gemini_cache_key(email_content))
+        if cached is not None:
+            results[email_id] = CategorizationResult.parse(cached)
+        else:
+            pending[email_id] = email_content
+
+    pending_ids = list(pending)
+    for start in range(0, len(pending_ids), max(1, batch_size)):
+        chunk = {email_id: pending[email_id] for email_id in pending_ids[start:start + max(1, batch_size)]}
+        batch_results = _request_gemini_batch(chunk) if len(chunk) > 1 else {}
+
+        for email_id, email_content in chunk.items():
+            result = batch_results.get(email_id)
+            if result is None:
+                # Missing or malformed in the batch response: categorize it on its own
+                result = gemini_categorization(email_content)
             else:
-                summary = f"Email about {subject_line if subject_line else 'unknown topic'}"
+                cache.put(_gemini_cache_key(email_content), result.to_json())
+                _learn_from_result(email_content, result)
+            results[email_id] = result
 
-            # Create a formatted response similar to what the API would return
-            return f"Priority: {priority}\nCategory: {category}\nNeeds Response: {needs_response}\nContains Tasks: {contains_tasks}\nSummary: {summary}"
-    except Exception as e:
-        return f"Error categorizing email with Gemini: {str(e)}"
+    return results
 
-@tool
-def categorize_with_groq(email_content: str) -> str:
-    """Categorize an email using Groq's LLama model."""
-    return categorize_with_groq_func(email_content)
+def _request_gemini_batch(emails: Dict[str, str]) -> Dict[str, CategorizationResult]:
+    """
+    Sends one batch request and returns the well-formed results by email ID.
+    """
+    prompt = get_prompt("gemini_batch")
+    gemini_model = get_gemini_model(prompt.system)
+    if gemini_model is None:
+        return {}
+
+    email_blocks = "\n\n".join(
+        f"=== Email ID: {email_id} ===\n{email_content}" for email_id, email_content in emails.items()
+    )
+    user_message = prompt.render(count=len(emails), emails=email_blocks)
+
+    try:
+        get_rate_limiter().acquire("gemini")
+        start = time.monotonic()
+        response = gemini_model.generate_content(
+            user_message,
+            generation_config={
+                "temperature": 0.1,
+                "max_output_tokens": 200 * len(emails) + 50,
+                "top_p": 0.95,
+                "response_mime_type": "application/json",
+                "response_schema": BATCH_RESULT_SCHEMA,
+            }
+        )
+        get_prompt_usage().record(prompt, user_message, response, response.text, time.monotonic() - start)
+        text = response.text.strip()
+    except Exception as api_error:
+        if is_rate_limit_error(api_error):
+            get_rate_limiter().penalize("gemini", retry_after_from_error(api_error))
+        print(f"Gemini batch API error: {str(api_error)}. Categorizing emails one by one.")
+        return {}
+
+    return parse_batch_response(text, emails.keys())
+
+def parse_batch_response(text: str, email_ids) -> Dict[str, CategorizationResult]:
+    """
+    Splits a batch response into per-email results, dropping malformed items.
 
-@tool
-def categorize_with_gemini(email_content: str = "") -> str:
-    """Categorize an email using Google's Gemini model.
+    Args:
+        text: The model's JSON response (a list of results with an email_id)
+        email_ids: The email IDs that were sent
+
+    Returns:
+        Dict[str, CategorizationResult]: The complete results, keyed by email ID
+    """
+    expected = {str(email_id) for email_id in email_ids}
+    try:
+        items = json.loads(text)
+    except ValueError:
+        return {}
+    if not isinstance(items, list):
+        return {}
+
+    results = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        email_id = str(item.get("email_id", ""))
+        if email_id not in expected or email_id in results:
+            continue
+        result = CategorizationResult.parse(item)
+        if result.is_complete():
+            results[email_id] = result
+
+    return results
+
+def get_cached_categorization(email_content: str) -> Optional[CategorizationResult]:
+    """
+    Returns the cached Gemini categorization of this content, if there is one.
 
-    If email_content is empty, the tool will read from current_email.txt file.
+    With hedging on, a cached result of the secondary provider counts too.
+    Lets callers skip the agents entirely for mail that was seen before.
+    A miss is not counted, since the categorizer will look the key up again.
     """
-    # If no content is provided or it's a dictionary (which happens with CrewAI sometimes),
-    # read from the file
-    if not email_content or not isinstance(email_content, str) or not email_content.strip():
-        try:
-            with open("current_email.txt", "r", encoding="utf-8") as file:
-                email_content = file.read()
-        except Exception as e:
-            return f"Error reading from current_email.txt: {str(e)}"
+    providers = HEDGE_PROVIDERS[:2] if HEDGE_MODE != "off" else ["gemini"]
+    for provider in providers:
+        truncate, key_for, _ = PROVIDER_CALLS[provider]
+        cached = get_categorization_cache().get(key_for(truncate(email_content)), count_miss=False)
+        if cached is not None:
+            return CategorizationResult.parse(cached)
+    return None
+
+def _truncate_for_gemini(email_content: str) -> str:
+    return trim_to_tokens(email_content, GEMINI_CONTENT_TOKENS)
+
+def _truncate_for_groq(email_content: str) -> str:
+    return trim_to_tokens(email_content, GROQ_CONTENT_TOKENS)
+
+def _keyword_result(email_content: str) -> CategorizationResult:
+    return CategorizationResult.parse(get_keyword_classifier().classify(email_content))
+
+def _learn_from_result(email_content: str, result: CategorizationResult) -> None:
+    """
+    Feeds an API categorization to the sender index and the training data.
+    """
+    get_sender_index().learn(email_content, result)
+    record_training_example(email_content, result)
+
+def _gemini_cache_key(email_content: str) -> str:
+    return cache_key(email_content, f"gemini/{CATEGORIZER_MODEL}", get_prompt("gemini").version)
+
+def _groq_cache_key(email_content: str) -> str:
+    return cache_key(email_content, f"groq/{GROQ_MODEL}", get_prompt("groq").version)
 
-    return categorize_with_gemini_func(email_content)
+def _request(provider: str, email_content: str) -> CategorizationResult:
+    """
+    Sends one categorization request (the caller has taken the rate-limit token).
+
+    Records the latency of successful requests and pauses the provider on a 429.
+
+    Raises:
+        Exception: The provider's error, or ValueError for an incomplete answer
+    """
+    start = time.monotonic()
+    try:
+        result = PROVIDER_CALLS[provider][2](email_content)
+    except Exception as api_error:
+        if is_rate_limit_error(api_error):
+            get_rate_limiter().penalize(provider, retry_after_from_error(api_error))
+        raise
+    get_latency_tracker().record(provider, time.monotonic() - start)
+    return result
+
+# Per provider: content truncation, cache key and the request itself
+PROVIDER_CALLS = {
+    "gemini": (_truncate_for_gemini, _gemini_cache_key, _request_gemini),
+    "groq": (_truncate_for_groq, _groq_cache_key, _request_groq),
+}
+
+# Hedged request outcomes, see hedged_categorization()
+hedge_counters = {"requests": 0, "hedged": 0, "skipped": 0, "secondary_wins": 0}
+_hedge_lock = threading.Lock()
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+
+def hedged_categorization(email_content: str) -> CategorizationResult:
+    """
+    Categorizes an email with the first provider of HEDGE_PROVIDERS, hedged with the second.
+
+    With HEDGE_MODE=hedge the second provider only gets the email if the
+    first hasn't answered within its HEDGE_PERCENTILE latency (clamped to
+    HEDGE_MIN_DELAY_SECONDS..HEDGE_MAX_DELAY_SECONDS) or has failed; with
+    HEDGE_MODE=race both get it at once. The first complete result wins and
+    the other request is abandoned: dropped if it hasn't started, its answer
+    ignored otherwise. In hedge mode second requests are capped at
+    HEDGE_MAX_RATIO of first requests; in both modes they are skipped, not
+    delayed, when the second provider's quota has no token to spare. With
+    HEDGE_MODE=off this is gemini_categorization().
+
+    Returns:
+        CategorizationResult: The winning result, or the keyword fallback if both failed
+    """
+    if HEDGE_MODE not in ("hedge", "race") or len(HEDGE_PROVIDERS) < 2:
+        return gemini_categorization(email_content)
+    primary, secondary = HEDGE_PROVIDERS[:2]
+
+    # Either provider may have answered this content before
+    cache = get_categorization_cache()
+    contents = {}
+    for provider in (primary, secondary):
+        truncate, key_for, _ = PROVIDER_CALLS[provider]
+        contents[provider] = truncate(email_content)
+        cached = cache.get(key_for(contents[provider]), count_miss=provider == primary)
+        if cached is not None:
+            return CategorizationResult.parse(cached)
+
+    get_rate_limiter().acquire(primary)
+    with _hedge_lock:
+        hedge_counters["requests"] += 1
+    executor = _get_hedge_executor()
+    start = time.monotonic()
+    delay = 0.0 if HEDGE_MODE == "race" else _hedge_delay(primary)
+    pending = {executor.submit(_request, primary, contents[primary]): primary}
+    hedged = False
+
+    while pending:
+        timeout = None if hedged else max(0.0, delay - (time.monotonic() - start))
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            provider = pending.pop(future)
+            try:
+                result = future.result()
+            except Exception as api_error:
+                print(f"{provider} categorization failed: {str(api_error)}")
+                continue
+
+            # The loser is dropped if it is still queued, otherwise its answer is ignored
+            for loser in pending:
+                loser.cancel()
+            if provider == secondary:
+                with _hedge_lock:
+                    hedge_counters["secondary_wins"] += 1
+            cache.put(PROVIDER_CALLS[provider][1](contents[provider]), result.to_json())
+            _learn_from_result(contents[provider], result)
+            return result
+
+        # The deadline passed or the primary failed: ask the secondary, once
+        if not hedged:
+            hedged = True
+            if _may_hedge(secondary):
+                print(f"No answer from {primary} after {time.monotonic() - start:.1f}s, also asking {secondary}")
+                pending[executor.submit(_request, secondary, contents[secondary])] = secondary
+
+    print("No provider answered. Using fallback categorization.")
+    return _keyword_result(contents[primary])
+
+def _hedge_delay(provider: str) -> float:
+    """
+    Returns how long to wait for `provider` before hedging: its latency percentile, clamped.
+    """
+    latency = get_latency_tracker().percentile(provider, HEDGE_PERCENTILE)
+    if latency is None:
+        return HEDGE_MAX_DELAY_SECONDS
+    return min(max(latency, HEDGE_MIN_DELAY_SECONDS), HEDGE_MAX_DELAY_SECONDS)
+
+def _may_hedge(provider: str) -> bool:
+    """
+    Counts a second request if the hedge budget and the provider's quota allow it right now.
+
+    In hedge mode the budget is HEDGE_MAX_RATIO second requests per first
+    request, and at least one, so a short run can hedge its one stalled
+    request. Race mode asks both providers for every email, so only the
+    second provider's quota limits it.
+    """
+    with _hedge_lock:
+        if HEDGE_MODE == "hedge" and hedge_counters["hedged"] >= max(1.0, HEDGE_MAX_RATIO * hedge_counters["requests"]):
+            print(f"Hedge budget used up (HEDGE_MAX_RATIO={HEDGE_MAX_RATIO}), not asking {provider}")
+            hedge_counters["skipped"] += 1
+            return False
+        if not get_rate_limiter().try_acquire(provider):
+            hedge_counters["skipped"] += 1
+            return False
+        hedge_counters["hedged"] += 1
+        return True
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    global _hedge_executor
+    with _hedge_lock:
+        if _hedge_executor is None:
+            # Abandoned requests keep their thread until they return, so leave room for them
+            _hedge_executor = ThreadPoolExecutor(
+                max_workers=4 * max(1, PROCESSING_CONCURRENCY), thread_name_prefix="categorizer"
+            )
+        return _hedge_executor
@@ -0,0 +1,163 @@
+"""
+MIME parsing helpers that turn raw messages into the pipeline's email dictionaries.
+"""
+
+import email.message
+from email.header import decode_header, make_header
+from typing import Any, Dict, Optional, Tuple
+
+from config import BODY_TOKEN_BUDGET
+from .body_preprocessing import html_to_text, preprocess_body
+
+# Decoded text handed to preprocessing; bulk fetches are already cut at FETCH_BODY_BYTES
+MAX_RAW_BODY_CHARS = 100000
+
+
+def decode_header_value(value: Optional[str]) -> str:
+    """
+    Decodes an RFC 2047 header into text, joining every encoded chunk.
+
+    "=?utf-8?q?caf=C3=A9?= menu" -> "café menu"
+
+    Args:
+        value: The raw header value (may be None)
+
+    Returns:
+        str: The decoded header, or an empty string if missing
+    """
+    if value is None:
+        return ""
+    try:
+        return str(make_header(decode_header(str(value))))
+    except (LookupError, UnicodeDecodeError, ValueError):
+        # Unknown charset or broken encoding: decode each chunk leniently
+        chunks = []
+        for chunk, charset in decode_header(str(value)):
+            if isinstance(chunk, bytes):
+                chunk = decode_bytes(chunk, charset)
+            chunks.append(chunk)
+        return "".join(chunks)
+
+
+def decode_bytes(data: bytes, charset: Optional[str]) -> str:
+    """
+    Decodes bytes with the declared charset, replacing undecodable characters.
+
+    Falls back to UTF-8 when the charset is missing or unknown to Python.
+    """
+    try:
+        return data.decode(charset or 'utf-8', errors='replace')
+    except LookupError:
+        return data.decode('utf-8', errors='replace')
+
+
+def decode_part(part: email.message.Message, max_chars: Optional[int] = None) -> str:
+    """
+    Decodes a single MIME part's payload exactly once.
+
+    Args:
+        part: A non-multipart message part
+        max_chars: Truncate the decoded text to this many characters (optional)
+
+    Returns:
+        str: The decoded text, or an empty string if the part has no payload
+    """
+    payload = part.get_payload(decode=True)
+    if not payload:
+        return ""
+    if max_chars is not None:
+        # A character is at most 4 bytes in any charset we care about
+        payload = payload[:max_chars * 4]
+    text = decode_bytes(payload, part.get_content_charset())
+    return text[:max_chars] if max_chars is not None else text
+
+
+def find_text_part(msg: email.message.Message, content_type: str = "text/plain") -> Optional[email.message.Message]:
+    """
+    Returns the first inline part of the given type (text/plain by default), if any.
+    """
+    for part in msg.walk():
+        if part.is_multipart():
+            continue
+        if part.get_content_disposition() == "attachment":
+            continue
+        if part.get_content_type() == content_type:
+            return part
+    return None
+
+
+def extract_body(msg: email.message.Message, max_tokens: Optional[int] = BODY_TOKEN_BUDGET) -> str:
+    """
+    Extracts the body of a message, cleaned by preprocess_body().
+
+    The text/plain part is used if it has any text left after cleaning,
+    otherwise the text/html part is converted to text.
+
+    Args:
+        msg: The parsed message
+        max_tokens: Token budget of the body
+
+    Returns:
+        str: The cleaned body text, or an empty string if there is none
+    """
+    return _extract_body(msg, max_tokens)[0]
+
+
+def _extract_body(msg: email.message.Message, max_tokens: Optional[int]) -> Tuple[str, int]:
+    """
+    extract_body(), also returning the length of the decoded text before cleaning.
+    """
+    body, raw_chars = "", 0
+    for content_type in ("text/plain", "text/html"):
+        part = find_text_part(msg, content_type)
+        if part is None:
+            continue
+        text = decode_part(part, MAX_RAW_BODY_CHARS)
+        # The length of an HTML body is that of its visible text, not of the markup
+        if content_type == "text/html":
+            text = html_to_text(text)
+        raw_chars = len(text)
+        body = preprocess_body(text, False, max_tokens)
+        if body:
+            break
+    return body, raw_chars
+
+
+def parse_email(email_id: str, msg: email.message.Message, max_tokens: Optional[int] = BODY_TOKEN_BUDGET,
+                structure: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    """
+    Builds the email dictionary used throughout the pipeline from a parsed message.
+
+    Args:
+        email_id: The message UID
+        msg: The parsed message
+        max_tokens: Token budget of the body
+        structure: Part counts from the server's BODYSTRUCTURE (see
+            parse_bodystructure() in tools/email_tools.py), for messages
+            that were only partly downloaded
+
+    Returns:
+        Dict[str, Any]: Dictionary with id, subject, from, date, body, the
+        length of the decoded body before cleaning and trimming ("body_chars")
+        and the number of MIME leaf parts ("mime_parts") and attachments
+        ("attachments")
+    """
+    body, body_chars = _extract_body(msg, max_tokens)
+    if structure is not None:
+        mime_parts, attachments = structure["mime_parts"], structure["attachments"]
+        # A truncated download only holds the start of a long text/plain body
+        body_chars = max(body_chars, structure["text_chars"])
+    else:
+        leaves = [part for part in msg.walk() if not part.is_multipart()]
+        mime_parts = len(leaves)
+        attachments = sum(1 for part in leaves if part.get_content_disposition() == "attachment")
+    return {
+        "id": email_id,
+        "subject": decode_header_value(msg.get("Subject")),
+        "from": decode_header_value(msg.get("From")),
+        "date": msg.get("Date"),
+        "body": body,
+        "body_chars": body_chars,
+        "mime_parts": mime_parts,
+        "attachments": attachments,
+    }
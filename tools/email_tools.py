@@ -2,148 +2,422 @@
 Email tools for fetching and processing emails.
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Set, Tuple
 import email
-from email.header import decode_header
-import imaplib
+import email.message
 import re
-from crewai.tools import tool
 
-from config import GMAIL_USERNAME, GMAIL_APP_PASSWORD
-
-def fetch_emails_func(limit=3) -> List[Dict[str, Any]] | str:
+from config import (
+    GMAIL_USERNAME,
+    GMAIL_APP_PASSWORD,
+    FETCH_BODY_BYTES,
+    FETCH_CHUNK_SIZE,
+    MARK_FETCHED_AS_SEEN,
+    INCREMENTAL_SYNC,
+)
+from .email_parsing import parse_email
+from .gmail_session import gmail_session, GmailSession
+from .label_registry import get_label_registry, to_imap_label
+from .sync_state import get_sync_state
+from .categorization_result import CategorizationResult
+
+# Keep UID STORE command lines well under server line-length limits
+MAX_UIDS_PER_STORE = 500
+
+# Headers requested by the bulk fetch (Content-* are needed to decode the body)
+FETCH_HEADER_FIELDS = "FROM SUBJECT DATE MIME-VERSION CONTENT-TYPE CONTENT-TRANSFER-ENCODING"
+
+# Patterns for splitting FETCH responses into messages and sections
+FETCH_START_RE = re.compile(rb'^\d+ \(')
+UID_RE = re.compile(rb'\bUID (\d+)')
+MSGID_RE = re.compile(rb'\bX-GM-MSGID (\d+)')
+LITERAL_SECTION_RE = re.compile(rb'(BODY\[[^\]]*\](?:<\d+>)?) \{\d+\}$')
+# Tokens of a parenthesized FETCH item such as BODYSTRUCTURE: parentheses, quoted strings, literals and atoms
+IMAP_TOKEN_RE = re.compile(rb'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|\{\d+\}|([^\s()"]+))')
+STATUS_ITEM_RE = re.compile(r'\b(UIDVALIDITY|UIDNEXT|MESSAGES|UNSEEN) (\d+)')
+# The label list of a FETCH (X-GM-LABELS) response, and the labels in it
+LABELS_ITEM_RE = re.compile(r'X-GM-LABELS \(((?:[^()"]|"(?:[^"\\]|\\.)*")*)\)')
+LABEL_TOKEN_RE = re.compile(r'"((?:[^"\\]|\\.)*)"|(\S+)')
+
+def fetch_emails_func(limit=3, bulk=True) -> List[Dict[str, Any]] | str:
     """
     Fetches unread emails from Gmail using IMAP.
     Returns a list of email dictionaries or an error string.
+
+    See iter_emails() for the fetch modes; use it directly to start working on
+    the first email before the rest have been downloaded.
     """
     try:
-        # Configuration
-        if not GMAIL_USERNAME or not GMAIL_APP_PASSWORD:
-            return "Error: Gmail credentials not found in environment variables"
-
-        print(f"Connecting to Gmail with username: {GMAIL_USERNAME}")
-
-        # Connect to Gmail
-        mail = imaplib.IMAP4_SSL("imap.gmail.com")
-        mail.login(GMAIL_USERNAME, GMAIL_APP_PASSWORD)
-        mail.select("inbox")
-
-        # Search for unread emails
-        _, messages = mail.search(None, "UNSEEN")
-        email_ids = messages[0].split()
-
-        print(f"Found {len(email_ids)} unread emails")
-
-        # Limit number of emails to process
-        email_ids = email_ids[-limit:] if limit and len(email_ids) > limit else email_ids
-
-        emails = []
-        for e_id in email_ids:
-            _, msg_data = mail.fetch(e_id, "(RFC822)")
-            raw_email = msg_data[0][1]
-            msg = email.message_from_bytes(raw_email)
-
-            # Extract email details
-            subject = decode_header(msg["Subject"])[0][0]
-            if isinstance(subject, bytes):
-                subject = subject.decode()
-            sender = msg.get("From")
-            date_str = msg.get("Date")
-
-            # Get body
-            body = ""
-            if msg.is_multipart():
-                for part in msg.walk():
-                    content_type = part.get_content_type()
-                    content_disposition = str(part.get("Content-Disposition"))
-
-                    # Skip attachments
-                    if "attachment" not in content_disposition and part.get_payload(decode=True):
-                        if content_type == "text/plain":
-                            try:
-                                body = part.get_payload(decode=True).decode('utf-8') # Try UTF-8 first
-                            except UnicodeDecodeError:
-                                try:
-                                    # Fallback to latin-1 if utf-8 fails
-                                    body = part.get_payload(decode=True).decode('latin-1')
-                                except UnicodeDecodeError:
-                                    body = "Unable to decode email body (tried utf-8, latin-1)" # Placeholder if both fail
-                            break # Found plain text body, stop searching parts
-            else:
-                 # Handle non-multipart emails
-                if msg.get_payload(decode=True):
-                    try:
-                        body = msg.get_payload(decode=True).decode('utf-8')
-                    except UnicodeDecodeError:
-                        try:
-                            body = msg.get_payload(decode=True).decode('latin-1')
-                        except UnicodeDecodeError:
-                            body = "Unable to decode email body (tried utf-8, latin-1)"
-
-            email_data = {
-                "id": e_id.decode(),
-                "subject": subject,
-                "from": sender,
-                "date": date_str,
-                "body": body[:1000]  # Truncate large emails
-            }
-
-            emails.append(email_data)
-            print(f"Fetched email: {subject}")
-
-        mail.close()
-        mail.logout()
-
-        return emails
+        return list(iter_emails(limit, bulk))
     except Exception as e:
         return f"Error fetching emails: {str(e)}"
 
-def create_gmail_label(label_name: str) -> bool:
+def iter_emails(limit=3, bulk=True, chunk_size: int = FETCH_CHUNK_SIZE,
+                incremental: bool = INCREMENTAL_SYNC) -> Iterator[Dict[str, Any]]:
+    """
+    Yields emails from Gmail one at a time, oldest chunk first.
+
+    With `incremental=True` (the default) only messages above the persisted
+    UID high-water mark are returned (`UID SEARCH UID <last+1>:*`), oldest
+    first, so nothing is skipped when `limit` cuts the batch short. The mark
+    is moved by mark_emails_processed(). On the first run, or when the
+    mailbox UIDVALIDITY changed, it falls back to the UNSEEN messages, also
+    oldest first, so the first mark doesn't skip older unread mail. With
+    `incremental=False` the newest UNSEEN messages are returned.
+
+    With `bulk=True` (the default) messages are downloaded in chunks of
+    `chunk_size`, each with a single UID FETCH of selected headers plus the
+    first FETCH_BODY_BYTES of the body, using BODY.PEEK so nothing is
+    implicitly marked as read. With `bulk=False` each message is fetched in
+    full with its own command. No connection is held while the caller works
+    on a yielded email.
+
+    Each email dictionary carries the message UID as "id", the mailbox
+    UIDVALIDITY as "uidvalidity" and Gmail's permanent message ID
+    (X-GM-MSGID) as "msgid".
+
+    Raises:
+        ValueError: If the Gmail credentials are missing
+        imaplib.IMAP4.error: On IMAP failures
+    """
+    # Configuration
+    if not GMAIL_USERNAME or not GMAIL_APP_PASSWORD:
+        raise ValueError("Gmail credentials not found in environment variables")
+
+    print(f"Connecting to Gmail with username: {GMAIL_USERNAME}")
+
+    # Reuse a pooled Gmail connection
+    with gmail_session("inbox") as mail:
+        uidvalidity = get_mailbox_status(mail, "inbox").get("UIDVALIDITY")
+        last_uid = None
+        if incremental and uidvalidity is not None:
+            last_uid = get_sync_state().last_uid("inbox", uidvalidity)
+
+        if last_uid is not None:
+            # Only look at messages that arrived after the last processed one
+            _, messages = mail.run("uid", "SEARCH", None, f"UID {last_uid + 1}:*")
+            # "n:*" always matches the newest message, even when its UID is below n
+            email_ids = [e_id.decode() for e_id in messages[0].split() if int(e_id) > last_uid]
+            print(f"Found {len(email_ids)} new emails since UID {last_uid}")
+
+            # Oldest first, so the high-water mark never jumps over unprocessed mail
+            email_ids = email_ids[:limit] if limit else email_ids
+        else:
+            # Search for unread emails (by UID, which stays stable across commands)
+            _, messages = mail.run("uid", "SEARCH", None, "UNSEEN")
+            email_ids = [e_id.decode() for e_id in messages[0].split()]
+            print(f"Found {len(email_ids)} unread emails")
+
+            if incremental:
+                # Oldest first here too: the mark set after this batch must not
+                # jump over older unread mail that didn't fit into `limit`
+                email_ids = email_ids[:limit] if limit else email_ids
+            else:
+                # Without a mark, the most recent unread emails matter most
+                email_ids = email_ids[-limit:] if limit and len(email_ids) > limit else email_ids
+
+    step = max(1, chunk_size) if bulk else 1
+    for start in range(0, len(email_ids), step):
+        chunk = email_ids[start:start + step]
+        with gmail_session("inbox") as mail:
+            messages_by_uid = _fetch_chunk(mail, chunk, bulk)
+
+            # Keep the previous behaviour of marking fetched mail as read, in one command
+            if MARK_FETCHED_AS_SEEN and messages_by_uid:
+                mail.run("uid", "STORE", compress_uid_set(messages_by_uid), "+FLAGS", "(\\Seen)")
+
+        for e_id in chunk:
+            fetched = messages_by_uid.get(e_id)
+            if fetched is None:
+                print(f"Email {e_id} was not returned by the server, skipping")
+                continue
+
+            msg, msgid, structure = fetched
+            email_data = parse_email(e_id, msg, structure=structure)
+            email_data["uidvalidity"] = uidvalidity
+            email_data["msgid"] = msgid
+            print(f"Fetched email: {email_data['subject']}")
+            yield email_data
+
+def has_new_mail(mailbox: str = "inbox", incremental: bool = INCREMENTAL_SYNC) -> bool:
+    """
+    Checks with a single STATUS command whether iter_emails() would find any mail.
+
+    With incremental sync and a high-water mark for the current UIDVALIDITY,
+    mail is new if UIDNEXT moved past the mark. Otherwise (first run,
+    UIDVALIDITY changed or incremental sync off) the UNSEEN count decides.
+
+    Raises:
+        ValueError: If the Gmail credentials are missing
+        imaplib.IMAP4.error: On IMAP failures
+    """
+    if not GMAIL_USERNAME or not GMAIL_APP_PASSWORD:
+        raise ValueError("Gmail credentials not found in environment variables")
+
+    # STATUS doesn't need a selected mailbox
+    with gmail_session(None) as mail:
+        status = get_mailbox_status(mail, mailbox, "UIDVALIDITY UIDNEXT UNSEEN")
+
+    last_uid = None
+    if incremental and "UIDVALIDITY" in status:
+        last_uid = get_sync_state().last_uid(mailbox, status["UIDVALIDITY"])
+    if last_uid is not None and "UIDNEXT" in status:
+        return status["UIDNEXT"] > last_uid + 1
+    return status.get("UNSEEN", 1) > 0
+
+def mark_emails_processed(emails: Iterable[Dict[str, Any]], mailbox: str = "inbox") -> None:
+    """
+    Advances the persisted UID high-water mark past the given emails.
+
+    Call this only once the emails are fully handled (categorized and
+    labeled); the next incremental iter_emails() starts after them.
+
+    Args:
+        emails: Email dictionaries as yielded by iter_emails()
+        mailbox: The mailbox they were fetched from
+    """
+    highest: Dict[int, int] = {}
+    for email_data in emails:
+        uidvalidity = email_data.get("uidvalidity")
+        if uidvalidity is None:
+            continue
+        highest[uidvalidity] = max(highest.get(uidvalidity, 0), int(email_data["id"]))
+
+    sync_state = get_sync_state()
+    for uidvalidity, uid in highest.items():
+        sync_state.advance(mailbox, uidvalidity, uid)
+
+def get_mailbox_status(mail: GmailSession, mailbox: str = "inbox",
+                       items: str = "UIDVALIDITY UIDNEXT MESSAGES") -> Dict[str, int]:
+    """
+    Returns UIDVALIDITY, UIDNEXT and MESSAGES (or the given items) for a mailbox with one STATUS command.
+    """
+    _, data = mail.run("status", mailbox, f"({items})")
+    text = b" ".join(item for item in data if isinstance(item, bytes)).decode('ascii', errors='replace')
+    return {key: int(value) for key, value in STATUS_ITEM_RE.findall(text)}
+
+def _fetch_chunk(mail: GmailSession, email_ids: List[str],
+                 bulk: bool) -> Dict[str, Tuple[email.message.Message, Optional[str], Optional[Dict[str, int]]]]:
+    """
+    Downloads the given UIDs and returns the parsed messages, their Gmail
+    message IDs (X-GM-MSGID) and, for bulk fetches, their part counts from
+    BODYSTRUCTURE, keyed by UID.
+    """
+    if bulk:
+        return _bulk_fetch(mail, email_ids)
+
+    messages_by_uid = {}
+    for e_id in email_ids:
+        _, msg_data = mail.run("uid", "FETCH", e_id, "(X-GM-MSGID BODY.PEEK[])")
+        if msg_data and isinstance(msg_data[0], tuple):
+            msgid = MSGID_RE.search(msg_data[0][0])
+            # The whole message is here, so its parts are counted from it
+            messages_by_uid[e_id] = (
+                email.message_from_bytes(msg_data[0][1]),
+                msgid.group(1).decode() if msgid else None,
+                None,
+            )
+    return messages_by_uid
+
+def _bulk_fetch(mail: GmailSession,
+                email_ids: List[str]) -> Dict[str, Tuple[email.message.Message, Optional[str], Optional[Dict[str, int]]]]:
+    """
+    Downloads headers and a bounded body prefix for many messages in one UID FETCH.
+
+    BODYSTRUCTURE comes with them, so parts cut off by the body limit are
+    still counted.
+
+    Returns:
+        Dict[str, Tuple[Message, Optional[str], Optional[Dict[str, int]]]]:
+        Parsed (possibly truncated) messages, their X-GM-MSGID and their
+        parse_bodystructure() counts, keyed by UID
+    """
+    uid_set = compress_uid_set(email_ids)
+    items = (f"(UID X-GM-MSGID BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS ({FETCH_HEADER_FIELDS})] "
+             f"BODY.PEEK[TEXT]<0.{FETCH_BODY_BYTES}>)")
+    _, msg_data = mail.run("uid", "FETCH", uid_set, items)
+
+    messages = {}
+    for uid, sections in parse_fetch_response(msg_data).items():
+        header = sections.get("HEADER", b"")
+        # The header block ends with an empty line; make sure the body starts after it
+        if not header.endswith(b"\r\n\r\n") and not header.endswith(b"\n\n"):
+            header += b"\r\n"
+        msgid = MSGID_RE.search(sections["META"])
+        messages[uid] = (
+            email.message_from_bytes(header + sections.get("TEXT", b"")),
+            msgid.group(1).decode() if msgid else None,
+            parse_bodystructure(sections["META"]),
+        )
+    return messages
+
+def parse_fetch_response(msg_data: List[Any]) -> Dict[str, Dict[str, bytes]]:
+    """
+    Groups the raw data of a (UID) FETCH response by message UID.
+
+    imaplib returns a flat list in which every literal is a (prefix, data)
+    tuple and the rest of the response line arrives as plain bytes, e.g.
+
+        [(b'1 (UID 42 BODY[HEADER.FIELDS (FROM)] {20}', b'From: a@b.c...'),
+         (b' BODY[TEXT]<0> {512}', b'...'), b')']
+
+    Args:
+        msg_data: The data part of an imaplib FETCH result
+
+    Returns:
+        Dict[str, Dict[str, bytes]]: For each UID, literal sections keyed by a
+        short name ("HEADER", "TEXT", or the raw section name) plus "META",
+        the non-literal parts of the response (flags, labels, ...)
+    """
+    messages = []
+    current = None
+
+    for item in msg_data:
+        if item is None:
+            continue
+        prefix = item[0] if isinstance(item, tuple) else item
+
+        if FETCH_START_RE.match(prefix) or current is None:
+            current = {"META": b""}
+            messages.append(current)
+        current["META"] += prefix
+
+        if isinstance(item, tuple):
+            section = LITERAL_SECTION_RE.search(prefix)
+            if section:
+                current[_section_key(section.group(1))] = item[1]
+
+    by_uid = {}
+    for message in messages:
+        uid = UID_RE.search(message["META"])
+        if uid:
+            by_uid[uid.group(1).decode()] = message
+    return by_uid
+
+def parse_bodystructure(meta: bytes) -> Optional[Dict[str, int]]:
+    """
+    Counts the parts of a message from the BODYSTRUCTURE item of its FETCH response.
+
+    Args:
+        meta: The non-literal part of the response ("META" of parse_fetch_response())
+
+    Returns:
+        Optional[Dict[str, int]]: "mime_parts" (leaf parts), "attachments" and
+        "text_chars" (size of the first inline text/plain part), or None
+        if the response has no readable BODYSTRUCTURE
+    """
+    start = meta.find(b"BODYSTRUCTURE (")
+    if start < 0:
+        return None
+    try:
+        structure, _ = _parse_imap_list(meta, start + len(b"BODYSTRUCTURE "))
+    except (IndexError, ValueError):
+        return None
+
+    counts = {"mime_parts": 0, "attachments": 0, "text_chars": 0}
+    pending = [structure]
+    while pending:
+        part = pending.pop(0)
+        if not part:
+            continue
+        if isinstance(part[0], list):
+            # multipart: the sub-parts come first, then the subtype and extensions
+            pending[:0] = part[:_first_atom(part)]
+            continue
+
+        counts["mime_parts"] += 1
+        # The disposition is the first extension field that looks like ("attachment" (...))
+        disposition = next(
+            (item[0].lower() for item in part[7:]
+             if isinstance(item, list) and item and isinstance(item[0], str)
+             and item[0].lower() in ("attachment", "inline")),
+            None,
+        )
+        if disposition == "attachment":
+            counts["attachments"] += 1
+        elif (str(part[0]).lower(), str(part[1]).lower()) == ("text", "plain") and not counts["text_chars"]:
+            counts["text_chars"] = int(part[6]) if str(part[6]).isdigit() else 0
+    return counts
+
+
+def _first_atom(items: List[Any]) -> int:
+    """
+    Returns the index of the first non-list item (the subtype of a multipart body).
+    """
+    return next((index for index, item in enumerate(items) if not isinstance(item, list)), len(items))
+
+
+def _parse_imap_list(data: bytes, pos: int) -> Tuple[List[Any], int]:
+    """
+    Parses the parenthesized list starting at data[pos] into nested Python lists.
+
+    Strings and atoms become str, NIL becomes None and literals (whose data
+    isn't part of `data`) become empty strings.
+
+    Returns:
+        Tuple[List[Any], int]: The list and the position after its closing parenthesis
+
+    Raises:
+        ValueError: If the list is malformed or not closed
+    """
+    stack: List[List[Any]] = []
+    while True:
+        token = IMAP_TOKEN_RE.match(data, pos)
+        if token is None:
+            raise ValueError(f"Unexpected data at {pos}")
+        pos = token.end()
+        opening, closing, quoted, atom = token.groups()
+        if opening:
+            stack.append([])
+            continue
+        if closing:
+            if not stack:
+                raise ValueError("Unbalanced parenthesis")
+            finished = stack.pop()
+            if not stack:
+                return finished, pos
+            stack[-1].append(finished)
+            continue
+        if not stack:
+            raise ValueError("Expected a list")
+        if quoted is not None:
+            stack[-1].append(re.sub(rb'\\(.)', rb'\1', quoted).decode('utf-8', errors='replace'))
+        elif atom is not None:
+            value = atom.decode('ascii', errors='replace')
+            stack[-1].append(None if value.upper() == "NIL" else value)
+        else:
+            stack[-1].append("")
+
+
+def _section_key(section: bytes) -> str:
+    name = section.decode('ascii', errors='replace').upper()
+    if name.startswith("BODY[HEADER"):
+        return "HEADER"
+    if name.startswith("BODY[TEXT]"):
+        return "TEXT"
+    return name
+
+def create_gmail_label(label_name: str, mail: Optional[GmailSession] = None) -> bool:
     """
     Creates a new label in Gmail if it doesn't exist.
 
     Args:
         label_name: The name of the label to create
+        mail: An already checked-out session to reuse (optional)
 
     Returns:
         bool: True if successful, False otherwise
     """
+    if mail is None:
+        try:
+            with gmail_session(None) as mail:
+                return create_gmail_label(label_name, mail)
+        except Exception as e:
+            print(f"Error creating label {label_name}: {str(e)}")
+            return False
+
     try:
-        # Connect to Gmail
-        mail = imaplib.IMAP4_SSL("imap.gmail.com")
-        mail.login(GMAIL_USERNAME, GMAIL_APP_PASSWORD)
-
-        # Format label name for IMAP (replace slashes with dots)
-        imap_label_name = label_name.replace('/', '.')
-
-        # List all labels
-        _, labels = mail.list()
-
-        # Check if label already exists
-        label_exists = False
-        for label in labels:
-            label_str = label.decode('utf-8') if isinstance(label, bytes) else str(label)
-            if imap_label_name in label_str:
-                label_exists = True
-                print(f"Label already exists: {label_name}")
-                break
-
-        # Create label if it doesn't exist
-        if not label_exists:
-            try:
-                result = mail.create(f'"{imap_label_name}"')
-                print(f"Created label: {label_name}, Result: {result}")
-            except Exception as create_error:
-                # Try alternative format if the first attempt fails
-                try:
-                    result = mail.create(imap_label_name)
-                    print(f"Created label (alt method): {label_name}, Result: {result}")
-                except Exception as alt_error:
-                    print(f"Both label creation methods failed: {str(create_error)} | {str(alt_error)}")
-                    return False
-
-        mail.logout()
-        return True
+        return get_label_registry().ensure(mail, [label_name])
     except Exception as e:
         print(f"Error creating label {label_name}: {str(e)}")
         return False
@@ -153,96 +427,167 @@ def apply_gmail_label(email_id: str, label_name: str) -> bool:
     Applies a label to an email in Gmail.
 
     Args:
-        email_id: The ID of the email to label
+        email_id: The UID of the email to label
         label_name: The name of the label to apply
 
     Returns:
         bool: True if successful, False otherwise
     """
     try:
-        # Connect to Gmail
-        mail = imaplib.IMAP4_SSL("imap.gmail.com")
-        mail.login(GMAIL_USERNAME, GMAIL_APP_PASSWORD)
-        mail.select("inbox")
+        with gmail_session("inbox") as mail:
+            return _store_label(mail, email_id, label_name)
+    except Exception as e:
+        print(f"Error applying label {label_name} to email {email_id}: {str(e)}")
+        return False
 
-        # Make sure the label exists
-        create_gmail_label(label_name)
+def _store_label(mail: GmailSession, email_id: str, label_name: str) -> bool:
+    """
+    Applies a label over a session that has the inbox selected.
+    """
+    # Make sure the label exists
+    create_gmail_label(label_name, mail)
 
-        # Format label name for IMAP (replace slashes with dots)
-        imap_label_name = label_name.replace('/', '.')
+    imap_label_name = to_imap_label(label_name)
 
-        # Apply the label
+    # Apply the label
+    try:
+        result = mail.run("uid", "STORE", email_id, '+X-GM-LABELS', f'({imap_label_name})')
+        print(f"Applied label '{label_name}' to email {email_id}, Result: {result}")
+    except Exception as store_error:
+        # Try alternative format if the first attempt fails
         try:
-            result = mail.store(email_id.encode(), '+X-GM-LABELS', f'({imap_label_name})')
-            print(f"Applied label '{label_name}' to email {email_id}, Result: {result}")
-        except Exception as store_error:
-            # Try alternative format if the first attempt fails
-            try:
-                result = mail.store(email_id.encode(), '+X-GM-LABELS', imap_label_name)
-                print(f"Applied label (alt method) '{label_name}' to email {email_id}, Result: {result}")
-            except Exception as alt_error:
-                print(f"Both label application methods failed: {str(store_error)} | {str(alt_error)}")
-                return False
-
-        mail.close()
-        mail.logout()
+            result = mail.run("uid", "STORE", email_id, '+X-GM-LABELS', imap_label_name)
+            print(f"Applied label (alt method) '{label_name}' to email {email_id}, Result: {result}")
+        except Exception as alt_error:
+            print(f"Both label application methods failed: {str(store_error)} | {str(alt_error)}")
+            return False
+
+    return True
+
+def compress_uid_set(uids: Iterable[str]) -> str:
+    """
+    Builds a compact IMAP UID set, collapsing consecutive UIDs into ranges.
+
+    Example: ["1", "2", "3", "7"] -> "1:3,7"
+    """
+    numbers = sorted({int(uid) for uid in uids})
+    ranges = []
+    for number in numbers:
+        if ranges and number == ranges[-1][1] + 1:
+            ranges[-1][1] = number
+        else:
+            ranges.append([number, number])
+    return ",".join(str(a) if a == b else f"{a}:{b}" for a, b in ranges)
+
+def apply_labels_batch(categorizations: Dict[str, CategorizationResult]) -> bool:
+    """
+    Applies categorization labels to many emails at once.
+
+    Messages are grouped by label and each label is applied with a single
+    `UID STORE <set> +X-GM-LABELS` command (split into chunks of
+    MAX_UIDS_PER_STORE), all over one pooled connection.
+
+    Args:
+        categorizations: Mapping of email UID to categorization result
+
+    Returns:
+        bool: True if every label was applied, False otherwise
+    """
+    # Group messages by label
+    uids_by_label: Dict[str, List[str]] = {}
+    for email_id, categorization in categorizations.items():
+        for label_name in categorization.labels():
+            uids_by_label.setdefault(label_name, []).append(email_id)
+
+    if not uids_by_label:
         return True
+
+    try:
+        success = True
+        registry = get_label_registry()
+        with gmail_session("inbox") as mail:
+            # Create any missing labels up front (no LIST when they are all known)
+            registry.ensure(mail, uids_by_label.keys())
+
+            for label_name, uids in uids_by_label.items():
+                imap_label_name = to_imap_label(label_name)
+
+                for start in range(0, len(uids), MAX_UIDS_PER_STORE):
+                    uid_set = compress_uid_set(uids[start:start + MAX_UIDS_PER_STORE])
+                    result = mail.run("uid", "STORE", uid_set, '+X-GM-LABELS', f'({imap_label_name})')
+                    if result[0] != "OK":
+                        print(f"Failed to apply label '{label_name}' to emails {uid_set}: {result}")
+                        # The label may have been deleted on the server; re-list next time
+                        registry.invalidate()
+                        success = False
+                    else:
+                        print(f"Applied label '{label_name}' to emails {uid_set}")
+
+        return success
     except Exception as e:
-        print(f"Error applying label {label_name} to email {email_id}: {str(e)}")
+        print(f"Error applying labels to {len(categorizations)} emails: {str(e)}")
         return False
 
+def fetch_labels(uids: Iterable[str]) -> Dict[str, Set[str]]:
+    """
+    Reads the Gmail labels of many emails with one `UID FETCH <set> (X-GM-LABELS)`
+    (split into chunks of MAX_UIDS_PER_STORE).
+
+    Args:
+        uids: Email UIDs
+
+    Returns:
+        Dict[str, Set[str]]: The label names of each email found, keyed by UID
+    """
+    uids = list(dict.fromkeys(uids))
+    labels: Dict[str, Set[str]] = {}
+    with gmail_session("inbox") as mail:
+        for start in range(0, len(uids), MAX_UIDS_PER_STORE):
+            uid_set = compress_uid_set(uids[start:start + MAX_UIDS_PER_STORE])
+            _, data = mail.run("uid", "FETCH", uid_set, '(X-GM-LABELS)')
+            for item in data or []:
+                line = item[0] if isinstance(item, tuple) else item
+                if not isinstance(line, bytes):
+                    continue
+                uid = UID_RE.search(line)
+                found = LABELS_ITEM_RE.search(line.decode('utf-8', errors='replace'))
+                if uid and found:
+                    labels[uid.group(1).decode()] = {
+                        quoted.replace('\\"', '"').replace('\\\\', '\\') if quoted else atom
+                        for quoted, atom in LABEL_TOKEN_RE.findall(found.group(1))
+                    }
+    return labels
+
+def verify_labels(categorizations: Dict[str, CategorizationResult]) -> Dict[str, List[str]]:
+    """
+    Checks on the server that every email carries the labels of its categorization.
+
+    Args:
+        categorizations: Mapping of email UID to categorization result
+
+    Returns:
+        Dict[str, List[str]]: The missing labels of each email that lacks some, keyed by UID
+    """
+    applied = fetch_labels(categorizations)
+    missing = {}
+    for email_id, categorization in categorizations.items():
+        # Gmail matches label names case-insensitively
+        server_labels = {to_imap_label(label).casefold() for label in applied.get(email_id, ())}
+        absent = [label for label in categorization.labels()
+                  if to_imap_label(label).casefold() not in server_labels]
+        if absent:
+            missing[email_id] = absent
+    return missing
+
 def apply_categorization_labels(email_id: str, categorization: str) -> bool:
     """
     Applies appropriate labels based on email categorization.
 
     Args:
-        email_id: The ID of the email
+        email_id: The UID of the email
         categorization: The categorization result string
 
     Returns:
         bool: True if successful, False otherwise
     """
-    try:
-        # Parse categorization
-        priority = "Unknown"
-        category = "Unknown"
-        needs_response = "Unknown"
-
-        for line in categorization.split('\n'):
-            if line.startswith("Priority:"):
-                priority = line.replace("Priority:", "").strip()
-            elif line.startswith("Category:"):
-                category = line.replace("Category:", "").strip()
-            elif line.startswith("Needs Response:"):
-                needs_response = line.replace("Needs Response:", "").strip()
-
-        # Create and apply priority label
-        priority_label = f"Priority/{priority}"
-        apply_gmail_label(email_id, priority_label)
-
-        # Create and apply category label
-        category_label = f"Category/{category}"
-        apply_gmail_label(email_id, category_label)
-
-        # Create and apply response label if needed
-        if needs_response.lower() == "yes":
-            apply_gmail_label(email_id, "Needs_Response")
-
-        return True
-    except Exception as e:
-        print(f"Error applying categorization labels to email {email_id}: {str(e)}")
-        return False
-
-@tool
-def fetch_emails(limit=3) -> List[Dict[str, Any]] | str:
-    """Fetches unread emails from Gmail using IMAP."""
-    return fetch_emails_func(limit)
-
-@tool
-def apply_labels(email_id: str, categorization: str) -> str:
-    """Applies Gmail labels based on email categorization."""
-    success = apply_categorization_labels(email_id, categorization)
-    if success:
-        return f"Successfully applied labels to email {email_id}"
-    else:
-        return f"Failed to apply labels to email {email_id}"
+    return apply_labels_batch({email_id: CategorizationResult.parse(categorization)})
@@ -0,0 +1,337 @@
+"""
+Pooled IMAP sessions shared by every Gmail tool.
+
+Opening an IMAP4_SSL connection costs a TLS handshake plus a LOGIN round trip,
+so connections are kept alive for the lifetime of the process and handed out
+from a small pool instead of being created per operation.
+"""
+
+import atexit
+import imaplib
+import queue
+import re
+import select
+import socket
+import ssl
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Optional
+
+from config import (
+    GMAIL_USERNAME,
+    GMAIL_APP_PASSWORD,
+    IMAP_HOST,
+    IMAP_POOL_SIZE,
+    IMAP_NOOP_INTERVAL,
+)
+
+# Errors after which the connection is considered dead and is re-established
+RECONNECT_ERRORS = (imaplib.IMAP4.abort, ssl.SSLError, socket.error, EOFError)
+
+# Untagged responses that mean new mail arrived while in IDLE
+IDLE_NEW_MAIL_RE = re.compile(rb'^\* \d+ (EXISTS|RECENT)\b')
+
+
+def _has_buffered_data(conn: imaplib.IMAP4) -> bool:
+    """
+    Returns True if received data is waiting in the TLS layer or in imaplib's reader.
+
+    An untagged response that arrives in the same TLS record as the one
+    before it is read into `conn.file` along with it, where select() on the
+    socket doesn't see it. The reader is peeked with the socket switched to
+    non-blocking, so this never waits for the network.
+    """
+    sock = conn.sock
+    pending = getattr(sock, "pending", None)
+    if pending is not None and pending():
+        return True
+    previous_timeout = sock.gettimeout()
+    sock.settimeout(0.0)
+    try:
+        return bool(conn.file.peek(1))
+    except (BlockingIOError, ssl.SSLWantReadError):
+        return False
+    finally:
+        sock.settimeout(previous_timeout)
+
+
+class GmailSession:
+    """
+    A single authenticated IMAP connection that remembers its selected mailbox.
+
+    Commands should go through `run` so that a dropped connection is
+    transparently re-opened, logged in and re-selected before retrying once.
+    """
+
+    def __init__(self, host: str = IMAP_HOST, username: Optional[str] = GMAIL_USERNAME,
+                 password: Optional[str] = GMAIL_APP_PASSWORD):
+        self.host = host
+        self.username = username
+        self.password = password
+        self.conn: Optional[imaplib.IMAP4_SSL] = None
+        self.mailbox: Optional[str] = None
+        self.readonly = False
+        self.last_used = 0.0
+
+    def connect(self) -> None:
+        """
+        Opens the connection and logs in, re-selecting the previous mailbox if any.
+        """
+        if not self.username or not self.password:
+            raise ValueError("Gmail credentials not found in environment variables")
+
+        self.conn = imaplib.IMAP4_SSL(self.host)
+        self.conn.login(self.username, self.password)
+        self.last_used = time.monotonic()
+
+        if self.mailbox is not None:
+            self._select(self.mailbox, self.readonly)
+
+    def ensure_alive(self) -> None:
+        """
+        Connects if needed and probes idle connections with a NOOP.
+        """
+        if self.conn is None:
+            self.connect()
+            return
+
+        if time.monotonic() - self.last_used > IMAP_NOOP_INTERVAL:
+            try:
+                self.conn.noop()
+                self.last_used = time.monotonic()
+            except RECONNECT_ERRORS:
+                self.reconnect()
+
+    def reconnect(self) -> None:
+        """
+        Drops the current connection and opens a fresh one.
+        """
+        self._drop()
+        self.connect()
+
+    def select(self, mailbox: str = "inbox", readonly: bool = False) -> Any:
+        """
+        Selects a mailbox, skipping the round trip if it is already selected.
+
+        Args:
+            mailbox: The mailbox to select
+            readonly: Whether to open the mailbox with EXAMINE semantics
+
+        Returns:
+            The SELECT response, or None if the mailbox was already selected
+        """
+        self.ensure_alive()
+        if self.mailbox == mailbox and self.readonly == readonly:
+            return None
+        return self.run("select", mailbox, readonly)
+
+    def run(self, command: str, *args) -> Any:
+        """
+        Runs an imaplib command, reconnecting and retrying once on connection loss.
+
+        Args:
+            command: Name of the imaplib.IMAP4 method (e.g. "fetch", "uid")
+            *args: Arguments passed to the method
+
+        Returns:
+            Whatever the imaplib method returns
+        """
+        self.ensure_alive()
+        try:
+            result = self._call(command, *args)
+        except RECONNECT_ERRORS as e:
+            print(f"IMAP connection lost ({str(e)}), reconnecting...")
+            self.reconnect()
+            result = self._call(command, *args)
+        self.last_used = time.monotonic()
+        return result
+
+    def idle(self, timeout: float) -> bool:
+        """
+        Waits in IMAP IDLE (RFC 2177) until the server reports new mail or `timeout` expires.
+
+        A mailbox must be selected first. imaplib (before Python 3.14) has no
+        IDLE support, so the command is driven over the raw connection.
+
+        Args:
+            timeout: Maximum number of seconds to stay in IDLE
+
+        Returns:
+            bool: True if an EXISTS or RECENT notification arrived, False on timeout
+        """
+        self.ensure_alive()
+        conn = self.conn
+        tag = conn._new_tag()
+        conn.send(tag + b" IDLE\r\n")
+
+        # Wait for the "+ idling" continuation
+        while True:
+            line = conn.readline()
+            if not line:
+                raise imaplib.IMAP4.abort("connection closed while starting IDLE")
+            if line.startswith(b"+"):
+                break
+            if line.startswith(tag):
+                raise imaplib.IMAP4.error(f"IDLE rejected: {line.decode(errors='replace').strip()}")
+
+        has_new_mail = False
+        deadline = time.monotonic() + timeout
+        try:
+            while not has_new_mail:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                # Only block in readline once data is actually waiting; select()
+                # can't see lines already read into imaplib's buffer
+                if not _has_buffered_data(conn):
+                    readable, _, _ = select.select([conn.sock], [], [], remaining)
+                    if not readable:
+                        break
+                line = conn.readline()
+                if not line:
+                    raise imaplib.IMAP4.abort("connection closed during IDLE")
+                if IDLE_NEW_MAIL_RE.match(line):
+                    has_new_mail = True
+        finally:
+            conn.send(b"DONE\r\n")
+
+        # Drain until the tagged completion of IDLE
+        while True:
+            line = conn.readline()
+            if not line:
+                raise imaplib.IMAP4.abort("connection closed while ending IDLE")
+            if IDLE_NEW_MAIL_RE.match(line):
+                has_new_mail = True
+            if line.startswith(tag):
+                break
+
+        self.last_used = time.monotonic()
+        return has_new_mail
+
+    def logout(self) -> None:
+        """
+        Logs out and forgets the selected mailbox.
+        """
+        self._drop()
+        self.mailbox = None
+
+    def _call(self, command: str, *args) -> Any:
+        if command == "select":
+            return self._select(*args)
+        if command in ("close", "unselect"):
+            result = getattr(self.conn, command)()
+            self.mailbox = None
+            return result
+        return getattr(self.conn, command)(*args)
+
+    def _select(self, mailbox: str = "inbox", readonly: bool = False) -> Any:
+        result = self.conn.select(mailbox, readonly)
+        if result[0] == "OK":
+            self.mailbox = mailbox
+            self.readonly = readonly
+        return result
+
+    def _drop(self) -> None:
+        if self.conn is None:
+            return
+        try:
+            self.conn.logout()
+        except Exception:
+            pass
+        self.conn = None
+
+
+class GmailSessionPool:
+    """
+    A bounded pool of GmailSession objects.
+
+    Sessions are created lazily up to `max_size`; callers block when all of
+    them are checked out. imaplib connections are not thread-safe, so a
+    session is only ever used by one caller at a time.
+    """
+
+    def __init__(self, max_size: int = IMAP_POOL_SIZE):
+        self.max_size = max(1, max_size)
+        self._idle: "queue.LifoQueue[GmailSession]" = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def session(self, mailbox: Optional[str] = "inbox", readonly: bool = False):
+        """
+        Checks out a live session, optionally with `mailbox` selected.
+
+        Args:
+            mailbox: Mailbox to select before handing out the session, or None
+            readonly: Whether to select the mailbox read-only
+
+        Yields:
+            GmailSession: A connected session
+        """
+        session = self._acquire()
+        try:
+            if mailbox is not None:
+                session.select(mailbox, readonly)
+            else:
+                session.ensure_alive()
+            yield session
+        except RECONNECT_ERRORS:
+            # Don't hand a broken connection to the next caller
+            session.logout()
+            raise
+        finally:
+            self._idle.put(session)
+
+    def close_all(self) -> None:
+        """
+        Logs out every idle session in the pool.
+        """
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            session.logout()
+            with self._lock:
+                self._created -= 1
+
+    def _acquire(self) -> GmailSession:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.max_size:
+                self._created += 1
+                return GmailSession()
+
+        return self._idle.get()
+
+
+_pool: Optional[GmailSessionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_session_pool() -> GmailSessionPool:
+    """
+    Returns the process-wide session pool, creating it on first use.
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = GmailSessionPool()
+            atexit.register(_pool.close_all)
+        return _pool
+
+
+def gmail_session(mailbox: Optional[str] = "inbox", readonly: bool = False):
+    """
+    Shortcut for `get_session_pool().session(...)`.
+
+    Usage:
+        with gmail_session() as session:
+            session.run("search", None, "UNSEEN")
+    """
+    return get_session_pool().session(mailbox, readonly)
@@ -0,0 +1,232 @@
+"""
+Keyword-based fallback categorization in a single pass over the email.
+
+The keyword lists live in one rule table that is compiled once into a
+word -> signals hash table (plural forms included) plus boundary regexes
+for the few multi-word phrases. The text is split into words once, and a
+single set intersection yields every priority, category, needs-response
+and task signal. The lists used to be scanned one `any(word in text ...)`
+at a time, and "off", "hi" or "due" fired inside unrelated words.
+"""
+
+import re
+from typing import Dict, FrozenSet, Iterable, List, Optional, Pattern, Set, Tuple
+
+# Signal -> keywords. Keywords of PLURAL_MIN_LENGTH or more characters also
+# match with a plural "s"/"es" suffix.
+KEYWORD_RULES: Dict[str, Tuple[str, ...]] = {
+    "security": ("security", "breach", "hack", "password", "reset", "suspicious", "login",
+                 "unauthorized", "access", "alert", "warning", "fraud", "phishing", "verify",
+                 "verification"),
+    "financial": ("charge", "transaction", "payment", "unusual", "bank", "credit card", "debit",
+                  "account", "balance", "statement"),
+    "urgent": ("urgent", "important", "asap", "deadline", "emergency", "critical", "immediate",
+               "priority"),
+    "github": ("github", "repository", "commit", "pull request"),
+    "youtube": ("youtube", "video", "channel"),
+    "receipts": ("receipt", "invoice", "payment", "order", "purchase", "transaction", "bill"),
+    "newsletter": ("newsletter", "subscribe", "update", "weekly", "monthly", "digest"),
+    "promotional": ("offer", "discount", "sale", "promotion", "deal", "limited time", "off",
+                    "save", "coupon"),
+    "work": ("job", "interview", "application", "career", "position", "work", "project",
+             "meeting"),
+    "personal": ("hi", "hello", "hey", "dear", "friend", "family", "personal"),
+    "needs_response": ("please respond", "let me know", "reply", "get back to me", "response",
+                       "confirm", "rsvp", "answer", "action", "required", "request", "approve",
+                       "approval"),
+    "tasks": ("task", "todo", "to-do", "action", "action item", "assignment", "complete",
+              "finish", "due"),
+}
+
+# Category signals in order of precedence
+CATEGORY_SIGNALS: List[Tuple[str, str]] = [
+    ("github", "GitHub"),
+    ("youtube", "YouTube"),
+    ("receipts", "Receipts_Invoices"),
+    ("newsletter", "Newsletter"),
+    ("promotional", "Promotional"),
+    ("work", "Work"),
+    ("personal", "Personal"),
+]
+
+PLURAL_MIN_LENGTH = 4
+
+# Maps every byte except a-z and 0-9 to a space, so "invoice/receipt," splits into words
+WORD_BYTES_TABLE = bytes(
+    byte if chr(byte).isascii() and chr(byte).isalnum() and not chr(byte).isupper() else ord(" ")
+    for byte in range(256)
+)
+
+# Categories that an urgent, security or financial email keeps regardless of other keywords
+HIGH_PRIORITY_CATEGORIES = {"GitHub", "YouTube"}
+
+
+class KeywordClassifier:
+    """
+    The rule table compiled into a word lookup table and phrase regexes.
+    """
+
+    def __init__(self, rules: Dict[str, Tuple[str, ...]] = KEYWORD_RULES):
+        self.signals_by_word: Dict[bytes, FrozenSet[str]] = {}
+        # (leading words that must all be present, regex, signals) per phrase
+        self.phrases: List[Tuple[Tuple[bytes, ...], Pattern, FrozenSet[str]]] = []
+
+        phrase_signals: Dict[Tuple[bytes, ...], Set[str]] = {}
+        for signal, keywords in rules.items():
+            for keyword in keywords:
+                words = tuple(keyword.lower().encode('ascii').translate(WORD_BYTES_TABLE).split())
+                if len(words) == 1:
+                    for form in _word_forms(words[0]):
+                        self.signals_by_word[form] = self.signals_by_word.get(form, frozenset()) | {signal}
+                else:
+                    phrase_signals.setdefault(words, set()).add(signal)
+
+        for words, signals in phrase_signals.items():
+            text_words = [re.escape(word.decode('ascii')) for word in words]
+            if len(words[-1]) >= PLURAL_MIN_LENGTH:
+                text_words[-1] += r"(?:e?s)?"
+            pattern = re.compile(r"(?<![a-z0-9])" + r"[^a-z0-9]+".join(text_words) + r"(?![a-z0-9])")
+            self.phrases.append((words[:-1], pattern, frozenset(signals)))
+
+        self.keywords = frozenset(self.signals_by_word)
+
+    def words(self, text: str) -> Set[bytes]:
+        """
+        Returns the distinct lowercase ASCII words of the text.
+
+        Every keyword is ASCII, so the text is encoded once and every byte
+        that is not a letter or digit becomes a space in a single
+        `bytes.translate`; splitting and de-duplicating then run at C speed.
+        """
+        data = text.lower().encode('ascii', errors='replace').translate(WORD_BYTES_TABLE)
+        return set(data.split())
+
+    def signals(self, text: str) -> FrozenSet[str]:
+        """
+        Returns every signal whose keywords appear in the text as whole words.
+        """
+        words = self.words(text)
+        found = set()
+        for word in words & self.keywords:
+            found |= self.signals_by_word[word]
+
+        lower_text = None
+        for leading_words, pattern, signals in self.phrases:
+            if signals <= found or not all(word in words for word in leading_words):
+                continue
+            if lower_text is None:
+                lower_text = text.lower()
+            if pattern.search(lower_text):
+                found |= signals
+
+        return frozenset(found)
+
+    def classify(self, email_content: str) -> Dict[str, str]:
+        """
+        Categorizes an email from its keywords.
+
+        Args:
+            email_content: The email text (may include From:/Subject: lines)
+
+        Returns:
+            Dict[str, str]: Priority, Category, Needs Response, Contains Tasks and Summary
+        """
+        signals = self.signals(email_content)
+
+        priority = "Low"
+        category = "Other"
+        needs_response = "No"
+
+        if "security" in signals:
+            priority = "High"
+            needs_response = "Yes"
+            category = "Personal"  # Security emails are usually personal
+        elif "financial" in signals:
+            priority = "High"
+            category = "Receipts_Invoices"
+        elif "urgent" in signals:
+            priority = "High"
+
+        for signal, signal_category in CATEGORY_SIGNALS:
+            if signal not in signals:
+                continue
+            # Don't override security and financial emails with generic categories
+            if priority == "High" and signal_category not in HIGH_PRIORITY_CATEGORIES:
+                break
+            category = signal_category
+            break
+
+        if "needs_response" in signals:
+            needs_response = "Yes"
+        contains_tasks = "Yes" if "tasks" in signals else "No"
+
+        return {
+            "Priority": priority,
+            "Category": category,
+            "Needs Response": needs_response,
+            "Contains Tasks": contains_tasks,
+            "Summary": summarize(email_content, category),
+        }
+
+
+def _word_forms(word: bytes) -> Iterable[bytes]:
+    yield word
+    # Short keywords don't take a plural suffix ("hi" must not match "his")
+    if len(word) >= PLURAL_MIN_LENGTH:
+        yield word + b"s"
+        yield word + b"es"
+
+
+def _header(email_content: str, name: str) -> str:
+    for line in email_content.split("\n"):
+        if line.startswith(name):
+            return line[len(name):].strip().lower()
+    return ""
+
+
+def summarize(email_content: str, category: str) -> str:
+    """
+    Returns a one-line summary of an email in the given category, from its headers.
+    """
+    subject_line = _header(email_content, "Subject:")
+    sender = _header(email_content, "From:")
+
+    if category == "Newsletter":
+        return f"Newsletter from {sender if sender else 'unknown sender'}"
+    if category == "Promotional":
+        return f"Promotional email about {subject_line if subject_line else 'offers or discounts'}"
+    if category == "GitHub":
+        return "GitHub notification or update"
+    if category == "YouTube":
+        return "YouTube notification or update"
+    if category == "Receipts_Invoices":
+        return f"Receipt or invoice from {sender if sender else 'a service'}"
+    if category == "Work":
+        return f"Work-related email about {subject_line if subject_line else 'a project or task'}"
+    if category == "Personal":
+        return f"Personal email from {sender if sender else 'someone'}"
+    return f"Email about {subject_line if subject_line else 'unknown topic'}"
+
+
+_classifier: Optional[KeywordClassifier] = None
+
+
+def get_keyword_classifier() -> KeywordClassifier:
+    """
+    Returns the shared classifier, compiling the rule table on first use.
+    """
+    global _classifier
+    if _classifier is None:
+        _classifier = KeywordClassifier()
+    return _classifier
+
+
+def keyword_categorization(email_content: str) -> str:
+    """
+    Categorizes an email from its keywords, formatted like an LLM categorization.
+
+    Returns:
+        str: "Priority: ...\\nCategory: ...\\nNeeds Response: ...\\nContains Tasks: ...\\nSummary: ..."
+    """
+    result = get_keyword_classifier().classify(email_content)
+    return "\n".join(f"{name}: {value}" for name, value in result.items())
@@ -0,0 +1,266 @@
+"""
+In-memory registry of the Gmail labels that exist on the server.
+
+The mailbox LIST is loaded once (or restored from an on-disk snapshot) and
+parsed into exact label names, so applying a label no longer costs a LIST
+round trip and "Priority.High" can't match inside "Priority.Highest".
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from typing import Iterable, List, Optional, Set
+
+from config import (
+    GMAIL_USERNAME,
+    LABEL_REGISTRY_SNAPSHOT,
+    PRIORITY_LEVELS,
+    EMAIL_CATEGORIES,
+)
+from .gmail_session import gmail_session, GmailSession
+
+# (\HasNoChildren) "/" "Priority.High"  or  (\HasNoChildren) NIL INBOX
+LIST_LINE_RE = re.compile(r'^\((?P<flags>[^)]*)\)\s+(?P<delimiter>"(?:[^"\\]|\\.)*"|NIL)\s+(?P<name>.+)$')
+
+
+def to_imap_label(label_name: str) -> str:
+    """
+    Formats a label name for IMAP (replace slashes with dots).
+    """
+    return label_name.replace('/', '.')
+
+
+def standard_labels() -> List[str]:
+    """
+    Returns every label the categorization pipeline can apply.
+    """
+    labels = [f"Priority/{priority}" for priority in PRIORITY_LEVELS]
+    labels += [f"Category/{category}" for category in EMAIL_CATEGORIES]
+    labels.append("Needs_Response")
+    return labels
+
+
+def parse_list_response(lines: Iterable) -> Set[str]:
+    """
+    Parses the untagged responses of an IMAP LIST command into mailbox names.
+
+    Args:
+        lines: The data returned by imaplib's `list()`
+
+    Returns:
+        Set[str]: The exact (unquoted) mailbox names
+    """
+    names = set()
+
+    for line in lines:
+        if not line:
+            continue
+
+        # Names sent as literals arrive as (prefix, name) tuples
+        if isinstance(line, tuple):
+            names.add(_to_str(line[1]))
+            continue
+
+        match = LIST_LINE_RE.match(_to_str(line))
+        if not match:
+            continue
+        names.add(_unquote(match.group("name").strip()))
+
+    return names
+
+
+class LabelRegistry:
+    """
+    Tracks which labels exist and creates missing ones on demand.
+
+    The registry is populated from a single LIST (or a snapshot file) and
+    only goes back to the server when a label it doesn't know about is
+    requested.
+    """
+
+    def __init__(self, snapshot_path: Optional[str] = LABEL_REGISTRY_SNAPSHOT,
+                 account: Optional[str] = GMAIL_USERNAME):
+        self.snapshot_path = snapshot_path
+        self.account = account
+        self._labels: Set[str] = set()
+        self._folded: Set[str] = set()
+        self._loaded = False
+        self._from_snapshot = False
+        self._lock = threading.RLock()
+
+    def exists(self, label_name: str) -> bool:
+        """
+        Returns True if the label is known to exist (case-insensitive, like Gmail).
+        """
+        return to_imap_label(label_name).casefold() in self._folded
+
+    def load(self, mail: GmailSession, refresh: bool = False) -> None:
+        """
+        Populates the registry from the snapshot or, failing that, from LIST.
+
+        Args:
+            mail: A checked-out session to run LIST on
+            refresh: Ignore the in-memory state and snapshot and re-run LIST
+        """
+        with self._lock:
+            if self._loaded and not refresh:
+                return
+            if not refresh and self._load_snapshot():
+                return
+
+            _, lines = mail.run("list")
+            self._set_labels(parse_list_response(lines))
+            self._from_snapshot = False
+            self._save_snapshot()
+
+    def ensure(self, mail: GmailSession, label_names: Iterable[str]) -> bool:
+        """
+        Makes sure all labels exist, creating only the missing ones.
+
+        Args:
+            mail: A checked-out session
+            label_names: Label names such as "Priority/High"
+
+        Returns:
+            bool: True if every label exists afterwards, False otherwise
+        """
+        with self._lock:
+            self.load(mail)
+
+            missing = [name for name in dict.fromkeys(label_names) if not self.exists(name)]
+            if missing and self._from_snapshot:
+                # The snapshot may be stale; check the server before creating anything
+                self.load(mail, refresh=True)
+                missing = [name for name in missing if not self.exists(name)]
+
+            success = True
+            for label_name in missing:
+                if self._create(mail, label_name):
+                    self._add(to_imap_label(label_name))
+                else:
+                    success = False
+
+            if missing:
+                self._save_snapshot()
+            return success
+
+    def invalidate(self) -> None:
+        """
+        Forgets the loaded labels so the next lookup re-runs LIST.
+        """
+        with self._lock:
+            self._labels.clear()
+            self._folded.clear()
+            self._loaded = False
+            self._from_snapshot = False
+            if self.snapshot_path and os.path.exists(self.snapshot_path):
+                try:
+                    os.remove(self.snapshot_path)
+                except OSError:
+                    pass
+
+    def _create(self, mail: GmailSession, label_name: str) -> bool:
+        imap_label_name = to_imap_label(label_name)
+        try:
+            result = mail.run("create", f'"{imap_label_name}"')
+            print(f"Created label: {label_name}, Result: {result}")
+        except Exception as create_error:
+            # Try alternative format if the first attempt fails
+            try:
+                result = mail.run("create", imap_label_name)
+                print(f"Created label (alt method): {label_name}, Result: {result}")
+            except Exception as alt_error:
+                print(f"Both label creation methods failed: {str(create_error)} | {str(alt_error)}")
+                return False
+
+        # CREATE answers NO with [ALREADYEXISTS] when the label is already there
+        return result[0] == "OK" or "ALREADYEXISTS" in str(result).upper()
+
+    def _set_labels(self, labels: Set[str]) -> None:
+        self._labels = set(labels)
+        self._folded = {label.casefold() for label in labels}
+        self._loaded = True
+
+    def _add(self, imap_label_name: str) -> None:
+        self._labels.add(imap_label_name)
+        self._folded.add(imap_label_name.casefold())
+
+    def _load_snapshot(self) -> bool:
+        if not self.snapshot_path or not os.path.exists(self.snapshot_path):
+            return False
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as file:
+                snapshot = json.load(file)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable label snapshot: {str(e)}")
+            return False
+
+        if snapshot.get("account") != self.account:
+            return False
+
+        self._set_labels(set(snapshot.get("labels", [])))
+        self._from_snapshot = True
+        return True
+
+    def _save_snapshot(self) -> None:
+        if not self.snapshot_path:
+            return
+        try:
+            directory = os.path.dirname(self.snapshot_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump({
+                    "account": self.account,
+                    "saved_at": time.time(),
+                    "labels": sorted(self._labels),
+                }, file)
+            os.replace(tmp_path, self.snapshot_path)
+        except OSError as e:
+            print(f"Error saving label snapshot: {str(e)}")
+
+
+def _to_str(value) -> str:
+    return value.decode('utf-8', errors='replace') if isinstance(value, bytes) else str(value)
+
+
+def _unquote(name: str) -> str:
+    if len(name) >= 2 and name[0] == '"' and name[-1] == '"':
+        return re.sub(r'\\(.)', r'\1', name[1:-1])
+    return name
+
+
+_registry: Optional[LabelRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_label_registry() -> LabelRegistry:
+    """
+    Returns the process-wide label registry, creating it on first use.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = LabelRegistry()
+        return _registry
+
+
+def ensure_standard_labels() -> bool:
+    """
+    Creates every Priority/*, Category/* and Needs_Response label in one go.
+
+    Meant to be called once at startup so that labeling never has to create
+    labels on the hot path.
+
+    Returns:
+        bool: True if all labels exist, False otherwise
+    """
+    try:
+        with gmail_session(None) as mail:
+            return get_label_registry().ensure(mail, standard_labels())
+    except Exception as e:
+        print(f"Error creating standard labels: {str(e)}")
+        return False
@@ -0,0 +1,96 @@
+"""
+Response times of the categorization providers.
+
+Keeps the most recent latencies of successful requests per provider and
+answers percentile queries, e.g. the p95 that hedged requests use as their
+deadline. The samples are saved under STATE_DIR so that a cron run starts
+with the latencies seen by the previous ones.
+"""
+
+import json
+import math
+import os
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from config import LATENCY_STATE_PATH, LATENCY_WINDOW
+
+# Percentiles are only reported once a provider has this many samples
+MIN_SAMPLES = 20
+
+
+class LatencyTracker:
+    """
+    A sliding window of request latencies (seconds) per provider.
+    """
+
+    def __init__(self, path: Optional[str] = LATENCY_STATE_PATH, window: int = LATENCY_WINDOW):
+        self.path = path
+        self.window = max(1, window)
+        self.samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def record(self, provider: str, seconds: float) -> None:
+        """
+        Adds the latency of one successful request.
+        """
+        with self._lock:
+            self.samples.setdefault(provider, deque(maxlen=self.window)).append(seconds)
+            self._save()
+
+    def percentile(self, provider: str, percent: float) -> Optional[float]:
+        """
+        Returns the given percentile of the provider's latencies.
+
+        Returns:
+            Optional[float]: Seconds, or None with fewer than MIN_SAMPLES samples
+        """
+        with self._lock:
+            samples = sorted(self.samples.get(provider, ()))
+        if len(samples) < MIN_SAMPLES:
+            return None
+        # Nearest-rank percentile
+        rank = max(1, math.ceil(percent / 100.0 * len(samples)))
+        return samples[min(rank, len(samples)) - 1]
+
+    def _load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                state = json.load(file)
+            for provider, samples in state.items():
+                self.samples[provider] = deque((float(sample) for sample in samples), maxlen=self.window)
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            print(f"Ignoring unreadable latency state: {str(e)}")
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump({provider: list(samples) for provider, samples in self.samples.items()}, file)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error saving latency state: {str(e)}")
+
+
+_tracker: Optional[LatencyTracker] = None
+_tracker_lock = threading.Lock()
+
+
+def get_latency_tracker() -> LatencyTracker:
+    """
+    Returns the process-wide latency tracker, loading the saved samples on first use.
+    """
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = LatencyTracker()
+        return _tracker
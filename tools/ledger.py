@@ -0,0 +1,301 @@
+"""
+Persistent processing ledger.
+
+Records, per account and Gmail message ID (X-GM-MSGID), which stages of
+the pipeline are done: categorized (with the result), labeled and
+notified. A rerun after a crash or a failed label batch skips the
+finished stages, so it doesn't call the LLM again or send a second
+Telegram alert. The ledger is a SQLite database in WAL mode.
+
+Recent entries can be listed with:
+
+    python -m tools.ledger [--limit N] [--pending]
+"""
+
+import argparse
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from config import GMAIL_USERNAME, LEDGER_PATH, LEDGER_MAX_ATTEMPTS
+from .categorization_result import CategorizationResult
+
+# Stages in pipeline order, each with a completion timestamp column
+STAGES = ("categorized", "labeled", "notified")
+
+
+def message_key(email_data: Dict[str, Any]) -> str:
+    """
+    Returns the ledger key of an email: its X-GM-MSGID, or UIDVALIDITY and UID without one.
+    """
+    if email_data.get("msgid"):
+        return str(email_data["msgid"])
+    return f"uid:{email_data.get('uidvalidity')}:{email_data['id']}"
+
+
+class ProcessingLedger:
+    """
+    Stage status per message, in a SQLite table shared by all threads.
+
+    Entries are dicts with the columns of the `messages` table, "result"
+    parsed into a CategorizationResult (or None before categorization).
+    """
+
+    def __init__(self, path: Optional[str] = LEDGER_PATH, account: Optional[str] = GMAIL_USERNAME):
+        self.path = path
+        self.account = account or ""
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        # Keys counted by record_attempt() since start_run()
+        self._attempted: Set[str] = set()
+        self._open()
+
+    @property
+    def enabled(self) -> bool:
+        """
+        False if the ledger has no database (LEDGER_PATH empty or unusable).
+        """
+        return self._db is not None
+
+    def start_run(self) -> None:
+        """
+        Starts a new run, in which unfinished emails are tried (and counted) again.
+
+        A one-shot run is one run. The daemon starts one per wake-up, so an
+        email left unfinished by a catch-up pass isn't retried by the next
+        pass straight away.
+        """
+        with self._lock:
+            self._attempted.clear()
+
+    def attempted(self, email_data: Dict[str, Any]) -> bool:
+        """
+        Returns True if the email was left unfinished earlier in this run.
+        """
+        with self._lock:
+            return message_key(email_data) in self._attempted
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the ledger entry of a message, or None if it was never seen.
+        """
+        rows = self._query("SELECT * FROM messages WHERE account = ? AND msgid = ?", (self.account, key))
+        return rows[0] if rows else None
+
+    def record_categorization(self, email_data: Dict[str, Any], result: CategorizationResult) -> None:
+        """
+        Marks an email as categorized and stores the result.
+        """
+        now = time.time()
+        self._execute(
+            "INSERT INTO messages (account, msgid, uid, subject, sender, result, categorized_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (account, msgid) DO UPDATE SET uid = excluded.uid, result = excluded.result, "
+            "categorized_at = excluded.categorized_at, updated_at = excluded.updated_at",
+            [(self.account, message_key(email_data), str(email_data['id']), email_data.get('subject', ''),
+              email_data.get('from', ''), result.to_json(), now, now)],
+        )
+
+    def record_attempt(self, email_data: Dict[str, Any]) -> int:
+        """
+        Counts one more run that ended with the email unfinished.
+
+        Returns:
+            int: The number of such runs so far
+        """
+        key = message_key(email_data)
+        now = time.time()
+        self._execute(
+            "INSERT INTO messages (account, msgid, uid, subject, sender, attempts, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, 1, ?) "
+            "ON CONFLICT (account, msgid) DO UPDATE SET attempts = attempts + 1, updated_at = excluded.updated_at",
+            [(self.account, key, str(email_data['id']), email_data.get('subject', ''),
+              email_data.get('from', ''), now)],
+        )
+        entry = self.get(key)
+        return entry["attempts"] if entry is not None else 0
+
+    def mark_labeled(self, keys: Iterable[str]) -> None:
+        """
+        Marks emails as labeled (after their labels were stored on the server).
+        """
+        now = time.time()
+        self._execute(
+            "UPDATE messages SET labeled_at = ?, updated_at = ? WHERE account = ? AND msgid = ?",
+            [(now, now, self.account, key) for key in keys],
+        )
+
+    def mark_notified(self, key: str, queued: bool) -> None:
+        """
+        Marks the notification stage of an email as done.
+
+        Args:
+            key: The email's message_key()
+            queued: True if an alert was handed to the notification outbox, False if the rules didn't call for one
+        """
+        now = time.time()
+        self._execute(
+            "UPDATE messages SET notified_at = ?, notification = ?, updated_at = ? WHERE account = ? AND msgid = ?",
+            [(now, "queued" if queued else "not_needed", now, self.account, key)],
+        )
+
+    def recent(self, limit: int = 20, pending_only: bool = False) -> List[Dict[str, Any]]:
+        """
+        Returns the most recently updated entries, newest first.
+
+        Args:
+            limit: Maximum number of entries
+            pending_only: Only return entries with an unfinished stage
+        """
+        condition = " AND (categorized_at IS NULL OR labeled_at IS NULL OR notified_at IS NULL)" if pending_only else ""
+        return self._query(
+            f"SELECT * FROM messages WHERE account = ?{condition} ORDER BY updated_at DESC LIMIT ?",
+            (self.account, limit),
+        )
+
+    def counts(self) -> Dict[str, int]:
+        """
+        Returns how many of the account's messages have finished each stage.
+        """
+        rows = self._query(
+            "SELECT COUNT(*) AS total, COUNT(categorized_at) AS categorized, "
+            "COUNT(labeled_at) AS labeled, COUNT(notified_at) AS notified "
+            "FROM messages WHERE account = ?",
+            (self.account,),
+        )
+        return rows[0] if rows else {"total": 0, **{stage: 0 for stage in STAGES}}
+
+    def processed_prefix(self, emails: Iterable[Dict[str, Any]],
+                         max_attempts: int = LEDGER_MAX_ATTEMPTS) -> List[Dict[str, Any]]:
+        """
+        Returns the emails the UID high-water mark may move past, in UID order.
+
+        That is every email below the oldest one with an unfinished stage
+        (a failed categorization, a missing label or a notification that
+        couldn't be queued), so the next incremental run fetches it again.
+        Each such run is counted once (see start_run()), and an email still
+        unfinished after `max_attempts` runs is given up on so it can't hold
+        back new mail forever. Without a ledger database all emails are
+        returned.
+
+        Args:
+            emails: Email dictionaries as yielded by iter_emails()
+            max_attempts: Runs before an unfinished email is skipped
+        """
+        emails = sorted(emails, key=lambda email_data: int(email_data['id']))
+        if not self.enabled:
+            return emails
+
+        processed = []
+        for email_data in emails:
+            key = message_key(email_data)
+            entry = self.get(key)
+            if entry is None or any(entry[f"{stage}_at"] is None for stage in STAGES):
+                if self.attempted(email_data):
+                    break
+                with self._lock:
+                    self._attempted.add(key)
+                attempts = self.record_attempt(email_data)
+                if attempts < max_attempts:
+                    print(f"Email {email_data['id']} is unfinished and will be retried on the next run "
+                          f"(attempt {attempts} of {max_attempts})")
+                    break
+                print(f"Giving up on email {email_data['id']} after {attempts} unfinished runs")
+            processed.append(email_data)
+        return processed
+
+    def _query(self, sql: str, parameters: tuple) -> List[Dict[str, Any]]:
+        if self._db is None:
+            return []
+        with self._lock:
+            try:
+                cursor = self._db.execute(sql, parameters)
+                columns = [column[0] for column in cursor.description]
+                rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+            except sqlite3.Error as e:
+                print(f"Error reading processing ledger: {str(e)}")
+                return []
+        for row in rows:
+            if "result" in row:
+                row["result"] = CategorizationResult.parse(row["result"]) if row["result"] else None
+        return rows
+
+    def _execute(self, sql: str, rows: List[tuple]) -> None:
+        if self._db is None or not rows:
+            return
+        with self._lock:
+            try:
+                self._db.executemany(sql, rows)
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Error writing processing ledger: {str(e)}")
+
+    def _open(self) -> None:
+        if not self.path:
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Guarded by self._lock, so one connection can be shared by all threads
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            # WAL lets a query (e.g. the CLI) read while a run is writing
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                "account TEXT NOT NULL, msgid TEXT NOT NULL, uid TEXT, subject TEXT, sender TEXT, "
+                "result TEXT, categorized_at REAL, labeled_at REAL, notified_at REAL, notification TEXT, "
+                "attempts INTEGER NOT NULL DEFAULT 0, updated_at REAL NOT NULL, PRIMARY KEY (account, msgid))"
+            )
+            # Ledgers created before attempts were counted
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(messages)")}
+            if "attempts" not in columns:
+                self._db.execute("ALTER TABLE messages ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+            self._db.execute("CREATE INDEX IF NOT EXISTS messages_updated_at ON messages (account, updated_at)")
+            self._db.commit()
+        except (OSError, sqlite3.Error) as e:
+            print(f"Processing ledger disabled: {str(e)}")
+            self._db = None
+
+
+_ledger: Optional[ProcessingLedger] = None
+_ledger_lock = threading.Lock()
+
+
+def get_ledger() -> ProcessingLedger:
+    """
+    Returns the process-wide ledger, opening it on first use.
+    """
+    global _ledger
+    with _ledger_lock:
+        if _ledger is None:
+            _ledger = ProcessingLedger()
+        return _ledger
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Show recent entries of the processing ledger")
+    parser.add_argument("--limit", type=int, default=20, help="Number of entries to show")
+    parser.add_argument("--pending", action="store_true", help="Only show emails with unfinished stages")
+    args = parser.parse_args(argv)
+
+    ledger = get_ledger()
+    counts = ledger.counts()
+    print(f"{counts['total']} emails: {counts['categorized']} categorized, "
+          f"{counts['labeled']} labeled, {counts['notified']} notified")
+
+    for entry in ledger.recent(args.limit, pending_only=args.pending):
+        result = entry["result"]
+        stages = ", ".join(stage for stage in STAGES if entry[f"{stage}_at"]) or "none"
+        print(f"\nUID {entry['uid']} ({entry['msgid']}): {entry['subject']}")
+        print(f"  From: {entry['sender']}")
+        if result is not None:
+            print(f"  {result.priority} / {result.category} / needs response: {result.needs_response}")
+        print(f"  Done: {stages}" + (f" (notification {entry['notification']})" if entry['notification'] else ""))
+
+
+if __name__ == "__main__":
+    main()
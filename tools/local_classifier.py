@@ -0,0 +1,374 @@
+"""
+A small local text classifier that answers routine mail without an LLM call.
+
+Emails are turned into hashed word/bigram features (plus subject words and
+the sender's domain), and a linear softmax model per field (priority,
+category, needs-response) is trained in NumPy from past LLM
+categorizations. At runtime an email is only answered locally when every
+field is predicted with at least LOCAL_CLASSIFIER_THRESHOLD confidence;
+everything else still goes to the LLM.
+
+Training data is collected by setting TRAINING_DATA_PATH, which appends
+every LLM categorization to a JSONL file (see training_data.py). Then:
+
+    python -m tools.local_classifier train --data .inbox_state/training_data.jsonl
+    python -m tools.local_classifier evaluate --data held_out.jsonl
+    python -m tools.local_classifier export --out .inbox_state/local_classifier.npz
+"""
+
+import argparse
+import json
+import os
+import re
+import threading
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config import (
+    LOCAL_CLASSIFIER_MODEL,
+    LOCAL_CLASSIFIER_THRESHOLD,
+    TRAINING_DATA_PATH,
+)
+from .keyword_classifier import get_keyword_classifier, summarize
+from .categorization_result import CategorizationResult
+from .training_data import LABELS, iter_training_records
+
+try:
+    import numpy as np
+except ImportError:  # The classifier is optional, the pipeline runs without it
+    np = None
+
+# Number of hashed feature buckets (the model has this many rows)
+DEFAULT_DIMENSIONS = 2 ** 16
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:['_][a-z0-9]+)*")
+DOMAIN_RE = re.compile(r"@([\w.-]+)")
+
+
+def extract_features(email_content: str, dimensions: int) -> Tuple[Any, Any]:
+    """
+    Hashes an email into sparse features.
+
+    Args:
+        email_content: Email text with From:/Subject: lines as produced by utils.format_email_content
+        dimensions: Number of hash buckets
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Bucket indices and L2-normalized signed values
+    """
+    subject = ""
+    sender = ""
+    for line in email_content.split("\n", 4)[:4]:
+        if line.startswith("Subject:"):
+            subject = line[8:].lower()
+        elif line.startswith("From:"):
+            sender = line[5:].lower()
+
+    tokens = TOKEN_RE.findall(email_content.lower())
+    features = tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]
+    features += [f"subject:{token}" for token in TOKEN_RE.findall(subject)]
+    domain = DOMAIN_RE.search(sender)
+    if domain:
+        features.append(f"domain:{domain.group(1)}")
+
+    counts: Dict[int, float] = {}
+    for feature in features:
+        hashed = zlib.crc32(feature.encode("utf-8"))
+        # The top bit picks a sign so that colliding features tend to cancel out
+        sign = 1.0 if hashed & 0x80000000 else -1.0
+        index = hashed % dimensions
+        counts[index] = counts.get(index, 0.0) + sign
+
+    indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    values = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+    norm = float(np.sqrt(np.dot(values, values)))
+    if norm > 0:
+        values /= norm
+    return indices, values
+
+
+class LocalClassifier:
+    """
+    One linear softmax model per head over hashed features.
+
+    The weights of all heads share a (dimensions x total classes) matrix;
+    `offsets` gives the column slice of each head.
+    """
+
+    def __init__(self, dimensions: int = DEFAULT_DIMENSIONS, weights=None, bias=None):
+        self.dimensions = dimensions
+        self.offsets: Dict[str, Tuple[int, int]] = {}
+        start = 0
+        for head, labels in LABELS.items():
+            self.offsets[head] = (start, start + len(labels))
+            start += len(labels)
+        self.weights = weights if weights is not None else np.zeros((dimensions, start), dtype=np.float32)
+        self.bias = bias if bias is not None else np.zeros(start, dtype=np.float32)
+
+    def predict(self, email_content: str) -> Tuple[Dict[str, str], float]:
+        """
+        Classifies one email.
+
+        Returns:
+            Tuple[Dict[str, str], float]: The label per head and the lowest head confidence
+        """
+        indices, values = extract_features(email_content, self.dimensions)
+        logits = values @ self.weights[indices].astype(np.float32) + self.bias
+        labels = {}
+        confidence = 1.0
+        for head, (start, end) in self.offsets.items():
+            probabilities = _softmax(logits[start:end])
+            best = int(np.argmax(probabilities))
+            labels[head] = LABELS[head][best]
+            confidence = min(confidence, float(probabilities[best]))
+        return labels, confidence
+
+    def fit(self, examples: List[Tuple[str, Dict[str, str]]], epochs: int = 10,
+            learning_rate: float = 2.0, l2: float = 1e-6, batch_size: int = 32, seed: int = 0) -> None:
+        """
+        Trains the model with mini-batch SGD on (email_content, labels) pairs.
+        """
+        rng = np.random.default_rng(seed)
+        features = [extract_features(text, self.dimensions) for text, _ in examples]
+        targets = np.zeros((len(examples), self.bias.shape[0]), dtype=np.float32)
+        for row, (_, labels) in enumerate(examples):
+            for head, (start, _) in self.offsets.items():
+                targets[row, start + LABELS[head].index(labels[head])] = 1.0
+
+        for epoch in range(epochs):
+            order = rng.permutation(len(examples))
+            loss = 0.0
+            for batch_start in range(0, len(order), batch_size):
+                batch = order[batch_start:batch_start + batch_size]
+                indices = np.concatenate([features[row][0] for row in batch])
+                values = np.concatenate([features[row][1] for row in batch])
+                lengths = np.array([len(features[row][0]) for row in batch])
+                doc_of_feature = np.repeat(np.arange(len(batch)), lengths)
+
+                # Forward: sum of weight rows per document
+                logits = np.zeros((len(batch), self.bias.shape[0]), dtype=np.float32)
+                np.add.at(logits, doc_of_feature, self.weights[indices] * values[:, None])
+                logits += self.bias
+
+                gradient = np.empty_like(logits)
+                for start, end in self.offsets.values():
+                    probabilities = _softmax(logits[:, start:end])
+                    gradient[:, start:end] = probabilities - targets[batch, start:end]
+                    loss -= float(np.sum(targets[batch, start:end] * np.log(probabilities + 1e-9)))
+
+                step = learning_rate / len(batch)
+                np.add.at(self.weights, indices, -step * (gradient[doc_of_feature] * values[:, None]))
+                self.bias -= step * gradient.sum(axis=0)
+                if l2:
+                    self.weights[indices] *= (1.0 - learning_rate * l2)
+
+            print(f"Epoch {epoch + 1}/{epochs}: loss {loss / max(1, len(examples)):.4f}")
+
+    def evaluate(self, examples: List[Tuple[str, Dict[str, str]]], threshold: float) -> Dict[str, float]:
+        """
+        Measures accuracy per head, and coverage/accuracy of the confident answers.
+        """
+        correct = {head: 0 for head in LABELS}
+        confident = 0
+        confident_correct = 0
+        for text, labels in examples:
+            predicted, confidence = self.predict(text)
+            all_correct = True
+            for head in LABELS:
+                if predicted[head] == labels[head]:
+                    correct[head] += 1
+                else:
+                    all_correct = False
+            if confidence >= threshold:
+                confident += 1
+                confident_correct += int(all_correct)
+
+        total = max(1, len(examples))
+        report = {f"{head} accuracy": correct[head] / total for head in LABELS}
+        report["coverage"] = confident / total
+        report["confident accuracy"] = confident_correct / confident if confident else 0.0
+        return report
+
+    def save(self, path: str, compact: bool = False) -> None:
+        """
+        Saves the model; `compact` stores float16 weights in a compressed file.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        weights = self.weights.astype(np.float16) if compact else self.weights
+        save = np.savez_compressed if compact else np.savez
+        with open(path, "wb") as file:
+            save(file, weights=weights, bias=self.bias,
+                 heads=np.array(json.dumps(LABELS)), dimensions=np.array(self.dimensions))
+
+    @classmethod
+    def load(cls, path: str) -> "LocalClassifier":
+        """
+        Loads a model written by `save`.
+
+        Raises:
+            ValueError: If the model was trained with different labels
+        """
+        with np.load(path) as data:
+            if json.loads(str(data["heads"])) != LABELS:
+                raise ValueError("model labels don't match PRIORITY_LEVELS/EMAIL_CATEGORIES, retrain it")
+            return cls(int(data["dimensions"]), data["weights"], data["bias"].astype(np.float32))
+
+
+def _softmax(logits):
+    shifted = logits - np.max(logits, axis=-1, keepdims=True)
+    exponentials = np.exp(shifted)
+    return exponentials / np.sum(exponentials, axis=-1, keepdims=True)
+
+
+_model: Optional[LocalClassifier] = None
+_model_loaded = False
+_model_lock = threading.Lock()
+
+# How many emails were answered locally and how many were left to the LLM
+counters = {"answered": 0, "deferred": 0}
+
+
+def get_local_classifier() -> Optional[LocalClassifier]:
+    """
+    Returns the runtime model, or None if there is no model file or NumPy is missing.
+    """
+    global _model, _model_loaded
+    with _model_lock:
+        if not _model_loaded:
+            _model_loaded = True
+            if np is not None and LOCAL_CLASSIFIER_MODEL and os.path.exists(LOCAL_CLASSIFIER_MODEL):
+                try:
+                    _model = LocalClassifier.load(LOCAL_CLASSIFIER_MODEL)
+                    print(f"Loaded local classifier from {LOCAL_CLASSIFIER_MODEL}")
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"Local classifier disabled: {str(e)}")
+        return _model
+
+
+def local_categorization(email_content: str, threshold: float = LOCAL_CLASSIFIER_THRESHOLD,
+                         count: bool = True) -> Optional[CategorizationResult]:
+    """
+    Categorizes an email locally if the model is confident enough.
+
+    Contains Tasks comes from the keyword classifier, the summary from the headers.
+
+    Args:
+        email_content: The email text
+        threshold: Minimum confidence of every predicted field
+        count: Whether the outcome should be counted in the stats
+
+    Returns:
+        Optional[CategorizationResult]: The result, or None to ask the LLM
+    """
+    model = get_local_classifier()
+    if model is None:
+        return None
+
+    labels, confidence = model.predict(email_content)
+    answered = confidence >= threshold
+    if count:
+        with _model_lock:
+            counters["answered" if answered else "deferred"] += 1
+    if not answered:
+        return None
+
+    signals = get_keyword_classifier().signals(email_content)
+    return CategorizationResult(
+        labels["Priority"],
+        labels["Category"],
+        labels["Needs Response"],
+        "Yes" if "tasks" in signals else "No",
+        f"{summarize(email_content, labels['Category'])} (local classifier, {confidence:.0%} confident)",
+    )
+
+
+def load_examples(paths: Iterable[str]) -> List[Tuple[str, Dict[str, str]]]:
+    """
+    Reads training files and keeps the examples whose labels can be parsed.
+    """
+    examples = []
+    for record in iter_training_records(paths):
+        result = CategorizationResult.parse(record.get("result", ""))
+        if result.is_complete() and record.get("text"):
+            examples.append((record["text"], result.fields()))
+    return examples
+
+
+def _split(examples, holdout: float):
+    """
+    Deterministically splits examples into (train, test) by a hash of the text.
+    """
+    train, test = [], []
+    for example in examples:
+        bucket = zlib.crc32(example[0].encode("utf-8")) % 1000
+        (test if bucket < holdout * 1000 else train).append(example)
+    return train, test
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Train, evaluate and export the local email classifier")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    # --data defaults to TRAINING_DATA_PATH and is required when that isn't set
+    data_options = {
+        "nargs": "+",
+        "default": [TRAINING_DATA_PATH] if TRAINING_DATA_PATH else None,
+        "required": not TRAINING_DATA_PATH,
+    }
+
+    train = commands.add_parser("train", help="Train a model from JSONL categorizations")
+    train.add_argument("--data", help="JSONL training files (default: TRAINING_DATA_PATH)", **data_options)
+    train.add_argument("--model", default=f"{LOCAL_CLASSIFIER_MODEL}.full", help="Where to write the full-precision model")
+    train.add_argument("--dimensions", type=int, default=DEFAULT_DIMENSIONS, help="Number of hashed feature buckets")
+    train.add_argument("--epochs", type=int, default=10)
+    train.add_argument("--learning-rate", type=float, default=2.0)
+    train.add_argument("--holdout", type=float, default=0.2, help="Fraction of examples kept for evaluation")
+
+    evaluate = commands.add_parser("evaluate", help="Report accuracy and confident coverage")
+    evaluate.add_argument("--data", help="JSONL files to evaluate on (default: TRAINING_DATA_PATH)", **data_options)
+    evaluate.add_argument("--model", default=f"{LOCAL_CLASSIFIER_MODEL}.full")
+    evaluate.add_argument("--threshold", type=float, default=LOCAL_CLASSIFIER_THRESHOLD)
+
+    export = commands.add_parser("export", help="Write the compact model used at runtime")
+    export.add_argument("--model", default=f"{LOCAL_CLASSIFIER_MODEL}.full")
+    export.add_argument("--out", default=LOCAL_CLASSIFIER_MODEL)
+
+    args = parser.parse_args(argv)
+    if np is None:
+        parser.error("NumPy is required: pip install numpy")
+    missing = [path for path in getattr(args, "data", None) or [] if not os.path.exists(path)]
+    if missing:
+        parser.error(f"training data not found: {', '.join(missing)}")
+    if args.command != "train" and not os.path.exists(args.model):
+        parser.error(f"model not found: {args.model} (train one first)")
+
+    if args.command == "train":
+        examples = load_examples(args.data)
+        train_examples, test_examples = _split(examples, args.holdout)
+        print(f"Training on {len(train_examples)} examples, holding out {len(test_examples)}")
+        model = LocalClassifier(args.dimensions)
+        model.fit(train_examples, epochs=args.epochs, learning_rate=args.learning_rate)
+        model.save(args.model)
+        print(f"Saved model to {args.model}")
+        if test_examples:
+            _print_report(model.evaluate(test_examples, LOCAL_CLASSIFIER_THRESHOLD))
+
+    elif args.command == "evaluate":
+        model = LocalClassifier.load(args.model)
+        _print_report(model.evaluate(load_examples(args.data), args.threshold))
+
+    elif args.command == "export":
+        model = LocalClassifier.load(args.model)
+        model.save(args.out, compact=True)
+        print(f"Exported {os.path.getsize(args.out) / 1024:.0f} KB model to {args.out}")
+
+
+def _print_report(report: Dict[str, float]) -> None:
+    for name, value in report.items():
+        print(f"  {name}: {value:.1%}")
+
+
+if __name__ == "__main__":
+    main()
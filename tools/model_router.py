@@ -0,0 +1,148 @@
+"""
+Routes emails to a light or a heavy categorization model by complexity.
+
+Most mail (a GitHub ping, a receipt, a newsletter) doesn't need the Gemini
+agent. Each email gets a complexity score between 0 and 1 from its body
+length, its MIME structure, how consistently its sender was categorized
+before and how sure the local classifier (or, without a model, the keyword
+rules) is about it. Emails scoring below ROUTER_THRESHOLD take the light
+route, one JSON-mode request to GROQ_MODEL; everything else, and every
+email with security or financial signals, takes the heavy route through
+the Gemini agent.
+
+Per-route counters (emails, latency, escalations) are kept for tuning the
+threshold. A ROUTER_AUDIT_RATE sample of light-route emails is also sent to
+Gemini, and the share of matching answers is the light route's accuracy.
+"""
+
+import random
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from config import (
+    MODEL_ROUTING,
+    ROUTER_THRESHOLD,
+    ROUTER_LONG_EMAIL_CHARS,
+    ROUTER_AUDIT_RATE,
+)
+from .categorization_result import CategorizationResult
+from .categorization_tools import provider_categorization
+from .keyword_classifier import get_keyword_classifier, CATEGORY_SIGNALS
+from .local_classifier import get_local_classifier
+from .sender_index import get_sender_index
+
+# Provider of each route ("heavy" is the Gemini agent run by main.py)
+LIGHT_PROVIDER = "groq"
+AUDIT_PROVIDER = "gemini"
+
+# Weights of the complexity signals (they add up to 1)
+WEIGHTS = {"length": 0.3, "mime": 0.15, "sender": 0.25, "classifier": 0.3}
+
+# Keyword signals that always take the heavy route: mistakes there are expensive
+HIGH_STAKES_SIGNALS = {"security", "financial"}
+
+_CATEGORY_SIGNAL_NAMES = {signal for signal, _ in CATEGORY_SIGNALS}
+
+# Per-route counters, see record_route()
+counters = {
+    route: {"emails": 0, "seconds": 0.0, "escalated": 0, "audited": 0, "agreed": 0}
+    for route in ("light", "heavy")
+}
+_counters_lock = threading.Lock()
+
+
+def complexity_signals(email_data: Dict[str, Any], email_content: str) -> Dict[str, float]:
+    """
+    Returns each complexity signal of an email, between 0 (simple) and 1 (complex).
+
+    Args:
+        email_data: Email dictionary as yielded by iter_emails()
+        email_content: The formatted email text
+    """
+    # The body itself is cut to a token budget, so its length says little
+    body_length = email_data.get("body_chars", len(email_data.get("body") or ""))
+    parts = email_data.get("mime_parts", 1)
+    attachments = email_data.get("attachments", 0)
+
+    # Unknown senders sit in the middle
+    agreement = get_sender_index().agreement(email_content)
+    sender = 0.5 if agreement is None else 1.0 - agreement
+
+    model = get_local_classifier()
+    if model is not None:
+        _, confidence = model.predict(email_content)
+    else:
+        # One matching category is clear, none or several are not
+        matches = len(get_keyword_classifier().signals(email_content) & _CATEGORY_SIGNAL_NAMES)
+        confidence = 0.5 if matches == 0 else 1.0 / matches
+
+    return {
+        "length": min(1.0, body_length / max(1, ROUTER_LONG_EMAIL_CHARS)),
+        "mime": min(1.0, max(0, parts - 1) / 4 + 0.5 * attachments),
+        "sender": sender,
+        "classifier": 1.0 - confidence,
+    }
+
+
+def choose_route(email_data: Dict[str, Any], email_content: str) -> Tuple[str, float]:
+    """
+    Picks the route of an email.
+
+    Returns:
+        Tuple[str, float]: "light" or "heavy", and the complexity score
+        (1.0 for high-stakes mail, 0.0 with MODEL_ROUTING off)
+    """
+    if not MODEL_ROUTING:
+        return "heavy", 0.0
+    if get_keyword_classifier().signals(email_content) & HIGH_STAKES_SIGNALS:
+        return "heavy", 1.0
+
+    signals = complexity_signals(email_data, email_content)
+    score = sum(WEIGHTS[name] * value for name, value in signals.items())
+    return ("light" if score < ROUTER_THRESHOLD else "heavy"), score
+
+
+def light_categorization(email_content: str) -> Optional[CategorizationResult]:
+    """
+    Categorizes an email on the light route, auditing a sample against Gemini.
+
+    Audits never wait for quota; an audited email gets Gemini's answer.
+
+    Returns:
+        Optional[CategorizationResult]: The result, or None to escalate to the heavy route
+    """
+    result = provider_categorization(LIGHT_PROVIDER, email_content)
+    if result is None:
+        with _counters_lock:
+            counters["light"]["escalated"] += 1
+        return None
+
+    if ROUTER_AUDIT_RATE > 0 and random.random() < ROUTER_AUDIT_RATE:
+        reference = provider_categorization(AUDIT_PROVIDER, email_content, wait_for_quota=False)
+        if reference is not None:
+            with _counters_lock:
+                counters["light"]["audited"] += 1
+                counters["light"]["agreed"] += int(reference.fields() == result.fields())
+            return reference
+    return result
+
+
+def record_route(route: str, seconds: float) -> None:
+    """
+    Counts one email categorized on `route` in `seconds`.
+    """
+    with _counters_lock:
+        counters[route]["emails"] += 1
+        counters[route]["seconds"] += seconds
+
+
+def route_stats() -> Dict[str, Dict[str, float]]:
+    """
+    Returns a copy of the per-route counters with the mean latency and audit accuracy.
+    """
+    with _counters_lock:
+        stats = {route: dict(values) for route, values in counters.items()}
+    for values in stats.values():
+        values["mean_seconds"] = values["seconds"] / values["emails"] if values["emails"] else 0.0
+        values["accuracy"] = values["agreed"] / values["audited"] if values["audited"] else None
+    return stats
@@ -0,0 +1,241 @@
+"""
+Durable outbox for Telegram notifications.
+
+Notifications are written to a SQLite queue and delivered by a background
+thread, so email processing never waits for Telegram. Failed deliveries
+are retried with exponential backoff, and a 429 waits for the
+`retry_after` Telegram asks for. Messages still queued when the process
+exits are sent by the next run.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config import (
+    TELEGRAM_BOT_TOKEN,
+    TELEGRAM_CHAT_ID,
+    NOTIFICATION_OUTBOX_PATH,
+    NOTIFICATION_MAX_ATTEMPTS,
+    NOTIFICATION_RETRY_SECONDS,
+)
+from .notification_tools import send_telegram_notification_func
+
+# Longest pause between two delivery attempts of a message
+MAX_RETRY_SECONDS = 300
+
+OUTBOX_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS outbox ("
+    "id INTEGER PRIMARY KEY AUTOINCREMENT, message TEXT NOT NULL, "
+    "attempts INTEGER NOT NULL, next_attempt_at REAL NOT NULL, "
+    "created_at REAL NOT NULL, last_error TEXT)"
+)
+
+
+class NotificationOutbox:
+    """
+    Queue of messages waiting to be sent, drained by one sender thread.
+
+    The queue is a SQLite table (in memory without a path); `_lock` guards
+    the connection and `_changed` wakes the sender and flush() callers.
+    """
+
+    def __init__(self, path: Optional[str] = NOTIFICATION_OUTBOX_PATH,
+                 send: Callable[[str], Any] = send_telegram_notification_func,
+                 max_attempts: int = NOTIFICATION_MAX_ATTEMPTS,
+                 retry_seconds: float = NOTIFICATION_RETRY_SECONDS):
+        self.path = path
+        self.send = send
+        self.max_attempts = max(1, max_attempts)
+        self.retry_seconds = retry_seconds
+        self.counters = {"queued": 0, "sent": 0, "retried": 0, "dropped": 0}
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._db: Optional[sqlite3.Connection] = None
+        self._thread: Optional[threading.Thread] = None
+        self._open()
+
+    @property
+    def enabled(self) -> bool:
+        """
+        False without Telegram credentials: nothing can be queued or delivered.
+        """
+        return bool(TELEGRAM_BOT_TOKEN and TELEGRAM_CHAT_ID)
+
+    def enqueue(self, message: str) -> bool:
+        """
+        Queues a message for delivery and returns immediately.
+
+        Returns:
+            bool: True if the message was queued
+        """
+        if not self.enabled:
+            print("Error: Telegram credentials not found in environment variables")
+            return False
+        with self._changed:
+            if self._db is None:
+                return False
+            try:
+                now = time.time()
+                self._db.execute(
+                    "INSERT INTO outbox (message, attempts, next_attempt_at, created_at) VALUES (?, 0, ?, ?)",
+                    (message, now, now),
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Error queueing notification: {str(e)}")
+                return False
+            self.counters["queued"] += 1
+            self._changed.notify_all()
+        self.start()
+        return True
+
+    def start(self) -> None:
+        """
+        Starts the sender thread if it isn't running yet.
+        """
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="notification-outbox", daemon=True)
+                self._thread.start()
+
+    def pending(self) -> int:
+        """
+        Returns the number of messages waiting to be sent.
+        """
+        with self._lock:
+            return self._pending()
+
+    def flush(self, timeout: float) -> int:
+        """
+        Waits up to `timeout` seconds for the queue to drain.
+
+        Returns:
+            int: Number of messages still queued
+        """
+        deadline = time.time() + timeout
+        with self._changed:
+            while self._pending() and time.time() < deadline:
+                self._changed.wait(deadline - time.time())
+            return self._pending()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns a copy of the counters and the number of queued messages.
+        """
+        with self._lock:
+            return dict(self.counters, pending=self._pending())
+
+    def _run(self) -> None:
+        while True:
+            with self._changed:
+                item, delay = self._next_due()
+                if item is None:
+                    # Sleep until the next retry is due or a message is queued
+                    self._changed.wait(delay)
+                    continue
+            self._deliver(*item)
+
+    def _deliver(self, row_id: int, message: str, attempts: int) -> None:
+        # Sent outside the lock: enqueue() must never wait for Telegram
+        result = self.send(message)
+        if isinstance(result, dict) and result.get("ok"):
+            self._finish(row_id, "sent")
+            return
+
+        retry_after = None
+        permanent = False
+        if isinstance(result, dict):
+            error_code = result.get("error_code")
+            retry_after = (result.get("parameters") or {}).get("retry_after")
+            # Other 4xx answers (bad chat ID, message too long) fail the same way every time
+            permanent = isinstance(error_code, int) and 400 <= error_code < 500 and error_code != 429
+
+        attempts += 1
+        if permanent or attempts >= self.max_attempts:
+            print(f"Dropping notification after {attempts} attempts: {result}")
+            self._finish(row_id, "dropped")
+            return
+
+        delay = retry_after if retry_after else min(self.retry_seconds * 2 ** (attempts - 1), MAX_RETRY_SECONDS)
+        print(f"Notification failed ({result}), retrying in {delay:.0f}s")
+        with self._changed:
+            self._execute(
+                "UPDATE outbox SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                (attempts, time.time() + delay, str(result)[:500], row_id),
+            )
+            self.counters["retried"] += 1
+
+    def _finish(self, row_id: int, outcome: str) -> None:
+        with self._changed:
+            self._execute("DELETE FROM outbox WHERE id = ?", (row_id,))
+            self.counters[outcome] += 1
+            self._changed.notify_all()
+
+    def _next_due(self) -> Tuple[Optional[Tuple[int, str, int]], Optional[float]]:
+        # Called with the lock held; returns the oldest due message or how long to wait
+        if self._db is None:
+            return None, None
+        try:
+            row = self._db.execute(
+                "SELECT id, message, attempts, next_attempt_at FROM outbox ORDER BY next_attempt_at, id LIMIT 1"
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Error reading notification outbox: {str(e)}")
+            return None, MAX_RETRY_SECONDS
+        if row is None:
+            return None, None
+        wait_time = row[3] - time.time()
+        if wait_time > 0:
+            return None, wait_time
+        return (row[0], row[1], row[2]), None
+
+    def _pending(self) -> int:
+        if self._db is None:
+            return 0
+        try:
+            return self._db.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def _execute(self, sql: str, parameters: tuple) -> None:
+        try:
+            self._db.execute(sql, parameters)
+            self._db.commit()
+        except sqlite3.Error as e:
+            print(f"Error writing notification outbox: {str(e)}")
+
+    def _open(self) -> None:
+        try:
+            if self.path:
+                directory = os.path.dirname(self.path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+            # Guarded by self._lock, so the sender thread can share the connection
+            self._db = sqlite3.connect(self.path or ":memory:", check_same_thread=False)
+            self._db.execute(OUTBOX_SCHEMA)
+            self._db.commit()
+        except (OSError, sqlite3.Error) as e:
+            print(f"Notification outbox disabled on disk: {str(e)}")
+            # Still deliver in the background, just without surviving a restart
+            self._db = sqlite3.connect(":memory:", check_same_thread=False)
+            self._db.execute(OUTBOX_SCHEMA)
+
+
+_outbox: Optional[NotificationOutbox] = None
+_outbox_lock = threading.Lock()
+
+
+def get_notification_outbox() -> NotificationOutbox:
+    """
+    Returns the process-wide outbox, starting delivery of messages left by an earlier run.
+    """
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = NotificationOutbox()
+            if _outbox.pending():
+                _outbox.start()
+        return _outbox
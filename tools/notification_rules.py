@@ -0,0 +1,107 @@
+"""
+Deterministic notification rules driven by NOTIFICATION_CRITERIA.
+
+Deciding whether an email deserves a Telegram alert is a fixed rule on
+priority, category and needs-response, so it is evaluated in code instead
+of by an LLM agent. The criteria are compiled once into a lookup table.
+"""
+
+from typing import Any, Dict, FrozenSet, Mapping, Tuple
+
+from config import NOTIFICATION_CRITERIA, PRIORITY_LEVELS
+from .categorization_result import CategorizationResult
+from .notification_outbox import get_notification_outbox
+
+
+class NotificationRules:
+    """
+    The notification criteria compiled into sets of (priority, needs_response) pairs.
+
+    Criteria keys:
+        high_priority: Notify for every High priority email, whatever its category
+        needs_response: Allow notifications because an email needs a response
+        medium_priority_needs_response: ...for Medium priority emails
+        low_priority_needs_response: ...for Low priority emails
+        excluded_categories: Categories that never notify because they need a response
+    """
+
+    def __init__(self, criteria: Mapping[str, Any] = NOTIFICATION_CRITERIA):
+        always = set()
+        if criteria.get("high_priority"):
+            always.update({("high", True), ("high", False)})
+        needs_response = set()
+        if criteria.get("needs_response"):
+            needs_response.add(("high", True))
+            if criteria.get("medium_priority_needs_response"):
+                needs_response.add(("medium", True))
+            if criteria.get("low_priority_needs_response"):
+                needs_response.add(("low", True))
+
+        # A High priority newsletter (a security alert sent through a mailing service) still notifies
+        self.always: FrozenSet[Tuple[str, bool]] = frozenset(always)
+        self.needs_response: FrozenSet[Tuple[str, bool]] = frozenset(needs_response - always)
+        self.allowed: FrozenSet[Tuple[str, bool]] = self.always | self.needs_response
+        self.excluded_categories: FrozenSet[str] = frozenset(
+            category.casefold() for category in criteria.get("excluded_categories", ())
+        )
+
+    def should_notify(self, priority: str, category: str, needs_response: str) -> bool:
+        """
+        Applies the rules to one categorization.
+
+        Args:
+            priority: "High", "Medium" or "Low" (case-insensitive)
+            category: The email category
+            needs_response: "Yes" or "No" (case-insensitive)
+
+        Returns:
+            bool: True if a notification should be sent
+        """
+        key = (priority.strip().casefold(), needs_response.strip().casefold() == "yes")
+        if key in self.always:
+            return True
+        if category.strip().casefold() in self.excluded_categories:
+            return False
+        return key in self.needs_response
+
+    def describe(self) -> str:
+        """
+        Returns a one-line, human-readable summary of the compiled rules.
+        """
+        order = [level.casefold() for level in PRIORITY_LEVELS]
+        rules = sorted(self.allowed, key=lambda pair: (order.index(pair[0]) if pair[0] in order else len(order), not pair[1]))
+        parts = [f"{priority.title()}{' + needs response' if needs_response else ''}" for priority, needs_response in rules]
+        excluded = ", ".join(sorted(self.excluded_categories)) or "none"
+        return f"notify for: {'; '.join(parts) or 'nothing'} (needs-response alerts skip: {excluded})"
+
+
+# Compiled once, the criteria don't change while running
+notification_rules = NotificationRules()
+
+
+def notify_if_needed(email_data: Dict[str, Any], result: CategorizationResult) -> bool:
+    """
+    Queues a Telegram notification for an email if the rules call for one.
+
+    Delivery happens in the background (see tools/notification_outbox.py),
+    so this never waits for Telegram.
+
+    Args:
+        email_data: Email dictionary with 'from' and 'subject'
+        result: The email's categorization
+
+    Returns:
+        bool: True if a notification was queued
+    """
+    if not notification_rules.should_notify(result.priority, result.category, result.needs_response):
+        return False
+
+    notification_message = (
+        f"From: {email_data['from']}\n"
+        f"Subject: {email_data['subject']}\n"
+        f"Priority: {result.priority}\n"
+        f"Category: {result.category}\n"
+        f"Needs Response: {result.needs_response}\n"
+        f"Summary: {result.summary}"
+    )
+    return get_notification_outbox().enqueue(notification_message)
@@ -2,31 +2,56 @@
 Notification tools for sending alerts via Telegram.
 """
 
+import threading
+from typing import Optional
+
 import requests
-from crewai.tools import tool
+from requests.adapters import HTTPAdapter
+
+from config import TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID, TELEGRAM_TIMEOUT_SECONDS
+from .rate_limiter import get_rate_limiter
+
+# One pooled session, so messages reuse the TLS connection to api.telegram.org
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
 
-from config import TELEGRAM_BOT_TOKEN, TELEGRAM_CHAT_ID
+def get_telegram_session() -> requests.Session:
+    """
+    Returns the process-wide HTTP session for the Telegram Bot API.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        return _session
 
 def send_telegram_notification_func(message: str):
     """
     Sends a message to Telegram using a bot.
+
+    Returns:
+        The Bot API's JSON response, or an error string if the request failed
     """
     bot_token = TELEGRAM_BOT_TOKEN
     chat_id = TELEGRAM_CHAT_ID
-    
+
     if not bot_token or not chat_id:
         return "Error: Telegram credentials not found in environment variables"
-        
+
     url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
 
     try:
         payload = {"chat_id": chat_id, "text": message}
-        response = requests.post(url, json=payload)
-        return response.json()
+        limiter = get_rate_limiter()
+        limiter.acquire("telegram")
+        response = get_telegram_session().post(url, json=payload, timeout=TELEGRAM_TIMEOUT_SECONDS)
+        result = response.json()
+
+        # Telegram answers flood limits with 429 and parameters.retry_after
+        if response.status_code == 429:
+            retry_after = result.get("parameters", {}).get("retry_after")
+            limiter.penalize("telegram", retry_after)
+        return result
     except Exception as e:
         return f"Error sending notification: {str(e)}"
-
-@tool
-def send_telegram_notification(message: str):
-    """Sends a message to Telegram using a bot."""
-    return send_telegram_notification_func(message)
@@ -0,0 +1,264 @@
+"""
+Versioned categorization prompts and the tokens they use.
+
+Each prompt is registered once as a PromptTemplate. Its static
+instructions become the provider's system instruction, and a short user
+template holds the email. Both are dedented and minified when they are
+registered, not on every call: the old indented f-strings sent hundreds of
+whitespace tokens with each email. The template version is part of the
+cache key, so bump it when a prompt changes.
+
+Every request records its input and output tokens (as reported by the
+provider, estimated otherwise) and its latency per prompt version. The
+totals are saved under STATE_DIR, so versions can be compared across runs:
+
+    python -m tools.prompt_registry
+"""
+
+import argparse
+import json
+import os
+import re
+import textwrap
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from config import PROMPT_USAGE_PATH
+from .body_preprocessing import estimate_tokens
+
+# Rules shared by the single-email and batch Gemini prompts
+GEMINI_RULES = """
+    IMPORTANT RULES:
+    - Security-related emails (password resets, security alerts, breach notifications) should ALWAYS be marked as High Priority and ALWAYS need a response
+    - Financial notifications (unusual charges, payment confirmations) should be High Priority
+    - Emails containing action items or requests should be marked as Needs Response: Yes
+    - Emails with deadlines or time-sensitive information should be at least Medium Priority
+"""
+
+# What each field of the JSON result means
+OUTPUT_FIELDS = """
+    - priority: High, Medium or Low. Use High for urgent matters, security alerts, or financial notifications
+    - category: Personal, Work, Promotional, Newsletter, GitHub, YouTube, Receipts_Invoices or Other. Choose the most specific category
+    - needs_response: true if the sender expects a reply OR if the email contains security alerts or action items
+    - contains_tasks: true if there are specific actions required
+    - summary: 1-2 sentence summary of the email's main content and purpose
+"""
+
+
+def minify(text: str) -> str:
+    """
+    Dedents a prompt, trims every line and collapses runs of blank lines.
+    """
+    lines = [line.rstrip() for line in textwrap.dedent(text).strip().split("\n")]
+    return re.sub(r"\n{3,}", "\n\n", "\n".join(lines))
+
+
+class PromptTemplate:
+    """
+    A prompt split into static system instructions and a per-call user template.
+
+    The system instructions may be given as several sections, which are
+    minified one by one and joined with blank lines. The user template is a
+    str.format() string, e.g. "Categorize this email:\\n\\n{email}".
+    """
+
+    def __init__(self, name: str, version: str, system: Union[str, Sequence[str]], user: str):
+        self.name = name
+        self.version = version
+        sections = [system] if isinstance(system, str) else system
+        self.system = "\n\n".join(minify(section) for section in sections)
+        self.user = minify(user)
+
+    @property
+    def key(self) -> str:
+        """
+        "name/vN", the key of the cache entries and usage totals of this version.
+        """
+        return f"{self.name}/v{self.version}"
+
+    def render(self, **values: Any) -> str:
+        """
+        Fills in the user template.
+        """
+        return self.user.format(**values)
+
+
+PROMPTS: Dict[str, PromptTemplate] = {}
+
+
+def register_prompt(name: str, version: str, system: Union[str, Sequence[str]], user: str) -> PromptTemplate:
+    """
+    Compiles a prompt and adds it to PROMPTS, replacing any earlier version.
+    """
+    template = PromptTemplate(name, version, system, user)
+    PROMPTS[name] = template
+    return template
+
+
+def get_prompt(name: str) -> PromptTemplate:
+    """
+    Returns the current version of a registered prompt.
+    """
+    return PROMPTS[name]
+
+
+register_prompt(
+    "gemini", "3",
+    system=[
+        """
+        You categorize emails. First, understand the intent and context of the email:
+        1. Who is the sender and what is their relationship to the recipient?
+        2. What is the main purpose of this email?
+        3. Is there any urgency or time-sensitivity?
+        4. Does it require action from the recipient?
+        5. What category best describes this email?
+        """,
+        GEMINI_RULES,
+        "Based on your analysis, fill in these fields:\n" + minify(OUTPUT_FIELDS),
+    ],
+    user="Analyze this email and categorize it:\n\n{email}",
+)
+
+register_prompt(
+    "gemini_batch", "1",
+    system=[
+        "You categorize emails. Categorize each email independently.",
+        GEMINI_RULES,
+        "Return one JSON object per email, in the order given, with its email_id and these fields:\n"
+        + minify(OUTPUT_FIELDS),
+    ],
+    user="Analyze each of the following {count} emails and categorize it:\n\n{emails}",
+)
+
+register_prompt(
+    "groq", "3",
+    system=[
+        """
+        You are an email categorization assistant. Analyze emails and categorize them accurately. Answer in JSON.
+        - Use GitHub for any GitHub-related notifications or updates
+        - Use YouTube for YouTube notifications and subscriptions
+        - Use Receipts_Invoices for any receipts, invoices, or financial documents
+        """,
+        "Respond with a JSON object with these fields:\n" + minify(OUTPUT_FIELDS),
+    ],
+    user="Analyze this email and categorize it:\n\n{email}",
+)
+
+
+def response_token_counts(response: Any) -> Tuple[Optional[int], Optional[int]]:
+    """
+    Reads the input and output token counts from a Gemini or Groq response.
+
+    Returns:
+        Tuple[Optional[int], Optional[int]]: The counts, None where the response has none
+    """
+    metadata = getattr(response, "usage_metadata", None)
+    if metadata is not None:
+        return getattr(metadata, "prompt_token_count", None), getattr(metadata, "candidates_token_count", None)
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        return getattr(usage, "prompt_tokens", None), getattr(usage, "completion_tokens", None)
+    return None, None
+
+
+class PromptUsage:
+    """
+    Calls, tokens and seconds per prompt version, for this run and in total.
+    """
+
+    def __init__(self, path: Optional[str] = PROMPT_USAGE_PATH):
+        self.path = path
+        self.totals: Dict[str, Dict[str, float]] = {}
+        self.run: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def record(self, prompt: PromptTemplate, rendered: str, response: Any, output_text: str, seconds: float) -> None:
+        """
+        Adds one request made with `prompt`.
+
+        Args:
+            prompt: The template used
+            rendered: The user message that was sent
+            response: The provider's response, read for its token counts
+            output_text: The answer, used to estimate output tokens if the response has no counts
+            seconds: Request latency
+        """
+        input_tokens, output_tokens = response_token_counts(response)
+        if input_tokens is None:
+            input_tokens = estimate_tokens(prompt.system) + estimate_tokens(rendered)
+        if output_tokens is None:
+            output_tokens = estimate_tokens(output_text or "")
+
+        with self._lock:
+            for usage in (self.run, self.totals):
+                entry = usage.setdefault(prompt.key, {"calls": 0, "input_tokens": 0, "output_tokens": 0, "seconds": 0.0})
+                entry["calls"] += 1
+                entry["input_tokens"] += input_tokens
+                entry["output_tokens"] += output_tokens
+                entry["seconds"] += seconds
+            self._save()
+
+    def stats(self, totals: bool = False) -> Dict[str, Dict[str, float]]:
+        """
+        Returns a copy of this run's usage (or of the saved totals) per prompt version.
+        """
+        with self._lock:
+            return {key: dict(entry) for key, entry in (self.totals if totals else self.run).items()}
+
+    def _load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                self.totals = {key: dict(entry) for key, entry in json.load(file).items()}
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            print(f"Ignoring unreadable prompt usage: {str(e)}")
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump(self.totals, file)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error saving prompt usage: {str(e)}")
+
+
+_usage: Optional[PromptUsage] = None
+_usage_lock = threading.Lock()
+
+
+def get_prompt_usage() -> PromptUsage:
+    """
+    Returns the process-wide prompt usage, loading the saved totals on first use.
+    """
+    global _usage
+    with _usage_lock:
+        if _usage is None:
+            _usage = PromptUsage()
+        return _usage
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Compare token use and latency of prompt versions")
+    parser.parse_args(argv)
+
+    totals = get_prompt_usage().stats(totals=True)
+    if not totals:
+        print("No prompt usage recorded yet.")
+        return
+    print(f"{'Prompt':<20} {'Calls':>7} {'In/call':>9} {'Out/call':>9} {'Sec/call':>9}")
+    for key, entry in sorted(totals.items()):
+        calls = max(1, entry["calls"])
+        print(f"{key:<20} {entry['calls']:>7} {entry['input_tokens'] / calls:>9.0f} "
+              f"{entry['output_tokens'] / calls:>9.0f} {entry['seconds'] / calls:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Lazily created LLM provider clients.
+
+The groq and google.generativeai packages take over a second to import
+together, so they are only imported when a client is first requested,
+not when config.py is loaded. A run that finds no new mail, or answers
+every email from the cache or the local models, never imports them.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from config import GROQ_API_KEY, GEMINI_API_KEY, CATEGORIZER_MODEL
+
+
+def _create_groq_client() -> Optional[Any]:
+    if not GROQ_API_KEY:
+        return None
+    from groq import Groq
+    return Groq(api_key=GROQ_API_KEY)
+
+
+def _create_gemini_model() -> Optional[Any]:
+    if not GEMINI_API_KEY:
+        return None
+    import google.generativeai as genai
+    genai.configure(api_key=GEMINI_API_KEY)
+    return genai.GenerativeModel(model_name=CATEGORIZER_MODEL)
+
+
+# Factories by provider name (the names used by the rate limiter)
+PROVIDER_FACTORIES: Dict[str, Callable[[], Optional[Any]]] = {
+    "groq": _create_groq_client,
+    "gemini": _create_gemini_model,
+}
+
+_clients: Dict[str, Optional[Any]] = {}
+_clients_lock = threading.Lock()
+
+# Gemini models by system instruction (the instruction is fixed when a model is created)
+_gemini_models: Dict[str, Any] = {}
+
+
+def get_provider(name: str) -> Optional[Any]:
+    """
+    Returns the client of a provider, creating it on first use.
+
+    Args:
+        name: A key of PROVIDER_FACTORIES
+
+    Returns:
+        Optional[Any]: The client, or None if the provider's API key is not set
+    """
+    with _clients_lock:
+        if name not in _clients:
+            _clients[name] = PROVIDER_FACTORIES[name]()
+        return _clients[name]
+
+
+def get_groq_client() -> Optional[Any]:
+    """
+    Returns the Groq client, or None without GROQ_API_KEY.
+    """
+    return get_provider("groq")
+
+
+def get_gemini_model(system_instruction: Optional[str] = None) -> Optional[Any]:
+    """
+    Returns the Gemini model used for categorization, or None without GEMINI_API_KEY.
+
+    Args:
+        system_instruction: Static instructions sent as the model's system
+            instruction; one model is kept per distinct instruction
+    """
+    model = get_provider("gemini")
+    if model is None or not system_instruction:
+        return model
+    with _clients_lock:
+        if system_instruction not in _gemini_models:
+            import google.generativeai as genai
+            _gemini_models[system_instruction] = genai.GenerativeModel(
+                model_name=CATEGORIZER_MODEL, system_instruction=system_instruction
+            )
+        return _gemini_models[system_instruction]
@@ -0,0 +1,376 @@
+"""
+Token-bucket rate limiting for the external APIs (Gemini, Groq, Telegram).
+
+Every call takes a token from its provider's bucket before it is made, so
+requests are spaced exactly as far apart as the quota requires instead of
+sleeping a fixed amount between emails. Buckets tighten themselves from
+rate-limit response headers and 429 responses, and their state is saved
+under STATE_DIR so that back-to-back cron runs share the same budget.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Mapping, Optional
+
+from config import RATE_LIMITS, RATE_LIMIT_STATE_PATH
+
+# "2m59.56s", "7.66s", "120ms", "1h2m"
+DURATION_PART_RE = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+
+# Exception class names used for HTTP 429 by the SDKs we talk to
+RATE_LIMIT_ERROR_NAMES = ("RateLimitError", "ResourceExhausted", "TooManyRequests")
+
+# Waits shorter than this are not worth a log line
+LOG_WAIT_THRESHOLD = 1.0
+
+
+class TokenBucket:
+    """
+    A bucket holding up to `capacity` tokens, refilled at `per_minute` tokens per minute.
+
+    Times are wall-clock seconds so that the state stays meaningful after
+    being saved and loaded by a later process.
+    """
+
+    def __init__(self, per_minute: float, capacity: float):
+        self.rate = max(per_minute, 0.001) / 60.0
+        self.capacity = max(capacity, 1.0)
+        self.tokens = self.capacity
+        self.updated_at = time.time()
+        self.blocked_until = 0.0
+
+    def refill(self, now: float) -> None:
+        """
+        Adds the tokens accrued since the last update.
+        """
+        if now <= self.updated_at:
+            # Still inside a block, refilling starts when it ends
+            return
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def reserve(self, tokens: float, now: float) -> float:
+        """
+        Takes `tokens` from the bucket, going into debt if necessary.
+
+        Args:
+            tokens: Number of tokens the call costs
+            now: Current time
+
+        Returns:
+            float: Seconds the caller has to wait before making the call
+        """
+        self.refill(now)
+        self.tokens -= tokens
+        # Debt is paid back at the refill rate, starting once any block has ended
+        wait_time = max(self.updated_at - now, 0.0)
+        if self.tokens < 0:
+            wait_time += -self.tokens / self.rate
+        return max(wait_time, self.blocked_until - now)
+
+    def block(self, until: float) -> None:
+        """
+        Stops handing out tokens until `until` and drains the bucket.
+        """
+        self.blocked_until = max(self.blocked_until, until)
+        self.tokens = min(self.tokens, 0.0)
+        self.updated_at = max(self.updated_at, until)
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "tokens": self.tokens,
+            "updated_at": self.updated_at,
+            "blocked_until": self.blocked_until,
+        }
+
+    def restore(self, state: Mapping[str, Any]) -> None:
+        self.tokens = min(self.capacity, float(state.get("tokens", self.capacity)))
+        self.updated_at = float(state.get("updated_at", self.updated_at))
+        self.blocked_until = float(state.get("blocked_until", 0.0))
+
+
+class RateLimiter:
+    """
+    One token bucket per provider, persisted to a small JSON file.
+
+    Usage:
+        limiter = get_rate_limiter()
+        limiter.acquire("groq")
+        ... make the request ...
+        limiter.update_from_headers("groq", response.headers)
+    """
+
+    def __init__(self, limits: Mapping[str, Mapping[str, float]] = RATE_LIMITS,
+                 path: Optional[str] = RATE_LIMIT_STATE_PATH):
+        self.path = path
+        self.buckets = {
+            provider: TokenBucket(limit["per_minute"], limit["burst"])
+            for provider, limit in limits.items()
+        }
+        self._lock = threading.Lock()
+        # Tokens the calling thread has already paid for, see prepaid()
+        self._credit = threading.local()
+        self._load()
+
+    @contextmanager
+    def prepaid(self, untracked: Mapping[str, float], tracked: Mapping[str, float]) -> Iterator[None]:
+        """
+        Reserves the quota of a unit of work in one place, before it starts.
+
+        Used for an agent run: its own LLM calls are made by CrewAI and never
+        pass through the limiter (`untracked`), while its tools call
+        acquire() as usual (`tracked`). Both are taken here with one acquire()
+        per provider; inside the block, this thread's acquire() and
+        try_acquire() calls draw on the `tracked` tokens first instead of
+        taking them a second time. Unused tokens are not returned.
+
+        Args:
+            untracked: Calls per provider made without acquire()
+            tracked: Calls per provider made with acquire() inside the block
+        """
+        for provider in set(untracked) | set(tracked):
+            self.acquire(provider, untracked.get(provider, 0) + tracked.get(provider, 0))
+        self._credit.tokens = dict(tracked)
+        try:
+            yield
+        finally:
+            self._credit.tokens = {}
+
+    def _use_credit(self, provider: str, tokens: float) -> bool:
+        """
+        Takes `tokens` from the calling thread's prepaid tokens, if it has enough.
+        """
+        credit = getattr(self._credit, "tokens", {})
+        if credit.get(provider, 0) < tokens:
+            return False
+        credit[provider] -= tokens
+        return True
+
+    def acquire(self, provider: str, tokens: float = 1.0) -> float:
+        """
+        Blocks until the provider's quota allows another call.
+
+        Args:
+            provider: "gemini", "groq" or "telegram"
+            tokens: Number of calls about to be made
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        bucket = self.buckets.get(provider)
+        if bucket is None or self._use_credit(provider, tokens):
+            return 0.0
+
+        waited = 0.0
+        with self._lock:
+            wait_time = bucket.reserve(tokens, time.time())
+            self._save()
+
+        # Keep waiting while a 429 seen by another thread pushes the block further out
+        while wait_time > 0:
+            if wait_time >= LOG_WAIT_THRESHOLD:
+                print(f"Rate limit: waiting {wait_time:.1f}s for {provider}...")
+            time.sleep(wait_time)
+            waited += wait_time
+            with self._lock:
+                wait_time = bucket.blocked_until - time.time()
+
+        return waited
+
+    def try_acquire(self, provider: str, tokens: float = 1.0) -> bool:
+        """
+        Takes tokens only if the provider's quota allows the call right now.
+
+        For optional calls (such as hedged requests) that should be skipped
+        rather than delayed when the quota is tight.
+
+        Returns:
+            bool: True if the tokens were taken
+        """
+        bucket = self.buckets.get(provider)
+        if bucket is None or self._use_credit(provider, tokens):
+            return True
+
+        with self._lock:
+            now = time.time()
+            bucket.refill(now)
+            if bucket.blocked_until > now or bucket.updated_at > now or bucket.tokens < tokens:
+                return False
+            bucket.tokens -= tokens
+            self._save()
+            return True
+
+    def penalize(self, provider: str, retry_after: Optional[float] = None) -> None:
+        """
+        Records a 429 from the provider, pausing it for `retry_after` seconds.
+
+        Without a server-provided delay the provider is paused for the time
+        it takes to refill one token.
+        """
+        bucket = self.buckets.get(provider)
+        if bucket is None:
+            return
+
+        if retry_after is None or retry_after <= 0:
+            retry_after = 1.0 / bucket.rate
+        print(f"Rate limit hit for {provider}, pausing it for {retry_after:.1f}s")
+
+        with self._lock:
+            bucket.block(time.time() + retry_after)
+            self._save()
+
+    def update_from_headers(self, provider: str, headers: Optional[Mapping[str, str]]) -> None:
+        """
+        Tightens the provider's bucket using rate-limit response headers.
+
+        Understands `retry-after` and the `x-ratelimit-remaining-*` /
+        `x-ratelimit-reset-*` pairs sent by Groq (and other OpenAI-style APIs).
+
+        Args:
+            provider: The provider that sent the response
+            headers: The response headers (case-insensitive mapping or dict)
+        """
+        bucket = self.buckets.get(provider)
+        if bucket is None or not headers:
+            return
+        headers = {str(key).lower(): value for key, value in headers.items()}
+
+        retry_after = parse_duration(headers.get("retry-after"))
+        if retry_after:
+            self.penalize(provider, retry_after)
+            return
+
+        with self._lock:
+            now = time.time()
+            changed = False
+            for kind in ("requests", "tokens"):
+                remaining = _to_float(headers.get(f"x-ratelimit-remaining-{kind}"))
+                if remaining is None:
+                    continue
+                reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}")) or 0.0
+
+                if remaining <= 0 and reset > 0:
+                    bucket.block(now + reset)
+                    changed = True
+                elif kind == "requests" and remaining < bucket.tokens:
+                    # The server knows about calls made outside this process
+                    bucket.refill(now)
+                    bucket.tokens = min(bucket.tokens, remaining)
+                    changed = True
+            if changed:
+                self._save()
+
+    def _load(self) -> None:
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                state = json.load(file)
+            for provider, bucket in self.buckets.items():
+                if provider in state:
+                    bucket.restore(state[provider])
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            print(f"Ignoring unreadable rate limit state: {str(e)}")
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump({provider: bucket.to_dict() for provider, bucket in self.buckets.items()}, file)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error saving rate limit state: {str(e)}")
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Parses "30", "7.66s", "2m59.56s" or "120ms" into seconds.
+
+    Returns:
+        Optional[float]: The duration in seconds, or None if it can't be parsed
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    seconds = _to_float(value)
+    if seconds is not None:
+        return seconds
+
+    parts = DURATION_PART_RE.findall(value)
+    if not parts:
+        return None
+    units = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    return sum(float(amount) * units[unit] for amount, unit in parts)
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """
+    Returns True if an SDK exception (or its cause) is an HTTP 429.
+
+    Checks status codes and exception types instead of searching the
+    message text, which also matched unrelated errors mentioning "quota".
+    """
+    while error is not None:
+        for attr in ("status_code", "code", "http_status"):
+            if getattr(error, attr, None) == 429:
+                return True
+        response = getattr(error, "response", None)
+        if getattr(response, "status_code", None) == 429:
+            return True
+        if type(error).__name__ in RATE_LIMIT_ERROR_NAMES:
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def retry_after_from_error(error: BaseException) -> Optional[float]:
+    """
+    Extracts the server-requested delay from a 429 exception, if it carries one.
+
+    Looks at the `retry-after` header of HTTP responses (Groq, litellm) and
+    at the RetryInfo detail of Google API errors (Gemini).
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        retry_after = parse_duration(headers.get("retry-after"))
+        if retry_after:
+            return retry_after
+
+    for detail in getattr(error, "details", None) or []:
+        retry_delay = getattr(detail, "retry_delay", None)
+        if retry_delay is not None:
+            return getattr(retry_delay, "seconds", 0) + getattr(retry_delay, "nanos", 0) / 1e9
+
+    return None
+
+
+def _to_float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    Returns the process-wide rate limiter, loading its saved state on first use.
+    """
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter()
+        return _limiter
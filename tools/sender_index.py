@@ -0,0 +1,283 @@
+"""
+Per-sender history of categorizations.
+
+Most mail comes from a few senders (GitHub, YouTube, billing systems) that
+are categorized the same way every time. The index keeps, for every sender
+address and domain, how often each priority, category and needs-response
+value was assigned, and answers new mail from that sender without an LLM
+call once its history is consistent enough.
+
+Counts decay exponentially with SENDER_INDEX_HALF_LIFE_DAYS, so a sender
+that changes what it sends is re-learned, and senders that haven't been
+seen for a long time drop out of the index. The index lives in memory
+(one dict lookup per email) and is written through to SQLite.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from email.utils import parseaddr
+from typing import Dict, List, Optional, Tuple
+
+from config import (
+    SENDER_INDEX_PATH,
+    SENDER_INDEX_THRESHOLD,
+    SENDER_INDEX_MIN_EMAILS,
+    SENDER_INDEX_HALF_LIFE_DAYS,
+    SENDER_INDEX_SHARED_DOMAINS,
+)
+from .keyword_classifier import get_keyword_classifier, summarize
+from .categorization_result import CategorizationResult
+from .training_data import LABELS
+
+# Fields learned per sender
+FIELDS = tuple(LABELS)
+
+# Entries whose decayed weight falls below this are forgotten
+MIN_WEIGHT = 0.05
+
+
+def sender_keys(email_content: str) -> List[str]:
+    """
+    Returns the index keys of an email's sender, most specific first.
+
+    Args:
+        email_content: Email text with a From: line
+
+    Shared freemail domains (SENDER_INDEX_SHARED_DOMAINS) have no domain
+    key: their history would mix unrelated people.
+
+    Returns:
+        List[str]: "address:<address>" and "domain:<domain>", or [] without a sender
+    """
+    for line in email_content.split("\n", 4)[:4]:
+        if line.startswith("From:"):
+            address = parseaddr(line[5:].strip())[1].lower()
+            if "@" not in address:
+                return []
+            domain = address.rsplit('@', 1)[1]
+            if domain in SENDER_INDEX_SHARED_DOMAINS:
+                return [f"address:{address}"]
+            return [f"address:{address}", f"domain:{domain}"]
+    return []
+
+
+class SenderIndex:
+    """
+    Decayed value counts per sender key, in memory and in SQLite.
+
+    `entries[key][field][value]` is `[weight, updated_at]`; the weight is
+    decayed to the current time whenever it is read or updated.
+    """
+
+    def __init__(self, path: Optional[str] = SENDER_INDEX_PATH,
+                 threshold: float = SENDER_INDEX_THRESHOLD,
+                 min_emails: float = SENDER_INDEX_MIN_EMAILS,
+                 half_life_days: float = SENDER_INDEX_HALF_LIFE_DAYS):
+        self.path = path
+        self.threshold = threshold
+        self.min_emails = min_emails
+        self.half_life = max(half_life_days, 0.001) * 24 * 3600
+        self.counters = {"hits": 0, "misses": 0, "learned": 0}
+        self.entries: Dict[str, Dict[str, Dict[str, List[float]]]] = {}
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._open()
+
+    def lookup(self, email_content: str, count: bool = True) -> Optional[Tuple[Dict[str, str], float, str]]:
+        """
+        Predicts an email's fields from its sender's history.
+
+        The sender address is tried first, then its domain. A key only
+        answers if it has seen at least `min_emails` (decayed) emails and
+        every field's most common value has at least `threshold` of the weight.
+
+        Args:
+            email_content: Email text with a From: line
+            count: Whether the outcome should be counted in the stats
+
+        Returns:
+            Optional[Tuple[Dict[str, str], float, str]]: The value per field, the
+            (decayed) number of emails behind it and the key, or None
+        """
+        now = time.time()
+        with self._lock:
+            for key in sender_keys(email_content):
+                fields = self.entries.get(key)
+                if fields is None:
+                    continue
+                answer = self._answer(fields, now)
+                if answer is not None:
+                    if count:
+                        self.counters["hits"] += 1
+                    return answer[0], answer[1], key
+            if count:
+                self.counters["misses"] += 1
+            return None
+
+    def learn(self, email_content: str, result: CategorizationResult) -> None:
+        """
+        Adds one categorized email to its sender's history.
+
+        Args:
+            email_content: Email text with a From: line
+            result: The email's categorization; incomplete results are ignored
+        """
+        keys = sender_keys(email_content)
+        if not keys or not result.is_complete():
+            return
+        labels = result.fields()
+
+        now = time.time()
+        with self._lock:
+            rows = []
+            for key in keys:
+                fields = self.entries.setdefault(key, {})
+                for field in FIELDS:
+                    values = fields.setdefault(field, {})
+                    entry = values.setdefault(labels[field], [0.0, now])
+                    entry[0] = self._decayed(entry, now) + 1.0
+                    entry[1] = now
+                    rows.append((key, field, labels[field], entry[0], now))
+            self.counters["learned"] += 1
+
+            if self._db is None:
+                return
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO sender_stats (key, field, value, weight, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Error writing sender index: {str(e)}")
+
+    def agreement(self, email_content: str) -> Optional[float]:
+        """
+        Measures how consistently the sender's emails were categorized.
+
+        Uses the most specific key with any history: the lowest share of the
+        most common value across the fields, scaled down while fewer than
+        `min_emails` emails have been seen. Nothing is counted in the stats.
+
+        Returns:
+            Optional[float]: Between 0 and 1, or None for an unknown sender
+        """
+        now = time.time()
+        with self._lock:
+            for key in sender_keys(email_content):
+                fields = self.entries.get(key)
+                if not fields:
+                    continue
+                agreement = 1.0
+                for field in FIELDS:
+                    weights = [self._decayed(entry, now) for entry in fields.get(field, {}).values()]
+                    total = sum(weights)
+                    if total <= 0:
+                        return 0.0
+                    agreement = min(agreement, max(weights) / total * min(1.0, total / max(self.min_emails, 1.0)))
+                return agreement
+            return None
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Returns a copy of the counters and the number of known senders.
+        """
+        with self._lock:
+            return dict(self.counters, senders=len(self.entries))
+
+    def _decayed(self, entry: List[float], now: float) -> float:
+        return entry[0] * 0.5 ** (max(0.0, now - entry[1]) / self.half_life)
+
+    def _answer(self, fields: Dict[str, Dict[str, List[float]]], now: float) -> Optional[Tuple[Dict[str, str], float]]:
+        labels = {}
+        support = float("inf")
+        for field in FIELDS:
+            weights = {value: self._decayed(entry, now) for value, entry in fields.get(field, {}).items()}
+            total = sum(weights.values())
+            # Tolerance for the decay between learning and looking up
+            if total < self.min_emails - 1e-3:
+                return None
+            value, weight = max(weights.items(), key=lambda item: item[1])
+            if weight / total < self.threshold:
+                return None
+            labels[field] = value
+            support = min(support, total)
+        return labels, support
+
+    def _open(self) -> None:
+        if not self.path:
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # Guarded by self._lock, so one connection can be shared by all threads
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sender_stats ("
+                "key TEXT NOT NULL, field TEXT NOT NULL, value TEXT NOT NULL, "
+                "weight REAL NOT NULL, updated_at REAL NOT NULL, "
+                "PRIMARY KEY (key, field, value))"
+            )
+
+            # Load the index, dropping entries that have decayed away
+            now = time.time()
+            expired = []
+            for key, field, value, weight, updated_at in self._db.execute(
+                "SELECT key, field, value, weight, updated_at FROM sender_stats"
+            ):
+                entry = [weight, updated_at]
+                if self._decayed(entry, now) < MIN_WEIGHT:
+                    expired.append((key, field, value))
+                    continue
+                self.entries.setdefault(key, {}).setdefault(field, {})[value] = entry
+            if expired:
+                self._db.executemany(
+                    "DELETE FROM sender_stats WHERE key = ? AND field = ? AND value = ?", expired
+                )
+            self._db.commit()
+        except (OSError, sqlite3.Error) as e:
+            print(f"Sender index disabled on disk: {str(e)}")
+            self._db = None
+
+
+_index: Optional[SenderIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_sender_index() -> SenderIndex:
+    """
+    Returns the process-wide sender index, loading it on first use.
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SenderIndex()
+        return _index
+
+
+def sender_categorization(email_content: str, count: bool = True) -> Optional[CategorizationResult]:
+    """
+    Categorizes an email from its sender's history, if that history is consistent.
+
+    Contains Tasks comes from the keyword classifier, the summary from the headers.
+
+    Returns:
+        Optional[CategorizationResult]: The result, or None to keep going
+    """
+    answer = get_sender_index().lookup(email_content, count=count)
+    if answer is None:
+        return None
+
+    labels, support, key = answer
+    signals = get_keyword_classifier().signals(email_content)
+    return CategorizationResult(
+        labels["Priority"],
+        labels["Category"],
+        labels["Needs Response"],
+        "Yes" if "tasks" in signals else "No",
+        f"{summarize(email_content, labels['Category'])} (history of {key.split(':', 1)[1]}, {support:.0f} emails)",
+    )
@@ -0,0 +1,117 @@
+"""
+Persisted IMAP synchronization state (UIDVALIDITY and last processed UID).
+
+With this state each run only has to look at messages whose UID is above
+the high-water mark instead of scanning the whole mailbox for UNSEEN mail.
+"""
+
+import json
+import os
+import threading
+from typing import Optional, Tuple
+
+from config import GMAIL_USERNAME, SYNC_STATE_PATH
+
+
+class SyncState:
+    """
+    High-water marks per account and mailbox, stored as a small JSON file.
+
+    A mark is only valid for the UIDVALIDITY it was recorded with; when the
+    server reports a different UIDVALIDITY the stored UIDs are meaningless
+    and the mailbox must be resynchronized from scratch.
+    """
+
+    def __init__(self, path: str = SYNC_STATE_PATH, account: Optional[str] = GMAIL_USERNAME):
+        self.path = path
+        self.account = account or ""
+        self._state = self._load()
+        self._lock = threading.Lock()
+
+    def get(self, mailbox: str = "inbox") -> Tuple[Optional[int], int]:
+        """
+        Returns the recorded (uidvalidity, last_uid) for a mailbox.
+
+        Returns:
+            Tuple[Optional[int], int]: (None, 0) if the mailbox was never synced
+        """
+        entry = self._state.get(self.account, {}).get(mailbox.lower())
+        if not entry:
+            return None, 0
+        return entry.get("uidvalidity"), entry.get("last_uid", 0)
+
+    def last_uid(self, mailbox: str, uidvalidity: int) -> Optional[int]:
+        """
+        Returns the high-water mark if it is valid for `uidvalidity`, else None.
+        """
+        stored_validity, last_uid = self.get(mailbox)
+        if stored_validity != uidvalidity:
+            return None
+        return last_uid
+
+    def advance(self, mailbox: str, uidvalidity: int, uid: int) -> None:
+        """
+        Moves the high-water mark forward (never backwards) and saves it.
+
+        Args:
+            mailbox: The mailbox the UID belongs to
+            uidvalidity: The UIDVALIDITY the UID was fetched under
+            uid: The highest UID that has been fully processed
+        """
+        with self._lock:
+            stored_validity, last_uid = self.get(mailbox)
+            if stored_validity == uidvalidity and uid <= last_uid:
+                return
+
+            self._state.setdefault(self.account, {})[mailbox.lower()] = {
+                "uidvalidity": uidvalidity,
+                "last_uid": uid,
+            }
+            self._save()
+
+    def reset(self, mailbox: str = "inbox") -> None:
+        """
+        Forgets the high-water mark of a mailbox.
+        """
+        with self._lock:
+            self._state.get(self.account, {}).pop(mailbox.lower(), None)
+            self._save()
+
+    def _load(self) -> dict:
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable sync state: {str(e)}")
+            return {}
+
+    def _save(self) -> None:
+        if not self.path:
+            return
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as file:
+                json.dump(self._state, file)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"Error saving sync state: {str(e)}")
+
+
+_sync_state: Optional[SyncState] = None
+_sync_state_lock = threading.Lock()
+
+
+def get_sync_state() -> SyncState:
+    """
+    Returns the process-wide sync state, loading it on first use.
+    """
+    global _sync_state
+    with _sync_state_lock:
+        if _sync_state is None:
+            _sync_state = SyncState()
+        return _sync_state
@@ -0,0 +1,57 @@
+"""
+Training data for the local classifier, collected from LLM categorizations.
+
+When TRAINING_DATA_PATH is set, every email the LLM categorizes is appended
+to it as one JSON line: {"text": ..., "result": ..., "created_at": ...}.
+Nothing is written by default, since the file holds email content.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List
+
+from config import PRIORITY_LEVELS, EMAIL_CATEGORIES, TRAINING_DATA_PATH
+from .categorization_result import CategorizationResult
+
+# Fields learned from categorizations and their possible values
+LABELS: Dict[str, List[str]] = {
+    "Priority": list(PRIORITY_LEVELS),
+    "Category": list(EMAIL_CATEGORIES),
+    "Needs Response": ["Yes", "No"],
+}
+
+_training_lock = threading.Lock()
+
+
+def record_training_example(email_content: str, result: CategorizationResult) -> None:
+    """
+    Appends an LLM categorization to TRAINING_DATA_PATH (if set).
+    """
+    if not TRAINING_DATA_PATH:
+        return
+    try:
+        directory = os.path.dirname(TRAINING_DATA_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        line = json.dumps({"text": email_content, "result": result.to_dict(), "created_at": time.time()})
+        with _training_lock, open(TRAINING_DATA_PATH, "a", encoding="utf-8") as file:
+            file.write(line + "\n")
+    except OSError as e:
+        print(f"Error saving training example: {str(e)}")
+
+
+def iter_training_records(paths: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """
+    Yields the records of JSONL training files, skipping malformed lines.
+    """
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(record, dict):
+                    yield record
@@ -2,66 +2,78 @@
 Utility functions for the email processing system.
 """
 
-import os
+import threading
 
-def write_email_to_file(email_data, file_path="current_email.txt"):
+# Email content for the tools, keyed by email ID (see set_email_context)
+_email_contexts = {}
+_email_contexts_lock = threading.Lock()
+
+# Email ID the current thread is working on
+_current_email = threading.local()
+
+def format_email_content(email_data):
     """
-    Write email data to a text file.
+    Format email data as the text handed to the categorization tools.
     
     Args:
         email_data (dict): Dictionary containing email details
-        file_path (str): Path to the output file
+        
+    Returns:
+        str: Email content as a string
     """
-    try:
-        with open(file_path, 'w', encoding='utf-8') as file:
-            content = f"""From: {email_data.get('from', 'Unknown')}
+    return f"""From: {email_data.get('from', 'Unknown')}
 Subject: {email_data.get('subject', 'Unknown')}
 Date: {email_data.get('date', 'Unknown')}
 ID: {email_data.get('id', 'Unknown')}
 Body:
 {email_data.get('body', 'No content')}
 """
-            file.write(content)
-        return True
-    except Exception as e:
-        print(f"Error writing email to file: {str(e)}")
-        return False
 
-def read_email_from_file(file_path="current_email.txt"):
+def set_email_context(email_data):
     """
-    Read email data from a text file.
+    Register an email's content in memory and make it the current thread's email.
     
     Args:
-        file_path (str): Path to the input file
+        email_data (dict): Dictionary containing email details
         
     Returns:
-        str: Email content as a string
+        str: The formatted email content
+    """
+    email_id = str(email_data.get('id', 'Unknown'))
+    content = format_email_content(email_data)
+    with _email_contexts_lock:
+        _email_contexts[email_id] = content
+    _current_email.email_id = email_id
+    return content
+
+def get_email_context(email_id=None):
+    """
+    Look up the content of a registered email.
+    
+    Args:
+        email_id (str): The email ID; defaults to the current thread's email
+        
+    Returns:
+        str: Email content as a string, or None if it isn't registered
     """
-    try:
-        if not os.path.exists(file_path):
-            return None
-            
-        with open(file_path, 'r', encoding='utf-8') as file:
-            content = file.read()
-        return content
-    except Exception as e:
-        print(f"Error reading email from file: {str(e)}")
+    if not email_id:
+        email_id = getattr(_current_email, "email_id", None)
+    if email_id is None:
         return None
+    with _email_contexts_lock:
+        return _email_contexts.get(str(email_id))
 
-def clear_email_file(file_path="current_email.txt"):
+def clear_email_context(email_id):
     """
-    Clear the content of the email file.
+    Remove an email's content once it has been processed.
     
     Args:
-        file_path (str): Path to the file to clear
+        email_id (str): The email ID
     """
-    try:
-        with open(file_path, 'w', encoding='utf-8') as file:
-            file.write("")
-        return True
-    except Exception as e:
-        print(f"Error clearing email file: {str(e)}")
-        return False
+    with _email_contexts_lock:
+        _email_contexts.pop(str(email_id), None)
+    if getattr(_current_email, "email_id", None) == str(email_id):
+        _current_email.email_id = None
 
 def extract_email_details(email_content):
     """